@@ -0,0 +1,248 @@
+# Headless, resumable FinBERT scoring of a preprocessed csv, replacing the Colab notebooks
+# ProcessingFINBERT_*.ipynb (same output: the input columns plus finbert_sentiment and finbert_prob_*).
+#
+# The input is read in shards of SHARD_ROWS rows. Every scored shard is written at once to
+# <output>.shards/shard_<index>.csv (atomically, a shard file is either complete or missing), next to a
+# manifest of the run and progress.json (shards and rows done, rows/sec, elapsed time). After an interruption
+# the same command skips the shards that are already on disk and scores the rest; once all shards are done
+# they are concatenated in order into the output file. The manifest stops a resume when the input, the shard
+# size or the model changed (--restart drops the old shards).
+#
+# With --workers N the shards are scored by N processes, each building the model once with cpus / N torch
+# threads (minus --tokenizer-threads, which tokenize while the model runs); the main process writes the shards.
+# With --store the scores are also added to a sentiment store (sentiment_store.py) and rows whose Reddit id
+# already has a score of this model version are not scored again, they are written with their stored scores.
+# Rows without a Reddit id in their link are always scored and written, but the store cannot keep them; rows
+# without a prediction (error, no_text) are not stored either and are scored again by the next run.
+# Repeated texts are scored once per shard, and with --cache once across shards and runs (text_cache.ScoreCache).
+#
+# Usage: python run_finbert.py Bitcoin_comments_finbert_preprocessed.csv [--backend onnx-int8] [--workers 2]
+#        [--long-texts weighted]
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import threading
+from multiprocessing import Pool
+
+import pandas as pd
+
+# the shared FinBERT scoring lives in support_files
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'support_files'))
+from finbert_scoring import (BACKENDS, LONG_TEXTS, MAX_BATCH_TOKENS, MODEL_NAME, OUTPUT_COLUMNS, TEXT_COLUMN,
+                             FinbertScorer, model_version)
+from sentiment_store import NO_PREDICTION_LABELS, SentimentStore, finbert_rows, reddit_ids
+from text_cache import ScoreCache
+
+SHARD_ROWS = 20000
+
+# built once per worker process by _init_worker
+_scorer = None
+_store = None
+_cache = None
+
+
+def _init_worker(scorer_options, store_path=None, cache_path=None):
+    global _scorer, _store, _cache
+    _scorer = FinbertScorer(**scorer_options)
+    _store = SentimentStore(store_path, read_only=True) if store_path else None
+    _cache = ScoreCache(cache_path) if cache_path else None
+
+
+def score_shard(task):
+    shard_index, chunk = task
+    started = time.time()
+    new = pd.Series(True, index=chunk.index)
+    if _store is not None and 'link' in chunk.columns:
+        ids = reddit_ids(chunk['link'])
+        new = ids.isin(_store.missing_ids("finbert", _scorer.model_version(), ids.dropna())) | ids.isna()
+    scores = _scorer.score_series(chunk.loc[new, TEXT_COLUMN], _cache)
+    if not new.all():
+        # rows already in the store keep their stored scores, a shard always has every row of the input
+        stored_ids = ids[~new]
+        stored = _store.stored_scores("finbert", _scorer.model_version(), stored_ids).reindex(stored_ids)
+        stored = pd.DataFrame({'finbert_sentiment': stored['label'].to_numpy(),
+                               'finbert_prob_positive': stored['positive'].to_numpy(),
+                               'finbert_prob_negative': stored['negative'].to_numpy(),
+                               'finbert_prob_neutral': stored['neutral'].to_numpy()}, index=stored_ids.index)
+        scores = pd.concat([scores, stored[OUTPUT_COLUMNS]]).loc[chunk.index]
+    scored = pd.concat([chunk, scores], axis=1)
+    return shard_index, len(chunk), int(new.sum()), scored, time.time() - started, _scorer.utilization()
+
+
+def store_shard(store, version, source, scored, progress):
+    """
+    Adds the rows of a scored shard to the store, except rows without a prediction ('error': the model failed
+    on them, 'no_text'), which stay missing so the next run scores them again. Counts the rows left out.
+    """
+    rows = finbert_rows(scored)
+    predicted = ~rows['label'].isin(NO_PREDICTION_LABELS)
+    store.add_scores("finbert", version, source, rows[predicted])
+    progress['rows_without_id'] += int(rows['id'].isna().sum())
+    progress['rows_without_prediction'] += int((~predicted).sum())
+
+
+def shard_path(shards_folder, shard_index):
+    return os.path.join(shards_folder, f"shard_{shard_index:06d}.csv")
+
+
+def write_shard(scored, path):
+    scored.to_csv(path + ".tmp", index=False, encoding='utf-8')
+    os.replace(path + ".tmp", path)
+
+
+def shard_names(shards_folder):
+    return sorted(name for name in os.listdir(shards_folder) if name.startswith("shard_") and name.endswith(".csv"))
+
+
+def read_shards(input_path, shard_rows, shards_folder, window, stop):
+    chunks = pd.read_csv(input_path, dtype=str, keep_default_na=False, na_values=[''], chunksize=shard_rows)
+    for shard_index, chunk in enumerate(chunks):
+        if os.path.exists(shard_path(shards_folder, shard_index)):
+            continue
+        while not window.acquire(timeout=1):
+            if stop.is_set():
+                return
+        yield shard_index, chunk
+
+
+def check_manifest(shards_folder, manifest, restart):
+    manifest_path = os.path.join(shards_folder, "manifest.json")
+    if restart and os.path.isdir(shards_folder):
+        shutil.rmtree(shards_folder)
+    os.makedirs(shards_folder, exist_ok=True)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as manifest_file:
+            previous = json.load(manifest_file)
+        if previous != manifest:
+            changed = sorted(key for key in manifest if previous.get(key) != manifest[key])
+            raise SystemExit(f"The shards in {shards_folder} were scored with a different {', '.join(changed)}; "
+                             f"rerun with --restart to score the input again.")
+    else:
+        with open(manifest_path, "w", encoding='utf-8') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+
+
+def write_progress(shards_folder, progress):
+    path = os.path.join(shards_folder, "progress.json")
+    with open(path + ".tmp", "w", encoding='utf-8') as progress_file:
+        json.dump(progress, progress_file, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def merge_shards(shards_folder, output_path):
+    """Concatenates the shard files in order into output_path, keeping the header of the first one."""
+    shard_files = shard_names(shards_folder)
+    if not shard_files:
+        return 0
+    temporary_path = output_path + ".tmp"
+    with open(temporary_path, "wb") as output_file:
+        for number, name in enumerate(shard_files):
+            with open(os.path.join(shards_folder, name), "rb") as shard_file:
+                header = shard_file.readline()
+                if number == 0:
+                    output_file.write(header)
+                shutil.copyfileobj(shard_file, output_file, 1 << 20)
+    os.replace(temporary_path, output_path)
+    return len(shard_files)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a preprocessed csv with FinBERT in resumable shards")
+    parser.add_argument("input", help="preprocessed csv with a text_to_analyze column")
+    parser.add_argument("--output", help="default: <input>_finbert_analyzed.csv")
+    parser.add_argument("--shard-rows", type=int, default=SHARD_ROWS)
+    parser.add_argument("--backend", choices=BACKENDS, default="torch")
+    parser.add_argument("--device", help="cpu or cuda (default: cuda if available)")
+    parser.add_argument("--workers", type=int, default=1, help="scoring processes (default: 1, all cores)")
+    parser.add_argument("--max-batch-tokens", type=int, default=MAX_BATCH_TOKENS)
+    parser.add_argument("--tokenizer-threads", type=int, default=0,
+                        help="per worker, tokenize in this many threads while the model runs (default: 0)")
+    parser.add_argument("--long-texts", choices=LONG_TEXTS, default="truncate",
+                        help="truncate texts at 512 tokens, or average the scores of their 512 token windows")
+    parser.add_argument("--store", help="also add the scores to this sentiment store, skipping ids already in it")
+    parser.add_argument("--cache", help="sqlite score cache, texts scored by earlier runs are not scored again")
+    parser.add_argument("--restart", action="store_true", help="drop the shards of an earlier run")
+    parser.add_argument("--keep-shards", action="store_true", help="keep the shard files after merging")
+    args = parser.parse_args()
+
+    output_path = args.output or args.input.replace('.csv', '_finbert_analyzed.csv')
+    shards_folder = output_path + ".shards"
+    threads = max(1, (os.cpu_count() or 1) // args.workers - args.tokenizer_threads)
+    scorer_options = dict(device=args.device, max_batch_tokens=args.max_batch_tokens, threads=threads,
+                          backend=args.backend, long_texts=args.long_texts, tokenizer_threads=args.tokenizer_threads)
+    input_stat = os.stat(args.input)
+    manifest = {'input': os.path.abspath(args.input), 'input_size': input_stat.st_size,
+                'input_modified': int(input_stat.st_mtime), 'shard_rows': args.shard_rows,
+                'model': model_version(MODEL_NAME, args.backend, args.long_texts),
+                'store': os.path.abspath(args.store) if args.store else None}
+    check_manifest(shards_folder, manifest, args.restart)
+    done_before = len(shard_names(shards_folder))
+    if args.store:
+        store = SentimentStore(args.store)
+
+    print(f"Scoring '{os.path.basename(args.input)}' with FinBERT ({args.backend}), {args.workers} workers "
+          f"x {threads} threads, {done_before} shards already done...")
+    started = time.time()
+    window = threading.BoundedSemaphore(2 * args.workers)
+    stop = threading.Event()
+    shards = read_shards(args.input, args.shard_rows, shards_folder, window, stop)
+    if args.workers > 1:
+        pool = Pool(args.workers, initializer=_init_worker, initargs=(scorer_options, args.store, args.cache))
+        results = pool.imap(score_shard, shards)
+    else:
+        pool = None
+        _init_worker(scorer_options, args.store, args.cache)
+        results = map(score_shard, shards)
+
+    progress = {'shards_done': done_before, 'rows_read': 0, 'rows_scored': 0, 'rows_without_id': 0,
+                'rows_without_prediction': 0}
+    try:
+        for shard_index, rows_read, rows_scored, scored, shard_seconds, utilization in results:
+            window.release()
+            # the store is updated before the shard is written, a shard on disk is always in the store too; after
+            # a crash in between the shard is read again and takes the scores of its rows from the store
+            if args.store and rows_scored:
+                store_shard(store, manifest['model'], os.path.basename(args.input), scored, progress)
+            write_shard(scored, shard_path(shards_folder, shard_index))
+            elapsed = time.time() - started
+            progress['shards_done'] += 1
+            progress['rows_read'] += rows_read
+            progress['rows_scored'] += rows_scored
+            progress.update(last_shard=shard_index, elapsed_seconds=round(elapsed, 1),
+                            rows_per_second=round(progress['rows_read'] / elapsed, 2) if elapsed else 0.0)
+            write_progress(shards_folder, progress)
+            print(f"   shard {shard_index}: {rows_read:,} rows ({rows_scored:,} scored) in {shard_seconds:.0f}s, "
+                  f"{progress['rows_read']:,} rows this run at {progress['rows_per_second']:,.1f} rows/sec "
+                  f"(busy: tokenizer {utilization['tokenize']:.0%}, model {utilization['model']:.0%})")
+    except BaseException:
+        # stops the reader, which may be waiting for a free slot in the pool's feeder thread
+        stop.set()
+        if pool is not None:
+            pool.terminate()
+        print(f"\nInterrupted after {progress['shards_done']} shards, rerun the same command to resume.")
+        raise
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    if args.cache:
+        # evicts the least recently used scores once the cache is over its size
+        ScoreCache(args.cache).close()
+    shard_count = merge_shards(shards_folder, output_path)
+    if not args.keep_shards:
+        shutil.rmtree(shards_folder)
+    if shard_count:
+        print(f"\nSentiment analysis complete: {shard_count} shards, {progress['rows_read']:,} rows read in this "
+              f"run in {time.time() - started:.0f}s, saved to: {output_path}")
+        if progress['rows_without_id']:
+            print(f"{progress['rows_without_id']:,} rows without a Reddit id are in the output but not in the store")
+        if progress['rows_without_prediction']:
+            print(f"{progress['rows_without_prediction']:,} rows without a prediction (error, no_text) are not in "
+                  f"the store, the next run scores them again")
+    else:
+        print("\nNo rows to score, no output file created.")
+    print("\nScript finished.")
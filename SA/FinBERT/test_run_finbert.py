@@ -0,0 +1,95 @@
+# Tests of run_finbert.py with a sentiment store: rows already in the store keep their stored scores, and rows
+# the model failed on are not stored, so the next run scores them again. The model is replaced by a stand-in
+# scorer, no FinBERT model is needed.
+#
+# Usage (in SA/FinBERT): python -m unittest test_run_finbert
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import run_finbert
+from finbert_scoring import OUTPUT_COLUMNS, TEXT_COLUMN
+from sentiment_store import SentimentStore
+
+
+class StandInScorer:
+    # fails on texts containing "fail" while failing is set, like a batch whose inference raised
+    def __init__(self):
+        self.failing = True
+        self.texts = []
+
+    def model_version(self):
+        return "stand-in"
+
+    def utilization(self):
+        return {'tokenize': 0.0, 'model': 0.0}
+
+    def score_series(self, series, cache=None):
+        self.texts.extend(series)
+        failed = series.str.contains("fail").to_numpy() & self.failing
+        probabilities = np.where(failed[:, None], 0.0, [0.7, 0.2, 0.1])
+        scores = pd.DataFrame(probabilities, index=series.index, columns=OUTPUT_COLUMNS[1:])
+        scores.insert(0, OUTPUT_COLUMNS[0], np.where(failed, 'error', 'positive'))
+        return scores
+
+
+class StoreShardTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.store_path = os.path.join(self.folder, "sentiment.sqlite")
+        self.store = SentimentStore(self.store_path)
+        self.scorer = StandInScorer()
+        self.chunk = pd.DataFrame({
+            'link': [f"https://www.reddit.com/r/Bitcoin/comments/p0/_/c{row}/" for row in range(3)] + [None],
+            'created': ["2021-01-01 10:00:00", "2021-01-01 11:00:00", "2021-01-02 12:00:00", "2021-01-02 13:00:00"],
+            TEXT_COLUMN: ["bitcoin up", "this will fail", "hodl", "no link"],
+        }, index=range(10, 14))
+
+    def tearDown(self):
+        run_finbert._store.close()
+        self.store.close()
+        shutil.rmtree(self.folder)
+
+    def run_shard(self):
+        # one run of the script on a single shard: score it with the store, then add it to the store
+        run_finbert._scorer, run_finbert._cache = self.scorer, None
+        run_finbert._store = SentimentStore(self.store_path, read_only=True)
+        shard_index, rows_read, rows_scored, scored, _, _ = run_finbert.score_shard((0, self.chunk.copy()))
+        progress = {'rows_without_id': 0, 'rows_without_prediction': 0}
+        run_finbert.store_shard(self.store, "stand-in", "test.csv", scored, progress)
+        run_finbert._store.close()
+        return rows_scored, scored, progress
+
+    def test_error_rows_are_scored_again(self):
+        rows_scored, scored, progress = self.run_shard()
+        self.assertEqual(rows_scored, 4)
+        self.assertEqual(scored[OUTPUT_COLUMNS[0]].tolist(), ['positive', 'error', 'positive', 'positive'])
+        self.assertEqual(progress, {'rows_without_id': 1, 'rows_without_prediction': 1})
+        ids = ["t1_c0", "t1_c1", "t1_c2"]
+        self.assertEqual(self.store.missing_ids("finbert", "stand-in", ids), {"t1_c1"})
+        # the failed row is not in the daily aggregates
+        daily = self.store.daily("finbert", "stand-in")
+        self.assertEqual(daily['rows'].tolist(), [1, 1])
+        self.assertEqual(daily['non_neutral_rows'].tolist(), [1, 1])
+
+        # the next run scores the failed row and the row without id again, and takes the others from the store
+        self.scorer.failing = False
+        self.scorer.texts = []
+        rows_scored, scored, progress = self.run_shard()
+        self.assertEqual(sorted(self.scorer.texts), ["no link", "this will fail"])
+        self.assertEqual(rows_scored, 2)
+        self.assertEqual(scored.index.tolist(), self.chunk.index.tolist())
+        self.assertEqual(scored[OUTPUT_COLUMNS[0]].tolist(), ['positive'] * 4)
+        self.assertEqual(scored['finbert_prob_positive'].tolist(), [0.7] * 4)
+        self.assertEqual(progress, {'rows_without_id': 1, 'rows_without_prediction': 0})
+        self.assertEqual(self.store.missing_ids("finbert", "stand-in", ids), set())
+        self.assertEqual(self.store.daily("finbert", "stand-in")['rows'].tolist(), [2, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
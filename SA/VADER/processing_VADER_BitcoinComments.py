@@ -2,10 +2,15 @@ import os
 import pandas as pd
 import re
 from datetime import datetime
-import string
 import nltk
 from nltk.sentiment.vader import SentimentIntensityAnalyzer
 import traceback
+import sys
+
+# the shared text cleaning and VADER batch scoring live in support_files
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'support_files'))
+from text_cleaning import clean_series
+from vader_batch import VaderBatchScorer, score_series
 
 FILE_PATH = r'C:\Users\Leo Hubmann\Desktop\BachelorThesis_data\Bitcoin_comments.csv'
 
@@ -24,23 +29,9 @@ except LookupError:
     print("VADER lexicon downloaded.")
 
 # --- Preprocessing Setup ---
-url_pattern = re.compile(r'http\S+|www\.\S+')
-punctuation = string.punctuation
-# Create a translation table to remove punctuation
-translate_table = str.maketrans('', '', punctuation)
 # Create a regex pattern for keywords (case-insensitive word boundaries)
 #keyword_pattern = r"\b(?:" + "|".join(map(re.escape, KEYWORDS)) + r")\b"
-vader = SentimentIntensityAnalyzer()
-
-def clean_text(text):
-    """Cleans text data: converts to lowercase, removes URLs, punctuation, and extra whitespace."""
-    if pd.isna(text):
-        return ""
-    text = str(text).lower()
-    text = url_pattern.sub('', text)        # Remove URLs
-    text = text.translate(translate_table) # Remove punctuation
-    text = re.sub(r'\s+', ' ', text).strip() # Replace multiple spaces with single, trim ends
-    return text
+vader = VaderBatchScorer(SentimentIntensityAnalyzer())
 
 print(f"Processing file: '{os.path.basename(FILE_PATH)}'")
 
@@ -66,7 +57,7 @@ try:
     print("Cleaning text...")
     if TEXT_COLUMN in df.columns:
         # Directly use the TEXT_COLUMN ('body') and apply cleaning
-        df['text_to_analyze'] = df[TEXT_COLUMN].apply(clean_text)
+        df['text_to_analyze'] = clean_series(df[TEXT_COLUMN], "vader")
         print(f"   'text_to_analyze' column created from '{TEXT_COLUMN}'.")
     else:
         print(f"Error: Required text column '{TEXT_COLUMN}' not found in the DataFrame. Cannot proceed with analysis.")
@@ -117,12 +108,8 @@ try:
         else:
             # Step 6: Apply VADER Sentiment Analysis
             print("Applying VADER sentiment analysis...")
-            # Apply VADER to the cleaned text column
-            vader_scores = df['text_to_analyze'].apply(vader.polarity_scores)
-            # Normalize the dictionary output into separate columns
-            vader_df = pd.json_normalize(vader_scores).add_prefix('vader_')
-            # Align index before concatenation to prevent misalignment issues
-            vader_df.index = df.index
+            # Score the cleaned text column in batches (same scores as polarity_scores), index aligned with df
+            vader_df = score_series(df['text_to_analyze'], scorer=vader).add_prefix('vader_')
             df = pd.concat([df, vader_df], axis=1)
             print("   VADER scores calculated and added.")
 
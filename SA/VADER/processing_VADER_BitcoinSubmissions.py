@@ -2,9 +2,14 @@ import os
 import pandas as pd
 import re
 from datetime import datetime
-import string
 import nltk
 from nltk.sentiment.vader import SentimentIntensityAnalyzer
+import sys
+
+# the shared text cleaning and VADER batch scoring live in support_files
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'support_files'))
+from text_cleaning import clean_series
+from vader_batch import VaderBatchScorer, score_series
 
 try:
     nltk.data.find('sentiment/vader_lexicon.zip')
@@ -24,20 +29,8 @@ OUTPUT_ORIGINAL_COLS = ['author', 'score', 'link']
 
 
 # setup for preprocessing
-url_pattern = re.compile(r'http\S+|www\.\S+')
-punctuation = string.punctuation
-translate_table = str.maketrans('', '', punctuation)
 #keyword_pattern = r"\b(?:" + "|".join(KEYWORDS) + r")\b"
-vader = SentimentIntensityAnalyzer()
-
-def clean_text(text):
-    if pd.isna(text):
-        return ""
-    text = str(text).lower()
-    text = url_pattern.sub('', text)
-    text = text.translate(translate_table)
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+vader = VaderBatchScorer(SentimentIntensityAnalyzer())
 
 
 
@@ -64,7 +57,7 @@ try:
     print("Cleaning text...")
 
     if TITLE_COLUMN in df.columns and BODY_COLUMN in df.columns:
-        df['text_to_analyze'] = (df[TITLE_COLUMN].fillna('') + ' ' + df[BODY_COLUMN].fillna('')).apply(clean_text)
+        df['text_to_analyze'] = clean_series(df[TITLE_COLUMN].fillna('') + ' ' + df[BODY_COLUMN].fillna(''), "vader")
     else:
         print(f"Error: Missing '{TITLE_COLUMN}' or '{BODY_COLUMN}' in the DataFrame.")
         df['text_to_analyze'] = ''
@@ -114,10 +107,8 @@ try:
             # step 6: Apply VADER Sentiment Analysis
             print("applying VADER")
             if 'text_to_analyze' in df.columns:
-                vader_scores = df['text_to_analyze'].apply(vader.polarity_scores)
-                vader_df = pd.json_normalize(vader_scores).add_prefix('vader_')
-                # Align index before concatenation
-                vader_df.index = df.index
+                # batch scores, same as polarity_scores, index aligned with df
+                vader_df = score_series(df['text_to_analyze'], scorer=vader).add_prefix('vader_')
                 df = pd.concat([df, vader_df], axis=1)
             else:
                 print("Warning: 'text_to_analyze' column not found for VADER.")
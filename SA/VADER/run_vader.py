@@ -0,0 +1,218 @@
+# Scores all four subreddit/type inputs with VADER in one run, replacing the four processing_VADER_*.py
+# scripts (same steps and output columns: preprocessing_pipeline.preprocess_chunk with the "vader" cleaning
+# profile, then vader_batch scores as vader_neg/neu/pos/compound).
+#
+# Every input is read in shards of SHARD_ROWS rows which are preprocessed and scored in a process pool; each
+# worker builds the VADER lexicon once. Results come back in shard order (Pool.imap) and are appended to
+# <input name>_filtered_vader.<csv|parquet>, so the output does not depend on the number of workers. At most
+# two shards per worker are in flight, which bounds memory whatever the size of the inputs.
+#
+# With --store the scores go to a sentiment store (sentiment_store.py) instead of the output files: rows whose
+# Reddit id already has a score of the current VADER version (nltk release, lexicon and cleaning rules) are
+# skipped before preprocessing, so a refresh after a new extraction only scores the new rows, and the daily
+# aggregates are updated with them. Export them with sentiment_store.py. Rows without a Reddit id in their link
+# are skipped as well (and counted apart), the store cannot keep them.
+#
+# Repeated texts are scored once per shard, and with --cache once across shards and runs (text_cache.ScoreCache
+# keyed by the hash of the cleaned text and the VADER version).
+
+import os
+import sys
+import time
+import argparse
+import threading
+from multiprocessing import Pool
+
+import nltk
+import pandas as pd
+
+# the shared preprocessing and VADER batch scoring live in support_files
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'support_files'))
+from keyword_matcher import KeywordMatcher
+from preprocessing_pipeline import (OUTPUT_FORMATS, guess_datetime_format, make_config, open_chunk_writer,
+                                    preprocess_chunk)
+from sentiment_store import SentimentStore, reddit_ids, vader_rows
+from text_cache import ScoreCache
+from text_cleaning import rules_version
+from vader_batch import VaderBatchScorer, score_series
+
+DATA_FOLDER = r'C:\Users\Leo Hubmann\Desktop\BachelorThesis_data' # ADJUST THIS PATH
+
+KEYWORDS = ['bitcoin', 'btc']
+
+# input file: preprocessing settings, as in the processing_VADER_*.py scripts
+JOBS = {
+    'Bitcoin_comments.csv': dict(text_columns=['body']),
+    'Bitcoin_submissions.csv': dict(text_columns=['title', 'text']),
+    'CryptoCurrency_comments.csv': dict(text_columns=['body'], keywords=KEYWORDS),
+    'CryptoCurrency_submissions.csv': dict(text_columns=['title', 'text'], keywords=KEYWORDS),
+}
+
+SHARD_ROWS = 200000
+STATS_KEYS = ("rows_read", "rows_already_scored", "rows_without_id", "rows_after_keywords", "rows_after_content",
+              "invalid_timestamps", "rows_written")
+
+# built once per worker process by _init_worker
+_configs = None
+_matchers = None
+_scorer = None
+_store = None
+_cache = None
+
+
+def model_version(scorer):
+    return f"{scorer.model_version()}-clean-{rules_version('vader')[:12]}"
+
+
+def _init_worker(configs, store_path=None, cache_path=None):
+    global _configs, _matchers, _scorer, _store, _cache
+    _configs = configs
+    _matchers = {name: KeywordMatcher(config['keywords']) for name, config in configs.items() if config['keywords']}
+    _scorer = VaderBatchScorer()
+    _store = SentimentStore(store_path, read_only=True) if store_path else None
+    _cache = ScoreCache(cache_path) if cache_path else None
+
+
+def score_shard(task):
+    name, shard_index, chunk, timestamp_format = task
+    stats = dict.fromkeys(STATS_KEYS, 0)
+    # a fresh state per shard, so a shard is processed the same way whichever worker gets it
+    state = {'timestamp_format': timestamp_format}
+    if name in _matchers:
+        state['keyword_matcher'] = _matchers[name]
+    if _store is not None:
+        ids = reddit_ids(chunk['link'])
+        new = ids.isin(_store.missing_ids("vader", model_version(_scorer), ids.dropna()))
+        # rows without a Reddit id cannot be added to the store, they are not scored and counted apart
+        stats['rows_without_id'] += int(ids.isna().sum())
+        stats['rows_already_scored'] += int((~new & ids.notna()).sum())
+        stats['rows_read'] += int((~new).sum())
+        chunk = chunk[new]
+    processed = preprocess_chunk(chunk, _configs[name], stats, state)
+    if not processed.empty:
+        vader_df = score_series(processed['text_to_analyze'], scorer=_scorer, cache=_cache).add_prefix('vader_')
+        processed = pd.concat([processed, vader_df], axis=1)
+    return name, shard_index, processed, stats
+
+
+def read_shards(jobs, configs, shard_rows, window, stop):
+    for name, input_path in jobs:
+        timestamp_format = None
+        chunks = pd.read_csv(input_path, sep=',', encoding='utf-8', on_bad_lines='skip', dtype=str,
+                             chunksize=shard_rows)
+        for shard_index, chunk in enumerate(chunks):
+            if shard_index == 0:
+                # the format of the first timestamp is used for the whole file, as in preprocess_csv
+                timestamp_column = configs[name]['timestamp_column']
+                first = chunk[timestamp_column].dropna() if timestamp_column in chunk.columns else []
+                if guess_datetime_format is not None and len(first):
+                    timestamp_format = guess_datetime_format(first.iloc[0])
+            while not window.acquire(timeout=1):
+                if stop.is_set():
+                    return
+            yield name, shard_index, chunk, timestamp_format
+
+
+def output_path(input_path, output_folder, output_format):
+    base_name = os.path.splitext(os.path.basename(input_path))[0]
+    folder = output_folder or os.path.dirname(input_path) or '.'
+    return os.path.join(folder, f"{base_name}_filtered_vader.{output_format}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score the subreddit files with VADER in a process pool")
+    parser.add_argument("files", nargs="*", default=list(JOBS), help=f"inputs to score (default: all of {list(JOBS)})")
+    parser.add_argument("--data-folder", default=DATA_FOLDER)
+    parser.add_argument("--output-folder", help="where to write the scores (default: next to each input)")
+    parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default="csv")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shard-rows", type=int, default=SHARD_ROWS)
+    parser.add_argument("--cache", help="sqlite score cache, texts scored by earlier runs are not scored again")
+    parser.add_argument("--store", help="add the scores of new rows to this sentiment store instead of writing files")
+    args = parser.parse_args()
+
+    try:
+        nltk.data.find('sentiment/vader_lexicon.zip')
+    except LookupError:
+        nltk.download('vader_lexicon')
+
+    unknown = [name for name in args.files if name not in JOBS]
+    if unknown:
+        parser.error(f"unknown inputs {unknown}, expected some of {list(JOBS)}")
+    jobs = []
+    for name in args.files:
+        input_path = os.path.join(args.data_folder, name)
+        if os.path.exists(input_path):
+            jobs.append((name, input_path))
+        else:
+            print(f"Warning: '{input_path}' not found, skipping.")
+    configs = {name: make_config(profile="vader", **JOBS[name]) for name, _ in jobs}
+    if args.output_folder:
+        os.makedirs(args.output_folder, exist_ok=True)
+    if args.store:
+        store = SentimentStore(args.store)
+        version = model_version(VaderBatchScorer())
+        writers = {}
+    else:
+        writers = {name: open_chunk_writer(output_path(input_path, args.output_folder, args.output_format),
+                                           args.output_format, configs[name]['timestamp_column'])
+                   for name, input_path in jobs}
+    stats = {name: dict.fromkeys(STATS_KEYS, 0) for name, _ in jobs}
+
+    print(f"Scoring {len(jobs)} files in shards of {args.shard_rows:,} rows with {args.workers} workers...")
+    started = time.time()
+    window = threading.BoundedSemaphore(2 * args.workers)
+    stop = threading.Event()
+    shards = read_shards(jobs, configs, args.shard_rows, window, stop)
+    if args.workers > 1:
+        pool = Pool(args.workers, initializer=_init_worker, initargs=(configs, args.store, args.cache))
+        results = pool.imap(score_shard, shards)
+    else:
+        pool = None
+        _init_worker(configs, args.store, args.cache)
+        results = map(score_shard, shards)
+    try:
+        for name, shard_index, processed, shard_stats in results:
+            window.release()
+            if args.store and not processed.empty:
+                store.add_scores("vader", version, name, vader_rows(processed))
+            elif not processed.empty:
+                writers[name].write(processed)
+            for key, value in shard_stats.items():
+                stats[name][key] += value
+            print(f"   {name} shard {shard_index}: {stats[name]['rows_read']:,} rows read, "
+                  f"{stats[name]['rows_written']:,} rows scored ({time.time() - started:.0f}s)")
+        for writer in writers.values():
+            writer.close()
+    except BaseException:
+        # stops the reader, which may be waiting for a free slot in the pool's feeder thread
+        stop.set()
+        if pool is not None:
+            pool.terminate()
+        raise
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    if args.cache:
+        # evicts the least recently used scores once the cache is over its size
+        ScoreCache(args.cache).close()
+
+    print(f"\n--- Processing Summary ---")
+    for name, input_path in jobs:
+        result = output_path(input_path, args.output_folder, args.output_format)
+        if args.store:
+            result = f"{args.store} (version {version})"
+        elif not stats[name]['rows_written']:
+            result = "no rows left, no output file created"
+        skipped = ""
+        if args.store:
+            skipped = (f"{stats[name]['rows_already_scored']:,} already scored, "
+                       f"{stats[name]['rows_without_id']:,} without a Reddit id, ")
+        print(f"{name}: {stats[name]['rows_read']:,} rows read, {skipped}"
+              f"{stats[name]['rows_after_keywords']:,} after keywords, "
+              f"{stats[name]['rows_after_content']:,} after content/length, "
+              f"{stats[name]['invalid_timestamps']:,} invalid timestamps, "
+              f"{stats[name]['rows_written']:,} scored -> {result}")
+    print(f"\nAll files done in {time.time() - started:.0f}s.")
+    print("\nScript finished.")
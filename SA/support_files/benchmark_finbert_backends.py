@@ -0,0 +1,78 @@
+# Accuracy-parity report and benchmark of the FinBERT backends of finbert_scoring.py on a sample of a
+# preprocessed csv (text_to_analyze). Every backend scores the same sample; against the fp32 torch model it
+# reports the share of identical labels, the labels that changed, the mean / 99th percentile / max absolute
+# difference of the three probabilities, and rows/sec with the speedup.
+#
+# Usage: python benchmark_finbert_backends.py Bitcoin_comments_finbert_preprocessed.csv --sample 2000
+
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from finbert_scoring import BACKENDS, OUTPUT_COLUMNS, TEXT_COLUMN, FinbertScorer
+
+
+def score(scorer, texts):
+    started = time.perf_counter()
+    scores = scorer.score_series(texts)
+    return scores, time.perf_counter() - started
+
+
+def compare(scores, reference):
+    scored = ~reference[OUTPUT_COLUMNS[0]].isin(['no_text', 'error'])
+    labels, reference_labels = scores[OUTPUT_COLUMNS[0]][scored], reference[OUTPUT_COLUMNS[0]][scored]
+    deltas = np.abs(scores.loc[scored, OUTPUT_COLUMNS[1:]].to_numpy()
+                    - reference.loc[scored, OUTPUT_COLUMNS[1:]].to_numpy())
+    changed = pd.crosstab(reference_labels[labels != reference_labels], labels[labels != reference_labels])
+    return {
+        'rows': int(scored.sum()),
+        'label_agreement': float((labels == reference_labels).mean()) if scored.any() else 1.0,
+        'changed_labels': {f"{before}->{after}": int(count) for (before, after), count in changed.stack().items()
+                           if count},
+        'probability_delta_mean': float(deltas.mean()) if deltas.size else 0.0,
+        'probability_delta_p99': float(np.quantile(deltas, 0.99)) if deltas.size else 0.0,
+        'probability_delta_max': float(deltas.max()) if deltas.size else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the FinBERT backends with the fp32 model")
+    parser.add_argument("input", help="preprocessed csv with a text_to_analyze column")
+    parser.add_argument("--sample", type=int, default=2000, help="rows drawn from the csv")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backends", default=",".join(BACKENDS[1:]), help="backends compared with torch")
+    parser.add_argument("--threads", type=int)
+    parser.add_argument("--max-batch-tokens", type=int)
+    parser.add_argument("--report", help="also write the report as json")
+    args = parser.parse_args()
+
+    texts = pd.read_csv(args.input, usecols=[TEXT_COLUMN], dtype=str)[TEXT_COLUMN]
+    texts = texts.sample(min(args.sample, len(texts)), random_state=args.seed)
+    options = dict(threads=args.threads, device="cpu")
+    if args.max_batch_tokens:
+        options['max_batch_tokens'] = args.max_batch_tokens
+
+    reference, reference_seconds = score(FinbertScorer(**options), texts)
+    print(f"{len(texts):,} sampled rows, labels {reference[OUTPUT_COLUMNS[0]].value_counts().to_dict()}")
+    print(f"{'torch':>10}: {len(texts) / reference_seconds:8.1f} rows/sec")
+    report = {'input': args.input, 'sample': len(texts), 'seed': args.seed,
+              'torch': {'rows_per_second': len(texts) / reference_seconds}}
+    for backend in args.backends.split(","):
+        scores, seconds = score(FinbertScorer(backend=backend, **options), texts)
+        result = compare(scores, reference)
+        result['rows_per_second'] = len(texts) / seconds
+        result['speedup'] = reference_seconds / seconds
+        report[backend] = result
+        print(f"{backend:>10}: {result['rows_per_second']:8.1f} rows/sec ({result['speedup']:.2f}x), "
+              f"labels {result['label_agreement']:.2%} identical, probability delta mean "
+              f"{result['probability_delta_mean']:.4f} p99 {result['probability_delta_p99']:.4f} "
+              f"max {result['probability_delta_max']:.4f}")
+        if result['changed_labels']:
+            print(f"{'':>12}changed labels: {result['changed_labels']}")
+    if args.report:
+        with open(args.report, "w", encoding='utf-8') as report_file:
+            json.dump(report, report_file, indent=2)
+        print(f"\nReport saved to {args.report}")
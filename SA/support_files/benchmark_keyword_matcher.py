@@ -0,0 +1,44 @@
+# Benchmark of the keyword filter on cleaned synthetic comments as the keyword list grows.
+# Compares the regex alternation the scripts used (str.contains) with KeywordMatcher.contains_series and the
+# per-keyword bitmask, and prints rows/sec for each list size.
+
+import argparse
+import random
+import re
+import time
+
+import pandas as pd
+
+from benchmark_text_cleaning import synthetic_comments
+from keyword_matcher import KeywordMatcher
+from text_cleaning import clean_series
+
+BASE_KEYWORDS = ['bitcoin', 'btc', 'lost', 'issue', 'address', 'password', 'recovery']
+
+
+def timed(function):
+    started = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark keyword matching")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--sizes", default="2,10,100,1000,5000", help="keyword list sizes")
+    args = parser.parse_args()
+
+    texts = clean_series(pd.Series(synthetic_comments(args.rows, random.Random(42))), "finbert")
+    print(f"{len(texts):,} cleaned texts")
+    for size in map(int, args.sizes.split(",")):
+        # the real keywords first, then made-up words that never match
+        keywords = (BASE_KEYWORDS + [f"keyword{index}" for index in range(size)])[:size]
+        pattern = r"\b(?:" + "|".join(map(re.escape, keywords)) + r")\b"
+        reference, regex_seconds = timed(lambda: texts.str.contains(pattern, case=False, na=False, regex=True))
+        matcher = KeywordMatcher(keywords)
+        mask, matcher_seconds = timed(lambda: matcher.contains_series(texts))
+        _, bitmask_seconds = timed(lambda: matcher.bitmask_series(texts))
+        assert (mask == reference).all()
+        print(f"{size:>6} keywords   str.contains {len(texts) / regex_seconds:>10,.0f} rows/sec   "
+              f"matcher {len(texts) / matcher_seconds:>10,.0f} rows/sec   "
+              f"bitmask {len(texts) / bitmask_seconds:>10,.0f} rows/sec")
@@ -0,0 +1,57 @@
+# Benchmark of the cleaning cache on synthetic Reddit comments (or a column of a real csv), a share of them
+# repeated as bot replies and copypasta are. Compares clean_series with clean_series_cached on a new cache
+# (cold, every text is cleaned and added) and on the filled cache of an earlier run (warm), fails if the
+# cached results differ and prints rows/sec.
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmark_text_cleaning import synthetic_comments
+from text_cache import CleanedTextCache, clean_series_cached
+from text_cleaning import PROFILES, clean_series
+
+
+def timed(label, function, series, reference=None):
+    started = time.perf_counter()
+    cleaned = function(series)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<32} {len(series) / elapsed:>12,.0f} rows/sec {elapsed:>8.2f}s")
+    if reference is not None and not cleaned.equals(reference):
+        raise SystemExit(f"{label}: {(cleaned != reference).sum():,} rows differ from clean_series")
+    return cleaned
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the cleaned text cache")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--repeated", type=float, default=0.2, help="share of rows repeating an earlier text")
+    parser.add_argument("--csv", help="benchmark a text column of this csv instead of synthetic comments")
+    parser.add_argument("--column", default="body")
+    parser.add_argument("--profile", choices=tuple(PROFILES), default="finbert")
+    args = parser.parse_args()
+
+    if args.csv:
+        series = pd.read_csv(args.csv, usecols=[args.column], dtype=str, nrows=args.rows)[args.column]
+    else:
+        rng = random.Random(42)
+        texts = synthetic_comments(args.rows, rng)
+        for row in range(1, len(texts)):
+            if rng.random() < args.repeated:
+                texts[row] = texts[rng.randrange(row)]
+        series = pd.Series(texts)
+    print(f"{len(series):,} texts ({series.nunique():,} distinct), profile {args.profile}")
+
+    reference = timed("clean_series", lambda s: clean_series(s, args.profile), series)
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "cache.sqlite")
+        for label in ("clean_series_cached (cold)", "clean_series_cached (warm)"):
+            cache = CleanedTextCache(path)
+            # a later run, as the warm cache would be
+            cache.run_stamp += label.endswith("(warm)")
+            timed(label, lambda s: clean_series_cached(s, args.profile, cache), series, reference)
+            cache.close()
@@ -0,0 +1,97 @@
+# Benchmark of the text cleaning step on synthetic Reddit comments (or a column of a real csv).
+# Compares the row-by-row functions the preprocessing scripts used (Series.apply) with text_cleaning.py:
+# the batched python engine with one and several workers and the pyarrow engine. Prints rows/sec and the
+# share of rows identical to the current functions.
+
+import argparse
+import os
+import random
+import re
+import string
+import time
+
+import pandas as pd
+
+import text_cleaning
+from text_cleaning import clean_series
+
+# --- current functions, as they were defined in the scripts ---
+url_pattern = re.compile(r'http\S+|www\.\S+')
+translate_table = str.maketrans('', '', string.punctuation)
+
+
+def clean_text_for_finbert(text):
+    if pd.isna(text):
+        return ""
+    text = str(text).lower()
+    text = url_pattern.sub('', text)
+    text = text_cleaning.user_mention_pattern.sub('', text)
+    text = text_cleaning.subreddit_mention_pattern.sub('', text)
+    text = text_cleaning.emoji_pattern.sub('', text)
+    text = text.translate(translate_table)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+def clean_text(text):
+    if pd.isna(text):
+        return ""
+    text = str(text).lower()
+    text = url_pattern.sub('', text)
+    text = text.translate(translate_table)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+CURRENT = {"finbert": clean_text_for_finbert, "vader": clean_text}
+
+WORDS = ["Bitcoin", "BTC", "moon", "HODL", "price", "dump", "buy", "sell", "the", "is", "to", "and", "lambo",
+         "fees", "halving", "über", "€100", "$BTC", "it's", "don't", "!!!", "?", "lol", "...", "ETF", "sats"]
+EXTRAS = ["https://www.reddit.com/r/Bitcoin/comments/abc/", "www.coinbase.com", "u/satoshi", "/r/CryptoCurrency",
+          "😀", "🚀🚀", "\n\n", "  ", "&amp;", "[deleted]"]
+
+
+def synthetic_comments(rows, rng):
+    texts = []
+    for _ in range(rows):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(3, 60))]
+        for _ in range(rng.randint(0, 3)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(EXTRAS))
+        texts.append(" ".join(words))
+    return texts
+
+
+def run(label, function, series, reference=None):
+    started = time.perf_counter()
+    cleaned = function(series)
+    elapsed = time.perf_counter() - started
+    line = f"{label:<32} {len(series) / elapsed:>12,.0f} rows/sec"
+    if reference is not None:
+        identical = (cleaned.values == reference.values).mean()
+        line += f"   {identical * 100:.2f}% identical"
+    print(line)
+    return cleaned
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark text cleaning")
+    parser.add_argument("--rows", type=int, default=10000000)
+    parser.add_argument("--csv", help="benchmark a text column of this csv instead of synthetic comments")
+    parser.add_argument("--column", default="body")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--profile", choices=tuple(text_cleaning.PROFILES), default="finbert")
+    args = parser.parse_args()
+
+    if args.csv:
+        series = pd.read_csv(args.csv, usecols=[args.column], dtype=str, nrows=args.rows)[args.column]
+    else:
+        series = pd.Series(synthetic_comments(args.rows, random.Random(42)))
+    print(f"{len(series):,} texts, profile {args.profile}")
+
+    reference = run("Series.apply (current)", lambda s: s.apply(CURRENT[args.profile]), series)
+    run("clean_series python", lambda s: clean_series(s, args.profile), series, reference)
+    if args.workers > 1:
+        run(f"clean_series python x{args.workers}", lambda s: clean_series(s, args.profile, workers=args.workers),
+            series, reference)
+    if text_cleaning.pc is not None:
+        run("clean_series pyarrow", lambda s: clean_series(s, args.profile, engine="pyarrow"), series, reference)
@@ -0,0 +1,71 @@
+# Parity check and benchmark of vader_batch.py on synthetic Reddit comments (or a column of a real csv).
+# Scores the texts with the scripts' Series.apply(vader.polarity_scores) + json_normalize and with
+# score_series (one and several workers), fails if any score differs and prints rows/sec.
+# The texts are checked both raw (caps, punctuation, emoticons) and cleaned with the "vader" profile.
+
+import argparse
+import os
+import random
+import time
+
+import pandas as pd
+from nltk.sentiment.vader import SentimentIntensityAnalyzer
+
+from benchmark_text_cleaning import synthetic_comments
+from text_cleaning import clean_series
+from vader_batch import VaderBatchScorer, score_series
+from vader_cases import EDGE_CASES, rule_sentences
+
+
+def timed(function):
+    started = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - started
+
+
+def nltk_scores(vader, texts):
+    # what the VADER scripts did
+    scores = pd.json_normalize(texts.apply(vader.polarity_scores))
+    scores.index = texts.index
+    return scores
+
+
+def check(label, scores, reference):
+    differing = (scores.to_numpy() != reference[scores.columns].to_numpy()).any(axis=1)
+    if differing.any():
+        first = differing.argmax()
+        raise AssertionError(f"{label}: {differing.sum():,} rows differ from polarity_scores, first row {first}: "
+                             f"{scores.iloc[first].tolist()} != {reference[scores.columns].iloc[first].tolist()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare vader_batch with nltk's polarity_scores")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--csv", help="score a column of this csv instead of synthetic comments")
+    parser.add_argument("--column", default="body")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--lexicon", help="nltk resource of the VADER lexicon (default: vader_lexicon)")
+    args = parser.parse_args()
+
+    if args.csv:
+        raw = pd.read_csv(args.csv, usecols=[args.column], dtype=str, nrows=args.rows)[args.column].fillna('')
+    else:
+        raw = pd.Series(synthetic_comments(args.rows, random.Random(42)))
+    vader = SentimentIntensityAnalyzer(args.lexicon) if args.lexicon else SentimentIntensityAnalyzer()
+    rules = pd.Series(rule_sentences(max(1, args.rows // 10), random.Random(7), vader))
+    raw = pd.concat([pd.Series(EDGE_CASES), rules, raw], ignore_index=True)
+
+    for label, texts in (("raw", raw), ("cleaned", clean_series(raw, "vader"))):
+        reference, nltk_seconds = timed(lambda: nltk_scores(vader, texts))
+        scorer = VaderBatchScorer(vader)
+        scores, batch_seconds = timed(lambda: score_series(texts, scorer=scorer))
+        check(label, scores, reference)
+        print(f"{label:>8} texts: {len(texts):,} rows, {scorer.neutral_rows / len(texts):.0%} without lexicon words")
+        print(f"   polarity_scores       {len(texts) / nltk_seconds:>10,.0f} rows/sec")
+        print(f"   score_series          {len(texts) / batch_seconds:>10,.0f} rows/sec   identical")
+        if args.workers > 1:
+            scores, pool_seconds = timed(lambda: score_series(texts, workers=args.workers,
+                                                              batch_rows=max(1, len(texts) // args.workers // 4),
+                                                              lexicon_file=args.lexicon))
+            check(f"{label} with {args.workers} workers", scores, reference)
+            print(f"   {args.workers} workers{'':<13}{len(texts) / pool_seconds:>10,.0f} rows/sec   identical")
@@ -0,0 +1,486 @@
+# FinBERT scoring of many texts at once, replacing get_finbert_sentiment + df[TEXT_COLUMN].apply in the
+# SA/FinBERT/ProcessingFINBERT_*.ipynb notebooks, with the same label and three probabilities per row.
+#   - all texts of a chunk are tokenized in one call (truncated to 512 tokens like the notebooks)
+#   - the texts are sorted by token length and grouped into batches of at most max_batch_tokens padded tokens
+#     (rows x longest row) and max_batch_size rows, so a batch holds texts of similar length and hardly any
+#     padding is computed; the probabilities are written back at the rows' positions
+#   - on CPU torch uses one intra-op thread per core and a single inter-op thread (the model is one sequential
+#     graph, a second thread pool only competes for the cores)
+#   - with --tokenizer-threads N tokenization and inference overlap: N threads tokenize blocks of texts with the
+#     fast tokenizer's batch call and queue their length batches (a bounded queue), --model-workers threads run
+#     the model on them; the share of time each stage is busy is reported, so the slower stage shows
+# Rows without text get ('no_text', 0, 0, 0) and rows the model fails on ('error', 0, 0, 0), as before.
+#
+# Long texts (--long-texts mean|weighted): instead of cutting a text at 512 tokens, it is split into windows of
+# at most 512 tokens ([CLS] + WINDOW_OVERLAP tokens of the previous window + new tokens + [SEP]); the windows
+# of all texts of a chunk are length-batched together like short texts, and the probabilities of a text are
+# the mean of its windows' probabilities (mean) or weighted by their number of tokens (weighted). A window is
+# weighted by its new tokens only, the overlap is counted in the window before it, so every token of the text
+# counts once. The default (truncate) is the notebooks' behaviour.
+#
+# Repeated texts go through the model once, and with --cache the scores of earlier runs are reused
+# (text_cache.ScoreCache, keyed by the hash of the text and the model version).
+#
+# Backends (--backend), for CPU-only machines:
+#   torch       the fp32 model, as in the notebooks
+#   int8        torch dynamic quantization: the weights of the Linear layers stored as int8
+#   onnx        the model exported to ONNX (once, into onnx_folder) and run with ONNX Runtime
+#   onnx-int8   the ONNX export with int8 weights (onnxruntime.quantization.quantize_dynamic)
+# The quantized backends change the probabilities slightly; benchmark_finbert_backends.py reports label
+# agreement, probability deltas and speed of every backend against torch on a sample of our data.
+#
+# Usage: python finbert_scoring.py Bitcoin_submissions_finbert_preprocessed.csv [--backend onnx-int8]
+
+import os
+import copy
+import time
+import queue
+import argparse
+import threading
+
+import numpy as np
+import pandas as pd
+
+from text_cache import ScoreCache, score_series_cached
+
+try:
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+except ImportError:
+    torch = None
+
+try:
+    import onnxruntime
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+except ImportError:
+    onnxruntime = None
+
+MODEL_NAME = "ProsusAI/finbert"
+# FinBERT labels: 0: positive, 1: negative, 2: neutral
+LABELS = ['positive', 'negative', 'neutral']
+OUTPUT_COLUMNS = ['finbert_sentiment', 'finbert_prob_positive', 'finbert_prob_negative', 'finbert_prob_neutral']
+TEXT_COLUMN = 'text_to_analyze'
+
+MAX_LENGTH = 512
+MAX_BATCH_TOKENS = 8192
+MAX_BATCH_SIZE = 128
+CHUNK_ROWS = 50000
+# pipelined scoring (tokenizer_threads > 0): texts per tokenization block, length batches waiting for the model
+PIPELINE_ROWS = 1024
+QUEUE_BATCHES = 8
+
+BACKENDS = ("torch", "int8", "onnx", "onnx-int8")
+LONG_TEXTS = ("truncate", "mean", "weighted")
+WINDOW_OVERLAP = 64
+ONNX_INPUTS = ('input_ids', 'attention_mask', 'token_type_ids')
+ONNX_FOLDER = os.path.join(os.path.expanduser("~"), ".cache", "finbert_onnx")
+
+
+def configure_torch(threads=None, interop_threads=1):
+    """Thread settings for CPU inference; call before the first torch operation."""
+    torch.set_num_threads(threads or os.cpu_count() or 1)
+    try:
+        torch.set_num_interop_threads(interop_threads)
+    except RuntimeError:
+        # can only be set once per process, before any parallel work
+        pass
+
+
+def length_batches(lengths, max_batch_tokens=MAX_BATCH_TOKENS, max_batch_size=MAX_BATCH_SIZE):
+    """
+    Groups positions into batches by token length: sorted by length, a batch is closed when one more row would
+    make rows x longest row exceed max_batch_tokens or the batch has max_batch_size rows.
+    """
+    batch, longest = [], 0
+    for position in np.argsort(lengths, kind='stable'):
+        length = int(lengths[position])
+        if batch and ((len(batch) + 1) * max(longest, length) > max_batch_tokens or len(batch) >= max_batch_size):
+            yield batch
+            batch, longest = [], 0
+        batch.append(int(position))
+        longest = max(longest, length)
+    if batch:
+        yield batch
+
+
+def model_version(model_name=MODEL_NAME, backend="torch", long_texts="truncate"):
+    # the key of the scores in a sentiment store and the score cache
+    if long_texts == "truncate":
+        return f"{model_name}-{backend}"
+    return f"{model_name}-{backend}-{long_texts}{MAX_LENGTH}-overlap{WINDOW_OVERLAP}"
+
+
+class _Logits(torch.nn.Module if torch is not None else object):
+    # the classifier with positional inputs and the logits as only output, for the ONNX export
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask, token_type_ids):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids).logits
+
+
+def onnx_model_path(model, tokenizer, model_name, quantized=False, onnx_folder=None):
+    """Exports the model to ONNX (and its int8 version) on first use, returns the path of the requested file."""
+    folder = onnx_folder or ONNX_FOLDER
+    os.makedirs(folder, exist_ok=True)
+    base_path = os.path.join(folder, model_name.replace("/", "_"))
+    path = base_path + ".onnx"
+    if not os.path.exists(path):
+        sample = tokenizer(["export sample"], return_tensors="pt")
+        torch.onnx.export(_Logits(model), tuple(sample[name] for name in ONNX_INPUTS), path + ".tmp",
+                          input_names=list(ONNX_INPUTS), output_names=['logits'], opset_version=14,
+                          dynamic_axes={**{name: {0: 'batch', 1: 'sequence'} for name in ONNX_INPUTS},
+                                        'logits': {0: 'batch'}})
+        os.replace(path + ".tmp", path)
+    if not quantized:
+        return path
+    quantized_path = base_path + ".int8.onnx"
+    if not os.path.exists(quantized_path):
+        quantize_dynamic(path, quantized_path + ".tmp", weight_type=QuantType.QInt8)
+        os.replace(quantized_path + ".tmp", quantized_path)
+    return quantized_path
+
+
+class FinbertScorer:
+    def __init__(self, model_name=MODEL_NAME, device=None, max_batch_tokens=MAX_BATCH_TOKENS,
+                 max_batch_size=MAX_BATCH_SIZE, threads=None, backend="torch", onnx_folder=None,
+                 long_texts="truncate", tokenizer_threads=0, model_workers=1):
+        if torch is None:
+            raise ImportError("FinBERT scoring needs torch and transformers: pip install torch transformers")
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown FinBERT backend '{backend}', expected one of {', '.join(BACKENDS)}")
+        if long_texts not in LONG_TEXTS:
+            raise ValueError(f"Unknown long text mode '{long_texts}', expected one of {', '.join(LONG_TEXTS)}")
+        if backend != "torch":
+            # the quantized and ONNX backends run on CPU only
+            device = "cpu"
+        if device is None:
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.device = torch.device(device)
+        if tokenizer_threads and not threads:
+            # leaves the tokenizer threads their cores
+            threads = max(1, (os.cpu_count() or 1) - tokenizer_threads)
+        if self.device.type == "cpu":
+            configure_torch(threads)
+        self.model_name = model_name
+        self.backend = backend
+        self.long_texts = long_texts
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_name).to(self.device).eval()
+        self.session = None
+        if backend == "int8":
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        elif backend.startswith("onnx"):
+            if onnxruntime is None:
+                raise ImportError("The onnx backends need onnxruntime: pip install onnxruntime onnx")
+            path = onnx_model_path(self.model, self.tokenizer, model_name, backend == "onnx-int8", onnx_folder)
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = threads or os.cpu_count() or 1
+            options.inter_op_num_threads = 1
+            options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+            self.model = None
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.tokenizer_threads = tokenizer_threads
+        # a fast tokenizer must not be called from two threads at once ("Already borrowed"), so every tokenizer
+        # thread has its own copy and the model threads pad with self.tokenizer
+        self.thread_tokenizers = [copy.deepcopy(self.tokenizer) for _ in range(tokenizer_threads)]
+        self.model_workers = model_workers
+        # busy seconds of the tokenizer and model stages (summed over their threads) and wall seconds
+        self.stage_seconds = {'tokenize': 0.0, 'model': 0.0, 'wall': 0.0}
+        self.batches = 0
+        self.texts = 0
+        self.split_texts = 0
+        self.padded_tokens = 0
+        self.tokens = 0
+
+    def tokenize(self, texts, tokenizer=None):
+        return (tokenizer or self.tokenizer)(texts, truncation=True, max_length=MAX_LENGTH)
+
+    def windows(self, texts, tokenizer=None):
+        """
+        Tokenizes texts without truncation and splits every text into windows of at most MAX_LENGTH tokens that
+        overlap by WINDOW_OVERLAP tokens. Returns the features of the windows, the position of the text of every
+        window and the number of new text tokens in every window (without the overlap with the previous window).
+        """
+        tokenizer = tokenizer or self.tokenizer
+        window_tokens = MAX_LENGTH - tokenizer.num_special_tokens_to_add(pair=False)
+        step = window_tokens - WINDOW_OVERLAP
+        encodings = tokenizer(texts, add_special_tokens=False, return_attention_mask=False,
+                                   return_token_type_ids=False)
+        features, owners, sizes = [], [], []
+        for position, ids in enumerate(encodings['input_ids']):
+            for start in range(0, max(len(ids) - WINDOW_OVERLAP, 1), step):
+                window = tokenizer.build_inputs_with_special_tokens(ids[start:start + window_tokens])
+                features.append({'input_ids': window, 'token_type_ids': [0] * len(window),
+                                 'attention_mask': [1] * len(window)})
+                owners.append(position)
+                sizes.append(max(min(len(ids) - start, window_tokens) - (WINDOW_OVERLAP if start else 0), 1))
+        return features, np.array(owners, dtype=np.int64), np.array(sizes, dtype=np.float64)
+
+    def model_version(self):
+        return model_version(self.model_name, self.backend, self.long_texts)
+
+    def predict(self, features):
+        """Probabilities (rows x 3, float64) of a list of tokenized rows, padded to the longest row."""
+        if self.session is not None:
+            inputs = self.tokenizer.pad(features, return_tensors="np")
+            logits = self.session.run(['logits'], {name: inputs[name].astype(np.int64) for name in ONNX_INPUTS})[0]
+            logits = torch.from_numpy(logits)
+            return torch.softmax(logits.float(), dim=-1).numpy().astype(np.float64)
+        inputs = self.tokenizer.pad(features, return_tensors="pt")
+        inputs = {key: value.to(self.device) for key, value in inputs.items()}
+        with torch.inference_mode():
+            logits = self.model(**inputs).logits
+        return torch.softmax(logits.float(), dim=-1).cpu().numpy().astype(np.float64)
+
+    def features(self, texts, tokenizer=None):
+        """
+        The rows of the model input of texts (a truncated text, or a window of a long text), the position of the
+        text of every row and, for windows, its number of new text tokens.
+        """
+        if self.long_texts != "truncate":
+            return self.windows(texts, tokenizer)
+        encodings = self.tokenize(texts, tokenizer)
+        keys = list(encodings.keys())
+        features = [{key: encodings[key][position] for key in keys} for position in range(len(texts))]
+        return features, np.arange(len(texts)), None
+
+    def predict_batch(self, features):
+        """predict, scoring the rows one by one when the batch fails; returns the probabilities and the failed rows."""
+        failed = np.zeros(len(features), dtype=bool)
+        try:
+            return self.predict(features), failed
+        except Exception:
+            # score the rows one by one so only the failing ones are marked as errors
+            probabilities = np.zeros((len(features), len(LABELS)), dtype=np.float64)
+            for index, feature in enumerate(features):
+                try:
+                    probabilities[index] = self.predict([feature])[0]
+                except Exception:
+                    failed[index] = True
+            return probabilities, failed
+
+    def _count_batch(self, lengths):
+        self.batches += 1
+        self.tokens += int(lengths.sum())
+        self.padded_tokens += len(lengths) * int(lengths.max())
+
+    def _score_features(self, texts):
+        # tokenization, then the model on the length batches, in this thread
+        started = time.perf_counter()
+        features, owners, sizes = self.features(texts)
+        lengths = np.fromiter((len(feature['input_ids']) for feature in features), dtype=np.int64,
+                              count=len(features))
+        tokenized = time.perf_counter()
+        feature_probabilities = np.zeros((len(features), len(LABELS)), dtype=np.float64)
+        failed = np.zeros(len(features), dtype=bool)
+        for batch in length_batches(lengths, self.max_batch_tokens, self.max_batch_size):
+            feature_probabilities[batch], failed[batch] = self.predict_batch([features[position] for position in batch])
+            self._count_batch(lengths[batch])
+        finished = time.perf_counter()
+        self.stage_seconds['tokenize'] += tokenized - started
+        self.stage_seconds['model'] += finished - tokenized
+        self.stage_seconds['wall'] += finished - started
+        return owners, sizes, feature_probabilities, failed
+
+    def _score_features_pipelined(self, texts):
+        """
+        _score_features with the stages overlapped: tokenizer_threads tokenize blocks of PIPELINE_ROWS texts and
+        put their length batches on a queue of at most QUEUE_BATCHES batches, model_workers threads run the model
+        on them. The fast tokenizer and the model release the GIL, so both stages keep their cores busy.
+        """
+        blocks = [(index, start) for index, start in enumerate(range(0, len(texts), PIPELINE_ROWS))]
+        results = [None] * len(blocks)
+        batches = queue.Queue(maxsize=QUEUE_BATCHES)
+        lock = threading.Lock()
+        stop = threading.Event()
+        errors = []
+        busy = {'tokenize': 0.0, 'model': 0.0}
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+        def tokenize_blocks(tokenizer):
+            try:
+                while not stop.is_set():
+                    with lock:
+                        if not blocks:
+                            return
+                        index, start = blocks.pop(0)
+                    started = time.perf_counter()
+                    features, owners, sizes = self.features(texts[start:start + PIPELINE_ROWS], tokenizer)
+                    lengths = np.fromiter((len(feature['input_ids']) for feature in features), dtype=np.int64,
+                                          count=len(features))
+                    result = results[index] = (start + owners, sizes,
+                                               np.zeros((len(features), len(LABELS)), dtype=np.float64),
+                                               np.zeros(len(features), dtype=bool))
+                    block_batches = list(length_batches(lengths, self.max_batch_tokens, self.max_batch_size))
+                    with lock:
+                        busy['tokenize'] += time.perf_counter() - started
+                    for batch in block_batches:
+                        put((result, batch, [features[position] for position in batch], lengths[batch]))
+            except BaseException as error:
+                errors.append(error)
+                stop.set()
+
+        def run_model():
+            try:
+                while not stop.is_set():
+                    try:
+                        item = batches.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                    if item is None:
+                        return
+                    (_, _, probabilities, failed), batch, features, lengths = item
+                    started = time.perf_counter()
+                    probabilities[batch], failed[batch] = self.predict_batch(features)
+                    with lock:
+                        busy['model'] += time.perf_counter() - started
+                        self._count_batch(lengths)
+            except BaseException as error:
+                errors.append(error)
+                stop.set()
+
+        started = time.perf_counter()
+        tokenizers = [threading.Thread(target=tokenize_blocks, args=(tokenizer,), daemon=True)
+                      for tokenizer in self.thread_tokenizers]
+        models = [threading.Thread(target=run_model, daemon=True) for _ in range(self.model_workers)]
+        for thread in tokenizers + models:
+            thread.start()
+        for thread in tokenizers:
+            thread.join()
+        for _ in models:
+            put(None)
+        for thread in models:
+            thread.join()
+        if errors:
+            raise errors[0]
+        self.stage_seconds['tokenize'] += busy['tokenize']
+        self.stage_seconds['model'] += busy['model']
+        self.stage_seconds['wall'] += time.perf_counter() - started
+
+        owners, sizes, feature_probabilities, failed = zip(*results)
+        return (np.concatenate(owners), None if sizes[0] is None else np.concatenate(sizes),
+                np.concatenate(feature_probabilities), np.concatenate(failed))
+
+    def utilization(self):
+        """Share of the wall time each stage was busy, per thread (1.0: the stage never waited)."""
+        wall = self.stage_seconds['wall'] or 1.0
+        tokenizer_threads = self.tokenizer_threads or 1
+        return {'tokenize': self.stage_seconds['tokenize'] / (wall * tokenizer_threads),
+                'model': self.stage_seconds['model'] / (wall * (self.model_workers if self.tokenizer_threads else 1))}
+
+    def score_texts(self, texts):
+        """
+        Scores a list of texts. Returns the labels (list) and the probabilities (rows x 3 array in the order of
+        LABELS).
+        """
+        labels = np.full(len(texts), 'no_text', dtype=object)
+        probabilities = np.zeros((len(texts), len(LABELS)), dtype=np.float64)
+        rows = [row for row, text in enumerate(texts) if isinstance(text, str) and text.strip() != ""]
+        if not rows:
+            return labels.tolist(), probabilities
+
+        self.texts += len(rows)
+        row_texts = [texts[row] for row in rows]
+        if self.tokenizer_threads:
+            owners, sizes, feature_probabilities, failed = self._score_features_pipelined(row_texts)
+        else:
+            owners, sizes, feature_probabilities, failed = self._score_features(row_texts)
+
+        rows = np.array(rows, dtype=np.int64)
+        if self.long_texts == "truncate":
+            probabilities[rows] = feature_probabilities
+        else:
+            # mean of the windows of every text, weighted by their number of new tokens in "weighted" mode
+            weights = sizes if self.long_texts == "weighted" else np.ones(len(owners))
+            totals = np.zeros((len(rows), len(LABELS)), dtype=np.float64)
+            np.add.at(totals, owners, feature_probabilities * weights[:, None])
+            windows = np.bincount(owners, minlength=len(rows))
+            probabilities[rows] = totals / np.bincount(owners, weights=weights, minlength=len(rows))[:, None]
+            self.split_texts += int(np.count_nonzero(windows > 1))
+        # a text is an error when any of its windows failed
+        labels[rows[np.unique(owners[failed])]] = 'error'
+        probabilities[labels == 'error'] = 0.0
+
+        scored = np.array([row for row in rows if labels[row] != 'error'], dtype=np.int64)
+        labels[scored] = np.array(LABELS, dtype=object)[probabilities[scored].argmax(axis=1)]
+        return labels.tolist(), probabilities
+
+    def _score_frame(self, series):
+        labels, probabilities = self.score_texts(series.tolist())
+        scores = pd.DataFrame(probabilities, index=series.index, columns=OUTPUT_COLUMNS[1:])
+        scores.insert(0, OUTPUT_COLUMNS[0], labels)
+        return scores
+
+    def score_series(self, series, cache=None):
+        """
+        Scores a pandas Series of texts into a DataFrame with OUTPUT_COLUMNS and the same index. Every distinct
+        text goes through the model once; with a text_cache.ScoreCache the texts scored by an earlier run of the
+        same model version are taken from it (rows that failed are not cached).
+        """
+        return score_series_cached(series, self._score_frame, self.model_version(), cache,
+                                   cacheable=lambda scores: scores[OUTPUT_COLUMNS[0]] != 'error')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a preprocessed csv with FinBERT in length-sorted batches")
+    parser.add_argument("input", help="preprocessed csv with a text_to_analyze column")
+    parser.add_argument("--output", help="default: <input>_finbert_analyzed.csv")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--backend", choices=BACKENDS, default="torch")
+    parser.add_argument("--device", help="cpu or cuda (default: cuda if available)")
+    parser.add_argument("--threads", type=int, help="torch threads on CPU (default: number of cpus)")
+    parser.add_argument("--max-batch-tokens", type=int, default=MAX_BATCH_TOKENS)
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--long-texts", choices=LONG_TEXTS, default="truncate",
+                        help="truncate texts at 512 tokens, or average the scores of their 512 token windows")
+    parser.add_argument("--tokenizer-threads", type=int, default=0,
+                        help="tokenize in this many threads while the model runs (default: 0, one after the other)")
+    parser.add_argument("--model-workers", type=int, default=1, help="model threads of the pipelined scoring")
+    parser.add_argument("--cache", help="sqlite score cache, texts scored by earlier runs are not scored again")
+    args = parser.parse_args()
+
+    output_path = args.output or args.input.replace('.csv', '_finbert_analyzed.csv')
+    scorer = FinbertScorer(args.model, args.device, args.max_batch_tokens, args.max_batch_size, args.threads,
+                           args.backend, long_texts=args.long_texts, tokenizer_threads=args.tokenizer_threads,
+                           model_workers=args.model_workers)
+    print(f"Scoring '{os.path.basename(args.input)}' with {args.model} ({args.backend}) on {scorer.device}...")
+
+    cache = ScoreCache(args.cache) if args.cache else None
+    started = time.time()
+    rows = 0
+    temporary_path = output_path + ".tmp"
+    chunks = pd.read_csv(args.input, dtype={TEXT_COLUMN: str}, chunksize=args.chunk_rows)
+    for chunk_index, chunk in enumerate(chunks):
+        chunk = pd.concat([chunk, scorer.score_series(chunk[TEXT_COLUMN], cache)], axis=1)
+        chunk.to_csv(temporary_path, mode='w' if chunk_index == 0 else 'a', header=chunk_index == 0, index=False,
+                     encoding='utf-8-sig' if chunk_index == 0 else 'utf-8')
+        rows += len(chunk)
+        seconds = time.time() - started
+        print(f"   {rows:,} rows scored ({scorer.texts:,} texts through the model), {rows / seconds:,.1f} "
+              f"rows/sec, {scorer.padded_tokens / max(scorer.tokens, 1) - 1:.1%} padding")
+    utilization = scorer.utilization()
+    print(f"   busy: tokenizer {utilization['tokenize']:.0%}, model {utilization['model']:.0%} "
+          f"({scorer.stage_seconds['tokenize']:.0f}s tokenizing, {scorer.stage_seconds['model']:.0f}s in the model)")
+    if scorer.split_texts:
+        print(f"   {scorer.split_texts:,} texts longer than {MAX_LENGTH} tokens scored in windows ({args.long_texts})")
+    if cache is not None:
+        print(f"   {cache.hits:,} distinct texts taken from the score cache")
+        cache.close()
+    if not rows:
+        print("No rows to score, no output file created.")
+    else:
+        os.replace(temporary_path, output_path)
+    print(f"\nSentiment analysis complete in {time.time() - started:.2f} seconds, saved to: {output_path}")
+    print("\nScript finished.")
@@ -0,0 +1,197 @@
+# Multi-keyword matching for the keyword filter and keyword features of the preprocessing scripts.
+# A KeywordMatcher is built once from the keyword list and finds, per text, which keywords occur as whole
+# words, with the same result as the regex the scripts used:
+#     re.search(r"\b(?:" + "|".join(map(re.escape, KEYWORDS)) + r")\b", text, re.IGNORECASE)
+#
+# Keywords made of words separated by single spaces ("lost", "seed phrase") go into a token index: a text is
+# split into its words once and every word is looked up in a dict, so the cost per text depends on the
+# length of the text and not on the number of keywords. For short lists (the usual 'bitcoin', 'btc') contains()
+# uses the plain regex alternation, which is faster below a few dozen keywords. With pyahocorasick installed
+# the token keywords are matched by an Aho-Corasick automaton in C instead. Any other keyword (leading
+# punctuation, double spaces...) is matched by a regex of its own.
+#
+# Texts are lowercased before matching, the cleaned texts of text_cleaning.py already are.
+
+import re
+
+import pandas as pd
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+word_pattern = re.compile(r'\w+')
+TOKEN_KEYWORD = re.compile(r'\w+(?: \w+)*')
+# up to this many keywords contains() runs one regex alternation
+REGEX_KEYWORDS = 30
+
+
+def is_word_char(char):
+    # same definition as \w in a str pattern
+    return char.isalnum() or char == '_'
+
+
+class KeywordMatcher:
+    def __init__(self, keywords, backend="auto"):
+        if backend not in ("auto", "tokens", "ahocorasick"):
+            raise ValueError(f"Unknown keyword matching backend '{backend}', expected auto, tokens or ahocorasick")
+        if backend == "ahocorasick" and ahocorasick is None:
+            raise ImportError("pyahocorasick is not installed, use backend='tokens'")
+        self.keywords = list(keywords)
+        self.backend = "ahocorasick" if backend == "auto" and ahocorasick is not None else backend
+        if self.backend == "auto":
+            self.backend = "tokens"
+
+        # first word -> [(remaining words, keyword index)], with () for single word keywords
+        self.index = {}
+        self.automaton = None
+        other_keywords = []
+        for keyword_index, keyword in enumerate(self.keywords):
+            lowered = keyword.lower()
+            if TOKEN_KEYWORD.fullmatch(lowered):
+                words = lowered.split(" ")
+                self.index.setdefault(words[0], []).append((tuple(words[1:]), keyword_index))
+            else:
+                other_keywords.append((lowered, keyword_index))
+        self.single_index = {}
+        for word, entries in self.index.items():
+            single = [keyword_index for rest, keyword_index in entries if not rest]
+            if single:
+                self.single_index[word] = single
+        self.phrase_words = {word for word, entries in self.index.items() if any(rest for rest, _ in entries)}
+        self.alternation = (re.compile(r"\b(?:" + "|".join(map(re.escape, self.keywords)) + r")\b", re.IGNORECASE)
+                            if len(self.keywords) <= REGEX_KEYWORDS else None)
+
+        if self.backend == "ahocorasick" and self.index:
+            self.automaton = ahocorasick.Automaton()
+            for first, entries in self.index.items():
+                for rest, keyword_index in entries:
+                    phrase = " ".join((first,) + rest)
+                    _, keyword_indices = self.automaton.get(phrase, (len(phrase), ()))
+                    self.automaton.add_word(phrase, (len(phrase), keyword_indices + (keyword_index,)))
+            self.automaton.make_automaton()
+
+        self.other_patterns = [(re.compile(r"\b(?:" + re.escape(keyword) + r")\b", re.IGNORECASE), keyword_index)
+                               for keyword, keyword_index in other_keywords]
+        self.other_pattern = (re.compile(r"\b(?:" + "|".join(re.escape(keyword) for keyword, _ in other_keywords) + r")\b",
+                                         re.IGNORECASE) if other_keywords else None)
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def find(self, text):
+        """Indices of the keywords occurring in text, once per occurrence, in order of position."""
+        if not isinstance(text, str):
+            return []
+        text = text.lower()
+        found = []
+        if self.automaton is not None:
+            for end, (length, keyword_indices) in self.automaton.iter(text):
+                start = end - length + 1
+                if (start == 0 or not is_word_char(text[start - 1])) and \
+                        (end + 1 == len(text) or not is_word_char(text[end + 1])):
+                    found.extend((start, keyword_index) for keyword_index in keyword_indices)
+        elif self.index:
+            if not self.phrase_words and not self.other_patterns:
+                # single words only, the words come out in order of position
+                single_index = self.single_index
+                return [keyword_index for word in word_pattern.findall(text) if word in single_index
+                        for keyword_index in single_index[word]]
+            words = [(match.group(), match.start(), match.end()) for match in word_pattern.finditer(text)]
+            for position, (word, start, _) in enumerate(words):
+                entries = self.index.get(word)
+                if entries is None:
+                    continue
+                for rest, keyword_index in entries:
+                    if self._phrase_follows(text, words, position, rest):
+                        found.append((start, keyword_index))
+        for pattern, keyword_index in self.other_patterns:
+            found.extend((match.start(), keyword_index) for match in pattern.finditer(text))
+        found.sort()
+        return [keyword_index for _, keyword_index in found]
+
+    @staticmethod
+    def _phrase_follows(text, words, position, rest):
+        # the following words have to be exactly the rest of the phrase, each after a single space
+        if position + len(rest) >= len(words):
+            return not rest
+        for offset, expected in enumerate(rest, 1):
+            word, start, _ = words[position + offset]
+            if word != expected or text[words[position + offset - 1][2]:start] != " ":
+                return False
+        return True
+
+    def contains(self, text):
+        """True if any keyword occurs in text."""
+        if not isinstance(text, str):
+            return False
+        if self.alternation is not None:
+            return self.alternation.search(text) is not None
+        text = text.lower()
+        if self.automaton is None and self.index:
+            words = word_pattern.findall(text)
+            if not self.single_index.keys().isdisjoint(words):
+                return True
+            if not self.phrase_words.isdisjoint(words) and self.find(text):
+                return True
+        elif self.index and self.find(text):
+            return True
+        return self.other_pattern is not None and self.other_pattern.search(text) is not None
+
+    def hits(self, text):
+        """Sorted indices of the distinct keywords occurring in text."""
+        return sorted(set(self.find(text)))
+
+    def bitmask(self, text):
+        """Bit i is set when keyword i occurs in text."""
+        mask = 0
+        for keyword_index in set(self.find(text)):
+            mask |= 1 << keyword_index
+        return mask
+
+    def counts(self, text):
+        """Occurrences per keyword, as a list in keyword order."""
+        counts = [0] * len(self.keywords)
+        for keyword_index in self.find(text):
+            counts[keyword_index] += 1
+        return counts
+
+    # --- pandas helpers ---
+
+    def contains_series(self, series):
+        return pd.Series([self.contains(text) for text in series.tolist()], index=series.index, dtype=bool)
+
+    def bitmask_series(self, series):
+        return self.tag_series(series)[0]
+
+    def counts_frame(self, series, prefix="kw_"):
+        return self.tag_series(series, prefix, counts=True)[1]
+
+    def tag_series(self, series, prefix="kw_", counts=False):
+        """
+        Bitmask Series (int64 up to 63 keywords, python ints beyond) and, with counts=True, a DataFrame of
+        occurrences per keyword, from a single scan of every text.
+        """
+        masks, rows = [], []
+        for text in series.tolist():
+            keyword_indices = self.find(text)
+            mask = 0
+            for keyword_index in set(keyword_indices):
+                mask |= 1 << keyword_index
+            masks.append(mask)
+            if counts:
+                row = [0] * len(self.keywords)
+                for keyword_index in keyword_indices:
+                    row[keyword_index] += 1
+                rows.append(row)
+        mask_series = pd.Series(masks, index=series.index, dtype='int64' if len(self.keywords) < 64 else object)
+        if not counts:
+            return mask_series, None
+        columns = [prefix + re.sub(r'\W+', '_', keyword.lower()).strip('_') for keyword in self.keywords]
+        return mask_series, pd.DataFrame(rows, index=series.index, columns=columns, dtype='int32')
+
+
+def decode_bitmask(mask, keywords):
+    """Keywords whose bit is set in mask."""
+    return [keyword for bit, keyword in enumerate(keywords) if (int(mask) >> bit) & 1]
@@ -1,24 +1,136 @@
 # Post Processing for strategy refinement
+# Tags every row of the extracted (or preprocessed) subreddit files with the keywords it mentions, so strategy
+# code can select rows by keyword without reading the text again. All files are processed in one run, in
+# parallel across files, in chunks of CHUNK_ROWS rows.
+#
+# Output per input file, next to it:
+#   <name>_keyword_hits.csv            link, created and one <set>_mask column per keyword set, where bit i is
+#                                      set when keyword i of the set occurs in the row's text (whole words,
+#                                      case-insensitive), plus <set>_<keyword> counts with --counts
+#   <name>_keyword_hits.keywords.json  the keywords of every set in bit order, to decode the masks
+#
+# Join the hits on link, e.g. rows mentioning 'recovery':
+#   bit = keywords['additional'].index('recovery')
+#   df[(df['additional_mask'] >> bit) & 1 == 1]
+# or decode a mask with keyword_matcher.decode_bitmask(mask, keywords['additional'])
 
 import os
-import pandas as pd
-import re
+import json
+import argparse
 from datetime import datetime
-import string
-import traceback
+from multiprocessing import Pool
 
-#FILE_PATH = r'C:\Users\Leo Hubmann\Desktop\BachelorThesis_data\CryptoCurrency_submissions.csv'
-#FILE_PATH = r'C:\Users\Leo Hubmann\Desktop\BachelorThesis_data\CryptoCurrency_comments.csv'
-#FILE_PATH = r'C:\Users\Leo Hubmann\Desktop\BachelorThesis_data\Bitcoin_submissions.csv'
-#FILE_PATH = r'C:\Users\Leo Hubmann\Desktop\BachelorThesis_data\Bitcoin_comments.csv'
+import pandas as pd
 
-#FILE_PATH = r'C:\Users\Leo Hubmann\Desktop\BachelorThesis_data\CryptoCurrency_submissions.csv'
-#FILE_PATH = r'C:\Users\Leo Hubmann\Desktop\BachelorThesis_data\CryptoCurrency_comments.csv'
-#FILE_PATH = r'C:\Users\Leo Hubmann\Desktop\BachelorThesis_data\Bitcoin_submissions.csv'
-#FILE_PATH = r'C:\Users\Leo Hubmann\Desktop\BachelorThesis_data\Bitcoin_comments.csv'
+from keyword_matcher import KeywordMatcher
+from text_cleaning import clean_series
+
+FILE_PATHS = [
+    r'C:\Users\Leo Hubmann\Desktop\BachelorThesis_data\CryptoCurrency_submissions.csv',
+    r'C:\Users\Leo Hubmann\Desktop\BachelorThesis_data\CryptoCurrency_comments.csv',
+    r'C:\Users\Leo Hubmann\Desktop\BachelorThesis_data\Bitcoin_submissions.csv',
+    r'C:\Users\Leo Hubmann\Desktop\BachelorThesis_data\Bitcoin_comments.csv',
+]
 
 TIMESTAMP_COLUMN = 'created'
+KEY_COLUMN = 'link'
+# text of raw extracted files: title + text for submissions, body for comments;
+# preprocessed files already have the cleaned text_to_analyze
+TEXT_COLUMNS = ['title', 'text', 'body']
 
 KEYWORDS = [
   'lost', 'issue', 'address', 'password', 'recovery'
 ]
+
+# every set gets its own mask column, add variants here instead of rerunning with edited keywords
+KEYWORD_SETS = {
+    'additional': KEYWORDS,
+}
+
+CHUNK_ROWS = 500000
+
+
+def output_paths(file_path, output_folder=None):
+    base_name = os.path.splitext(os.path.basename(file_path))[0] + "_keyword_hits"
+    folder = output_folder or os.path.dirname(file_path) or '.'
+    return os.path.join(folder, base_name + ".csv"), os.path.join(folder, base_name + ".keywords.json")
+
+
+def chunk_texts(chunk):
+    if 'text_to_analyze' in chunk.columns:
+        return chunk['text_to_analyze'].fillna('')
+    text_columns = [column for column in TEXT_COLUMNS if column in chunk.columns]
+    if not text_columns:
+        raise KeyError(f"none of the text columns {TEXT_COLUMNS + ['text_to_analyze']} found")
+    combined = chunk[text_columns[0]].fillna('')
+    for column in text_columns[1:]:
+        combined = combined + ' ' + chunk[column].fillna('')
+    return clean_series(combined, "finbert")
+
+
+def tag_file(arguments):
+    file_path, keyword_sets, output_folder, with_counts, chunk_rows = arguments
+    hits_path, keywords_path = output_paths(file_path, output_folder)
+    matchers = {name: KeywordMatcher(keywords) for name, keywords in keyword_sets.items()}
+    temporary_path = hits_path + ".tmp"
+    rows, tagged = 0, {name: 0 for name in keyword_sets}
+
+    chunks = pd.read_csv(file_path, sep=',', encoding='utf-8', on_bad_lines='skip', dtype=str, chunksize=chunk_rows)
+    for chunk_index, chunk in enumerate(chunks):
+        texts = chunk_texts(chunk)
+        output = chunk[[column for column in (KEY_COLUMN, TIMESTAMP_COLUMN) if column in chunk.columns]].copy()
+        for name, matcher in matchers.items():
+            masks, counts = matcher.tag_series(texts, prefix=f"{name}_", counts=with_counts)
+            output[f"{name}_mask"] = masks
+            if counts is not None:
+                output = pd.concat([output, counts], axis=1)
+            tagged[name] += int((output[f"{name}_mask"] != 0).sum())
+        output.to_csv(temporary_path, mode='w' if chunk_index == 0 else 'a', header=chunk_index == 0,
+                      index=False, encoding='utf-8')
+        rows += len(chunk)
+    if not rows:
+        pd.DataFrame(columns=[KEY_COLUMN, TIMESTAMP_COLUMN] + [f"{name}_mask" for name in keyword_sets]).to_csv(
+            temporary_path, index=False, encoding='utf-8')
+    os.replace(temporary_path, hits_path)
+
+    with open(keywords_path, "w", encoding='utf-8') as keywords_file:
+        json.dump({'source': os.path.abspath(file_path), 'created': datetime.now().isoformat(timespec='seconds'),
+                   'keywords': keyword_sets}, keywords_file, indent=2)
+    return file_path, hits_path, rows, tagged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tag the rows of the subreddit files with keyword hit masks")
+    parser.add_argument("files", nargs="*", default=FILE_PATHS, help="csv files to tag (default: FILE_PATHS)")
+    parser.add_argument("--keywords", help="json file {set name: [keywords]} replacing KEYWORD_SETS")
+    parser.add_argument("--output-folder", help="where to write the hits (default: next to each input file)")
+    parser.add_argument("--workers", type=int, default=min(len(FILE_PATHS), os.cpu_count() or 1),
+                        help="files processed in parallel")
+    parser.add_argument("--counts", action="store_true", help="also write the number of hits per keyword")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    keyword_sets = KEYWORD_SETS
+    if args.keywords:
+        with open(args.keywords, encoding='utf-8') as keywords_file:
+            keyword_sets = json.load(keywords_file)
+    if args.output_folder:
+        os.makedirs(args.output_folder, exist_ok=True)
+
+    files = [file_path for file_path in args.files if os.path.exists(file_path)]
+    for file_path in sorted(set(args.files) - set(files)):
+        print(f"Warning: '{file_path}' not found, skipping.")
+    print(f"Tagging {len(files)} files with {sum(map(len, keyword_sets.values()))} keywords "
+          f"in {len(keyword_sets)} sets using {args.workers} workers...")
+
+    tasks = [(file_path, keyword_sets, args.output_folder, args.counts, args.chunk_rows) for file_path in files]
+    if args.workers > 1 and len(tasks) > 1:
+        with Pool(min(args.workers, len(tasks))) as pool:
+            results = pool.map(tag_file, tasks, chunksize=1)
+    else:
+        results = [tag_file(task) for task in tasks]
+
+    for file_path, hits_path, rows, tagged in results:
+        tagged_summary = ", ".join(f"{name}: {count:,}" for name, count in tagged.items())
+        print(f"{os.path.basename(file_path)}: {rows:,} rows, rows with hits {tagged_summary} -> {hits_path}")
+    print("\nScript finished.")
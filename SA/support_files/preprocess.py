@@ -0,0 +1,101 @@
+# Preprocesses a whole corpus of extracted Reddit csv files for sentiment analysis in one run.
+# The jobs are declared in a json config (see preprocess.example.json):
+#   output_folder   where outputs go (default: next to each input)
+#   workers         files processed at the same time, each in its own process (default: number of cpus)
+#   defaults        settings applied to every job unless the job sets them
+#   jobs            one entry per input file, with
+#     input           the csv to preprocess
+#     output          output path (default: <input name>_<profile>_preprocessed.<csv|parquet>)
+#     text_columns    columns joined into text_to_analyze, e.g. ["title", "text"] or ["body"]
+#     keywords        keep only rows whose cleaned text contains one of these words (default: no filter)
+#     profile         text cleaning profile of text_cleaning.py, "finbert" or "vader"
+#     min_length      minimum length of the cleaned text
+#     timestamp_column, output_columns   as in preprocessing_pipeline.py
+#     output_format   "csv" or "parquet"
+#     chunk_rows      rows per chunk (0 or null: whole file at once)
+#     cache_path      sqlite cache of cleaned texts shared by all jobs, reruns only clean new or edited texts
+#     cache_max_mb    size above which the least recently used cleaned texts are evicted
+# Inside a job the chunks are read, cleaned/filtered and written by overlapped threads (run_overlapped).
+#
+# After a change to the cleaning rules, rerun the whole corpus with: python preprocess.py preprocess.json
+
+import os
+import json
+import time
+import argparse
+from multiprocessing import Pool
+
+from preprocessing_pipeline import DEFAULT_CONFIG, OUTPUT_FORMATS, make_config, preprocess_csv
+
+JOB_KEYS = tuple(DEFAULT_CONFIG) + ("input", "output", "output_format", "chunk_rows")
+DEFAULT_JOB = {'output_format': "csv", 'chunk_rows': 500000}
+
+
+def load_jobs(config_path):
+    with open(config_path, encoding='utf-8') as config_file:
+        config = json.load(config_file)
+
+    defaults = {**DEFAULT_JOB, **config.get('defaults', {})}
+    jobs = []
+    for entry in config['jobs']:
+        job = {**defaults, **entry}
+        unknown = set(job) - set(JOB_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown job settings {sorted(unknown)} in {config_path}")
+        if not job.get('input'):
+            raise ValueError(f"Every job in {config_path} needs an input")
+        if job['output_format'] not in OUTPUT_FORMATS:
+            raise ValueError(f"{job['input']}: output_format must be one of {', '.join(OUTPUT_FORMATS)}")
+        if not job.get('output'):
+            base_name = os.path.splitext(os.path.basename(job['input']))[0]
+            profile = job.get('profile', DEFAULT_CONFIG['profile'])
+            folder = config.get('output_folder') or os.path.dirname(job['input']) or '.'
+            job['output'] = os.path.join(folder, f"{base_name}_{profile}_preprocessed.{job['output_format']}")
+        jobs.append(job)
+    return jobs, config.get('workers')
+
+
+def run_job(job):
+    config = make_config(**{key: job[key] for key in DEFAULT_CONFIG if key in job})
+    started = time.time()
+    stats = preprocess_csv(job['input'], job['output'], config, job['chunk_rows'] or None,
+                           job['output_format'], overlapped=True)
+    return job, stats, time.time() - started
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preprocess extracted Reddit csv files as declared in a json config")
+    parser.add_argument("config", help="json config, see preprocess.example.json")
+    parser.add_argument("--workers", type=int, help="files processed in parallel (overrides the config)")
+    args = parser.parse_args()
+
+    jobs, config_workers = load_jobs(args.config)
+    missing = [job['input'] for job in jobs if not os.path.exists(job['input'])]
+    for input_path in missing:
+        print(f"Warning: '{input_path}' not found, skipping.")
+    jobs = [job for job in jobs if job['input'] not in missing]
+    for job in jobs:
+        output_folder = os.path.dirname(job['output'])
+        if output_folder:
+            os.makedirs(output_folder, exist_ok=True)
+
+    workers = max(1, min(args.workers or config_workers or os.cpu_count() or 1, len(jobs)))
+    print(f"Preprocessing {len(jobs)} files with {workers} workers...")
+    started = time.time()
+    if workers > 1:
+        with Pool(workers) as pool:
+            results = pool.imap_unordered(run_job, jobs)
+            results = list(results)
+    else:
+        results = [run_job(job) for job in jobs]
+
+    print(f"\n--- Processing Summary ---")
+    for job, stats, seconds in sorted(results, key=lambda result: result[0]['input']):
+        output = job['output'] if stats['rows_written'] else "no rows left, no output file created"
+        print(f"{os.path.basename(job['input'])}: {stats['rows_read']:,} rows read, "
+              f"{stats['rows_after_keywords']:,} after keywords, {stats['rows_after_content']:,} after content/length, "
+              f"{stats['rows_written']:,} written in {seconds:.0f}s -> {output}")
+        if 'cached_texts' in stats:
+            print(f"   {stats['cached_texts']:,} of {stats['rows_read']:,} texts taken from the cleaning cache")
+    print(f"\nAll files done in {time.time() - started:.0f}s.")
+    print("\nScript finished.")
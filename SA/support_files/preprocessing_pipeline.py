@@ -0,0 +1,276 @@
+# Preprocessing of an extracted Reddit csv for sentiment analysis, shared by the FinBERT preprocessing scripts.
+# Steps: build text_to_analyze from the text columns and clean it, keep rows matching the keywords (optional),
+# drop empty, [removed]/[deleted] and too short texts, parse the timestamps and drop invalid ones, keep the
+# output columns.
+#
+# preprocess_csv runs the steps either on the whole file at once (chunk_rows=None) or on chunks of chunk_rows
+# rows, appending every chunk to the output, so memory stays bounded whatever the size of the input.
+# Both modes give the same file:
+# - all columns are read as text, so no column changes type from one chunk to the next
+# - the timestamp format pandas infers from the first kept row is reused for all later chunks
+# - timestamps are written with an explicit date_format (pandas drops the time when a chunk has only midnights)
+# With overlapped=True the chunks are read, processed and written by three threads at the same time
+# (run_overlapped); pandas releases the GIL in large parts of csv parsing and writing.
+
+import os
+import queue
+import threading
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from keyword_matcher import KeywordMatcher
+from text_cache import CleanedTextCache, clean_series_cached
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:
+    # older pandas parse every timestamp on its own, there is no format to carry over
+    guess_datetime_format = None
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+OUTPUT_FORMATS = ("csv", "parquet")
+DROPPED_TEXTS = ['', '[removed]', '[deleted]']
+
+DEFAULT_CONFIG = {
+    'text_columns': ['title', 'text'],
+    'timestamp_column': 'created',
+    'output_columns': ['author', 'score', 'link'],
+    'keywords': None,
+    'profile': "finbert",
+    'min_length': 5,
+    # sqlite cache of cleaned texts (text_cache.py), reruns only clean new or edited texts
+    'cache_path': None,
+    'cache_max_mb': 2048,
+}
+
+
+def make_config(**settings):
+    unknown = set(settings) - set(DEFAULT_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown preprocessing settings {sorted(unknown)}")
+    return {**DEFAULT_CONFIG, **settings}
+
+
+def preprocess_chunk(df, config, stats, state):
+    """
+    Runs the preprocessing steps on one DataFrame, updating the row counts in stats. state carries the
+    timestamp format, the keyword matcher and the text cache between chunks. Returns the output columns of the kept rows.
+    """
+    stats['rows_read'] += len(df)
+    text_columns = [column for column in config['text_columns'] if column in df.columns]
+    if text_columns:
+        combined = df[text_columns[0]].fillna('')
+        for column in text_columns[1:]:
+            combined = combined + ' ' + df[column].fillna('')
+        if config['cache_path'] and 'cache' not in state:
+            state['cache'] = CleanedTextCache(config['cache_path'], config['cache_max_mb'])
+        df['text_to_analyze'] = clean_series_cached(combined, config['profile'], state.get('cache'))
+    else:
+        df['text_to_analyze'] = ''
+
+    if config['keywords']:
+        if 'keyword_matcher' not in state:
+            state['keyword_matcher'] = KeywordMatcher(config['keywords'])
+        df = df[state['keyword_matcher'].contains_series(df['text_to_analyze'])]
+    stats['rows_after_keywords'] += len(df)
+
+    df = df[~df['text_to_analyze'].isin(DROPPED_TEXTS)]
+    df = df[df['text_to_analyze'].str.len() >= config['min_length']]
+    stats['rows_after_content'] += len(df)
+
+    timestamp_column = config['timestamp_column']
+    if timestamp_column in df.columns and not df.empty:
+        df = df.copy()
+        if 'timestamp_format' not in state:
+            first = df[timestamp_column].dropna()
+            state['timestamp_format'] = (guess_datetime_format(first.iloc[0])
+                                         if guess_datetime_format is not None and len(first) else None)
+        df[timestamp_column] = pd.to_datetime(df[timestamp_column], errors='coerce', format=state['timestamp_format'])
+        stats['invalid_timestamps'] += int(df[timestamp_column].isna().sum())
+        df = df.dropna(subset=[timestamp_column])
+
+    columns = [column for column in config['output_columns'] if column in df.columns]
+    if timestamp_column in df.columns:
+        columns.append(timestamp_column)
+    columns.append('text_to_analyze')
+    stats['rows_written'] += len(df)
+    return df[columns]
+
+
+class CsvChunkWriter:
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.temporary_path = output_path + ".tmp"
+        self.header = True
+
+    def write(self, processed):
+        processed.to_csv(self.temporary_path, mode='w' if self.header else 'a', header=self.header, index=False,
+                         encoding='utf-8', date_format=DATE_FORMAT)
+        self.header = False
+
+    def close(self):
+        if not self.header:
+            os.replace(self.temporary_path, self.output_path)
+
+
+class ParquetChunkWriter:
+    # every chunk becomes a row group; the timestamp column is a timestamp, score an int, float columns
+    # (sentiment scores) doubles, the rest strings
+    def __init__(self, output_path, timestamp_column):
+        if pa is None:
+            raise ImportError("pyarrow is required for parquet output, install it or use csv")
+        self.output_path = output_path
+        self.temporary_path = output_path + ".tmp"
+        self.timestamp_column = timestamp_column
+        self.writer = None
+
+    def write(self, processed):
+        if self.writer is None:
+            self.schema = pa.schema([pa.field(column, self.column_type(column, processed[column].dtype))
+                                     for column in processed.columns])
+            self.writer = pq.ParquetWriter(self.temporary_path, self.schema, compression='zstd')
+        if 'score' in processed.columns:
+            processed = processed.assign(score=pd.to_numeric(processed['score'], errors='coerce').astype('Int64'))
+        self.writer.write_table(pa.Table.from_pandas(processed, schema=self.schema, preserve_index=False))
+
+    def column_type(self, column, dtype):
+        if column == self.timestamp_column:
+            return pa.timestamp('s')
+        if column == 'score':
+            return pa.int64()
+        if pd.api.types.is_float_dtype(dtype):
+            return pa.float64()
+        return pa.string()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            os.replace(self.temporary_path, self.output_path)
+
+
+def open_chunk_writer(output_path, output_format, timestamp_column):
+    if output_format == "csv":
+        return CsvChunkWriter(output_path)
+    if output_format == "parquet":
+        return ParquetChunkWriter(output_path, timestamp_column)
+    raise ValueError(f"Unknown output format '{output_format}', expected one of {', '.join(OUTPUT_FORMATS)}")
+
+
+_DONE = object()
+
+
+def run_overlapped(chunks, process, write, depth=2):
+    """
+    Runs write(process(chunk)) for every chunk with reading, processing and writing overlapped: a reader
+    thread parses the next chunks and a writer thread writes the previous ones while the calling thread
+    processes the current one. At most depth chunks wait between two stages. Errors of any stage are raised.
+    """
+    read_queue, write_queue = queue.Queue(depth), queue.Queue(depth)
+    stop = threading.Event()
+    errors = []
+
+    def put(target_queue, item):
+        while not stop.is_set():
+            try:
+                target_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def reader():
+        try:
+            for chunk in chunks:
+                if not put(read_queue, chunk):
+                    return
+        except BaseException as err:
+            errors.append(err)
+            stop.set()
+        finally:
+            put(read_queue, _DONE)
+
+    def writer():
+        while True:
+            item = write_queue.get()
+            if item is _DONE:
+                return
+            if errors:
+                continue  # keep draining so the processing thread never blocks
+            try:
+                write(item)
+            except BaseException as err:
+                errors.append(err)
+                stop.set()
+
+    reader_thread = threading.Thread(target=reader, name="preprocess-reader", daemon=True)
+    writer_thread = threading.Thread(target=writer, name="preprocess-writer", daemon=True)
+    reader_thread.start()
+    writer_thread.start()
+    try:
+        while not stop.is_set():
+            try:
+                item = read_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                break
+            if not put(write_queue, process(item)):
+                break
+    except BaseException as err:
+        errors.append(err)
+        stop.set()
+    finally:
+        write_queue.put(_DONE)
+        writer_thread.join()
+        stop.set()
+        reader_thread.join()
+    if errors:
+        raise errors[0]
+
+
+def preprocess_csv(input_path, output_path, config, chunk_rows=None, output_format="csv", overlapped=False,
+                   progress=True):
+    """
+    Preprocesses input_path into output_path (csv or parquet), in memory or in chunks of chunk_rows rows,
+    with overlapped read/process/write stages if requested. No output file is written when no row is left.
+    Returns the row counts.
+    """
+    stats = dict.fromkeys(("rows_read", "rows_after_keywords", "rows_after_content", "invalid_timestamps",
+                           "rows_written"), 0)
+    state = {}
+    read_options = dict(sep=',', encoding='utf-8', on_bad_lines='skip', dtype=str)
+    if chunk_rows:
+        chunks = pd.read_csv(input_path, chunksize=chunk_rows, **read_options)
+    else:
+        chunks = [pd.read_csv(input_path, low_memory=False, **read_options)]
+    chunk_writer = open_chunk_writer(output_path, output_format, config['timestamp_column'])
+
+    def process(chunk):
+        return preprocess_chunk(chunk, config, stats, state)
+
+    def write(processed):
+        if not processed.empty:
+            chunk_writer.write(processed)
+        if chunk_rows and progress:
+            print(f"   {os.path.basename(input_path)}: {stats['rows_read']:,} rows read, "
+                  f"{stats['rows_written']:,} rows written")
+
+    try:
+        if overlapped and chunk_rows:
+            run_overlapped(chunks, process, write)
+        else:
+            for chunk in chunks:
+                write(process(chunk))
+        chunk_writer.close()
+    finally:
+        if 'cache' in state:
+            stats['cached_texts'] = state['cache'].hits
+            state['cache'].close()
+    return stats
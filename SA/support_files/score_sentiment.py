@@ -0,0 +1,169 @@
+# Scores a corpus of extracted Reddit csv files with several sentiment models in one streaming pass, instead
+# of one read and one cleaning of the multi-GB inputs per model (processing_VADER_*.py, run_vader.py, the
+# FinBERT preprocessing + notebooks). The jobs are declared in the same json config as preprocess.py (see
+# preprocess.example.json; the profile of a job is ignored, every model brings its own), the models with
+# --model specs of sentiment_models.py.
+#
+# Every chunk of chunk_rows rows is read once, cleaned and filtered once per cleaning profile (preprocess_chunk,
+# so models sharing a profile share the cleaning) and scored by every model on the distinct texts of its rows
+# only, each model deduplicating its texts separately (SentimentModel.score_series). Reading, scoring and
+# writing overlap (run_overlapped). Each model writes <input name>_filtered_<model>.<csv|parquet>: the
+# preprocessed columns and its score columns.
+#
+# --score-cache keeps the scores of every model across runs (text_cache.ScoreCache). With --store the scores go
+# to a sentiment store instead of the output files, and rows whose Reddit id every model has already scored
+# are skipped before the cleaning, as are rows without a Reddit id (the store cannot keep them).
+#
+# Usage: python score_sentiment.py preprocess.json --model vader --model finbert:backend=onnx-int8
+
+import os
+import time
+import argparse
+
+import pandas as pd
+
+from preprocess import load_jobs
+from preprocessing_pipeline import DEFAULT_CONFIG, make_config, open_chunk_writer, preprocess_chunk, run_overlapped
+from sentiment_models import MODELS, load_model
+from sentiment_store import SentimentStore, reddit_ids
+from text_cache import ScoreCache
+
+STATS_KEYS = ("rows_read", "rows_after_keywords", "rows_after_content", "invalid_timestamps", "rows_written")
+
+
+def output_path(job, model):
+    # next to the job's preprocessed output of preprocess.py (output_folder of the config, or the input's folder)
+    base_name = os.path.splitext(os.path.basename(job['input']))[0]
+    folder = os.path.dirname(job['output']) or '.'
+    return os.path.join(folder, f"{base_name}_filtered_{model.name}.{job['output_format']}")
+
+
+def score_job(job, models, score_cache=None, store=None):
+    """
+    Reads job['input'] once and scores it with all models. Returns the row counts per cleaning profile and the
+    number of rows scored per model.
+    """
+    source = os.path.basename(job['input'])
+    settings = {key: job[key] for key in DEFAULT_CONFIG if key in job and key != 'profile'}
+    profiles = sorted({model.profile for model in models})
+    configs = {profile: make_config(profile=profile, **settings) for profile in profiles}
+    states = {profile: {} for profile in profiles}
+    stats = {profile: dict.fromkeys(STATS_KEYS, 0) for profile in profiles}
+    scored_rows = {model.name: 0 for model in models}
+    skipped = {'rows_already_scored': 0, 'rows_without_id': 0}
+    writers = {}
+    if store is None:
+        writers = {model.name: open_chunk_writer(output_path(job, model), job['output_format'],
+                                                 configs[model.profile]['timestamp_column'])
+                   for model in models}
+
+    def process(chunk):
+        new = {}
+        if store is not None:
+            # the rows each model still has to score; a row no model needs is not cleaned
+            ids = reddit_ids(chunk['link'])
+            for model in models:
+                missing = store.missing_ids(model.name, model.store_version(), ids.dropna())
+                new[model.name] = ids.isin(missing)
+            needed = pd.concat(new.values(), axis=1).any(axis=1)
+            # rows without a Reddit id cannot be added to the store, they are not scored and counted apart
+            skipped['rows_without_id'] += int(ids.isna().sum())
+            skipped['rows_already_scored'] += int((~needed & ids.notna()).sum())
+            chunk = chunk[needed]
+        processed = {profile: preprocess_chunk(chunk, configs[profile], stats[profile], states[profile])
+                     for profile in profiles}
+        results = {}
+        for model in models:
+            rows = processed[model.profile]
+            if model.name in new:
+                rows = rows[new[model.name].reindex(rows.index, fill_value=False)]
+            if not rows.empty:
+                rows = pd.concat([rows, model.score_series(rows['text_to_analyze'], score_cache)], axis=1)
+                if store is not None:
+                    # in this thread, the store's sqlite connection belongs to it
+                    store.add_scores(model.name, model.store_version(), source, model.store_rows(rows))
+            results[model.name] = rows
+        return results
+
+    def write(results):
+        for model in models:
+            rows = results[model.name]
+            scored_rows[model.name] += len(rows)
+            if model.name in writers and not rows.empty:
+                writers[model.name].write(rows)
+        print(f"   {source}: {stats[profiles[0]]['rows_read'] + sum(skipped.values()):,} rows read, "
+              + ", ".join(f"{rows:,} scored by {name}" for name, rows in scored_rows.items()))
+
+    read_options = dict(sep=',', encoding='utf-8', on_bad_lines='skip', dtype=str)
+    if job['chunk_rows']:
+        chunks = pd.read_csv(job['input'], chunksize=job['chunk_rows'], **read_options)
+    else:
+        chunks = [pd.read_csv(job['input'], low_memory=False, **read_options)]
+    try:
+        run_overlapped(chunks, process, write)
+        for writer in writers.values():
+            writer.close()
+    finally:
+        for state in states.values():
+            if 'cache' in state:
+                state['cache'].close()
+    return stats, scored_rows, skipped
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score Reddit csv files with several sentiment models in one pass")
+    parser.add_argument("config", help="json config of the inputs, as for preprocess.py")
+    parser.add_argument("--model", action="append", required=True,
+                        help=f"model spec, repeatable: one of {', '.join(MODELS)}, options as name:key=value,...")
+    parser.add_argument("--score-cache", help="sqlite score cache, texts scored by earlier runs are not scored again")
+    parser.add_argument("--store", help="add the scores of new rows to this sentiment store instead of writing files")
+    args = parser.parse_args()
+
+    jobs, _ = load_jobs(args.config)
+    models = [load_model(spec) for spec in args.model]
+    names = [model.name for model in models]
+    if len(set(names)) != len(names):
+        parser.error(f"every model can only be used once, got {names}")
+    missing = [job['input'] for job in jobs if not os.path.exists(job['input'])]
+    for input_path in missing:
+        print(f"Warning: '{input_path}' not found, skipping.")
+    jobs = [job for job in jobs if job['input'] not in missing]
+    for job in jobs:
+        output_folder = os.path.dirname(job['output'])
+        if output_folder:
+            os.makedirs(output_folder, exist_ok=True)
+    score_cache = ScoreCache(args.score_cache) if args.score_cache else None
+    store = SentimentStore(args.store) if args.store else None
+
+    described = ", ".join(f"{model.name} ({model.model_version()})" for model in models)
+    print(f"Scoring {len(jobs)} files with {described}...")
+    started = time.time()
+    summary = []
+    for job in jobs:
+        job_started = time.time()
+        stats, scored_rows, skipped = score_job(job, models, score_cache, store)
+        summary.append((job, stats, scored_rows, skipped, time.time() - job_started))
+
+    print(f"\n--- Processing Summary ---")
+    for job, stats, scored_rows, skipped, seconds in summary:
+        skipped_rows = ""
+        if store is not None:
+            skipped_rows = (f", {skipped['rows_already_scored']:,} rows already scored, "
+                            f"{skipped['rows_without_id']:,} without a Reddit id")
+        print(f"{os.path.basename(job['input'])} in {seconds:.0f}s{skipped_rows}:")
+        for profile, profile_stats in stats.items():
+            print(f"   {profile} cleaning: {profile_stats['rows_read']:,} rows read, "
+                  f"{profile_stats['rows_after_keywords']:,} after keywords, "
+                  f"{profile_stats['rows_after_content']:,} after content/length, "
+                  f"{profile_stats['invalid_timestamps']:,} invalid timestamps")
+        for model in models:
+            result = (f"{args.store} (version {model.store_version()})" if store is not None
+                      else output_path(job, model))
+            if store is None and not scored_rows[model.name]:
+                result = "no rows left, no output file created"
+            print(f"   {model.name}: {scored_rows[model.name]:,} rows scored -> {result}")
+    if score_cache is not None:
+        print(f"\n{score_cache.hits:,} distinct texts taken from the score cache, {score_cache.misses:,} scored")
+        score_cache.close()
+    print(f"\nAll files done in {time.time() - started:.0f}s.")
+    print("\nScript finished.")
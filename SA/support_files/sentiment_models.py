@@ -0,0 +1,148 @@
+# Registry of the sentiment models, behind one batch-scoring interface so a runner (score_sentiment.py) can
+# score the same texts with several models.
+#
+# A model is a SentimentModel subclass registered under a name with @register_model("name"):
+#   profile           the text_cleaning profile its texts are cleaned with (models sharing one share the cleaning)
+#   columns           its output columns, prefixed with the model name (vader_*, finbert_*)
+#   score_batch       scores a list of cleaned texts into {column: numpy array}, in the order of the texts
+#   model_version     changes whenever the scores change, the key of its scores in a ScoreCache and a store
+#   cacheable         which scored rows may be kept in a ScoreCache (default: all)
+#   store_rows        a scored DataFrame as sentiment store rows (sentiment_store.py), the cacheable rows only
+# score_series, the same for all models, scores every distinct text of its Series once and reuses a
+# text_cache.ScoreCache. Each model deduplicates the texts it is given on its own: the texts of models with
+# different profiles are cleaned differently, and with a store every model scores its own rows.
+#
+# A new model (e.g. a distilled FinBERT) needs such a class; a transformers model with FinBERT's three labels
+# already runs as finbert with another model_name:  --model finbert:model_name=<hub name>
+#
+# Models are chosen with specs "name" or "name:option=value,option=value", e.g. finbert:backend=onnx-int8.
+
+import numpy as np
+import pandas as pd
+
+try:
+    import nltk
+except ImportError:
+    nltk = None
+
+from finbert_scoring import OUTPUT_COLUMNS, FinbertScorer
+from sentiment_store import finbert_rows, vader_rows
+from text_cache import score_series_cached
+from text_cleaning import rules_version
+from vader_batch import SCORE_COLUMNS, VaderBatchScorer
+
+MODELS = {}
+
+
+def register_model(name):
+    def register(model_class):
+        model_class.name = name
+        MODELS[name] = model_class
+        return model_class
+    return register
+
+
+def parse_model_spec(spec):
+    """Splits "name:option=value,..." into the name and the options, numbers as int/float."""
+    name, _, options_text = spec.partition(":")
+    options = {}
+    for option in filter(None, options_text.split(",")):
+        key, separator, value = option.partition("=")
+        if not separator:
+            raise ValueError(f"Model option '{option}' of '{spec}' is not key=value")
+        for convert in (int, float):
+            try:
+                value = convert(value)
+                break
+            except ValueError:
+                pass
+        options[key.strip().replace("-", "_")] = value
+    return name.strip(), options
+
+
+def load_model(spec):
+    name, options = parse_model_spec(spec)
+    if name not in MODELS:
+        raise ValueError(f"Unknown sentiment model '{name}', expected one of {', '.join(MODELS)}")
+    return MODELS[name](**options)
+
+
+class SentimentModel:
+    name = None
+    profile = "finbert"
+    columns = []
+
+    def score_batch(self, texts):
+        raise NotImplementedError
+
+    def model_version(self):
+        raise NotImplementedError
+
+    def store_version(self):
+        return self.model_version()
+
+    def cacheable(self, scores):
+        return pd.Series(True, index=scores.index)
+
+    def store_rows(self, scored):
+        raise NotImplementedError
+
+    def _score_frame(self, series):
+        return pd.DataFrame(self.score_batch(series.tolist()), index=series.index, columns=self.columns)
+
+    def score_series(self, series, cache=None):
+        """Scores a Series of cleaned texts into a DataFrame with columns and the same index."""
+        return score_series_cached(series, self._score_frame, self.model_version(), cache, self.cacheable)
+
+
+@register_model("vader")
+class VaderModel(SentimentModel):
+    profile = "vader"
+
+    def __init__(self, lexicon_file=None):
+        if lexicon_file is None and nltk is not None:
+            try:
+                nltk.data.find('sentiment/vader_lexicon.zip')
+            except LookupError:
+                nltk.download('vader_lexicon')
+        self.scorer = VaderBatchScorer(lexicon_file=lexicon_file)
+        self.columns = [f"vader_{column}" for column in SCORE_COLUMNS]
+
+    def score_batch(self, texts):
+        scores = self.scorer.score_texts(texts)
+        return {column: scores[:, index] for index, column in enumerate(self.columns)}
+
+    def model_version(self):
+        return self.scorer.model_version()
+
+    def store_version(self):
+        # as in run_vader.py, the cleaning rules are part of the VADER version of a store
+        return f"{self.model_version()}-clean-{rules_version(self.profile)[:12]}"
+
+    def store_rows(self, scored):
+        return vader_rows(scored)
+
+
+@register_model("finbert")
+class FinbertModel(SentimentModel):
+    profile = "finbert"
+
+    def __init__(self, **options):
+        self.scorer = FinbertScorer(**options)
+        self.columns = list(OUTPUT_COLUMNS)
+
+    def score_batch(self, texts):
+        labels, probabilities = self.scorer.score_texts(texts)
+        scores = {self.columns[0]: np.array(labels, dtype=object)}
+        scores.update((column, probabilities[:, index]) for index, column in enumerate(self.columns[1:]))
+        return scores
+
+    def model_version(self):
+        return self.scorer.model_version()
+
+    def cacheable(self, scores):
+        return scores[self.columns[0]] != 'error'
+
+    def store_rows(self, scored):
+        # rows the model failed on are not stored either, the next run scores them again
+        return finbert_rows(scored[self.cacheable(scored)])
@@ -0,0 +1,199 @@
+# Persistent, append-only store of sentiment scores keyed by Reddit id and model version, with daily
+# aggregates that are updated as rows are added. A refresh after extracting a new month only scores the ids
+# that are not in the store yet (missing_ids) and adds them (add_scores), instead of rescoring the history.
+#
+# Ids are Reddit fullnames taken from the link column: t3_<id> for submissions, t1_<id> for comments.
+# Every row has the scores shared by the models: negative, neutral, positive, score (the per-row sentiment the
+# daily aggregates average: vader_compound, finbert_prob_positive - finbert_prob_negative) and an optional
+# label. daily keeps per model, version, source and day the number of rows and the sum of their scores, with
+# and without the neutral rows (label 'neutral', or a score of 0 without label), the two ways the daily
+# sentiment is aggregated in data/reddit_daily_aggregation.ipynb. Rows without a prediction (FinBERT's 'no_text'
+# and 'error') are never stored: they would count as non-neutral scores of 0, and their ids would not be
+# scored again.
+#
+# Export the daily sentiment with:
+#   python sentiment_store.py sentiment.sqlite --model vader --output all_daily_vader_sentiment.csv
+
+import os
+import argparse
+import sqlite3
+
+import pandas as pd
+
+# sqlite has a limit on the number of parameters of a statement
+BATCH_ROWS = 500
+
+# labels of rows without a prediction (finbert_scoring: no text, model failed), their probabilities are all 0
+NO_PREDICTION_LABELS = ('no_text', 'error')
+
+LINK_ID_PATTERN = r'/comments/(?P<submission>[A-Za-z0-9]+)/(?:[^/]*/(?P<comment>[A-Za-z0-9]+))?'
+
+
+def reddit_ids(links):
+    """Returns the Reddit fullnames of a Series of links, NaN where the link has no id."""
+    parts = links.astype(object).str.extract(LINK_ID_PATTERN)
+    return ("t1_" + parts['comment']).fillna("t3_" + parts['submission'])
+
+
+def vader_rows(df):
+    # a scored VADER DataFrame (vader_batch / run_vader.py) as store rows
+    return pd.DataFrame({'id': reddit_ids(df['link']), 'created': df['created'], 'negative': df['vader_neg'],
+                         'neutral': df['vader_neu'], 'positive': df['vader_pos'], 'score': df['vader_compound'],
+                         'label': None}, index=df.index)
+
+
+def finbert_rows(df):
+    # a scored FinBERT DataFrame (finbert_sentiment + finbert_prob_* columns) as store rows
+    return pd.DataFrame({'id': reddit_ids(df['link']), 'created': df['created'],
+                         'negative': df['finbert_prob_negative'], 'neutral': df['finbert_prob_neutral'],
+                         'positive': df['finbert_prob_positive'],
+                         'score': df['finbert_prob_positive'] - df['finbert_prob_negative'],
+                         'label': df['finbert_sentiment']}, index=df.index)
+
+
+class SentimentStore:
+    def __init__(self, path, read_only=False):
+        if read_only:
+            self.connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=60)
+            return
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS scores (model TEXT, version TEXT, id TEXT, source TEXT, created TEXT,"
+            " negative REAL, neutral REAL, positive REAL, score REAL, label TEXT,"
+            " PRIMARY KEY (model, version, id)) WITHOUT ROWID")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS daily (model TEXT, version TEXT, source TEXT, day TEXT,"
+            " rows INTEGER, score_sum REAL, non_neutral_rows INTEGER, non_neutral_sum REAL,"
+            " PRIMARY KEY (model, version, source, day)) WITHOUT ROWID")
+        self.connection.commit()
+
+    def missing_ids(self, model, version, ids):
+        """Returns the set of ids that have no score of this model version yet."""
+        ids = list(set(ids))
+        found = set()
+        for start in range(0, len(ids), BATCH_ROWS):
+            batch = ids[start:start + BATCH_ROWS]
+            placeholders = ",".join("?" * len(batch))
+            found.update(row[0] for row in self.connection.execute(
+                f"SELECT id FROM scores WHERE model = ? AND version = ? AND id IN ({placeholders})",
+                (model, version, *batch)))
+        return set(ids) - found
+
+    def stored_scores(self, model, version, ids):
+        """Returns the stored negative, neutral, positive, score and label of the ids (indexed by id)."""
+        ids = list(set(ids))
+        batches = []
+        for start in range(0, len(ids), BATCH_ROWS):
+            batch = ids[start:start + BATCH_ROWS]
+            placeholders = ",".join("?" * len(batch))
+            batches.append(pd.read_sql_query(
+                "SELECT id, negative, neutral, positive, score, label FROM scores"
+                f" WHERE model = ? AND version = ? AND id IN ({placeholders})",
+                self.connection, params=(model, version, *batch)))
+        if not batches:
+            return pd.DataFrame(columns=['negative', 'neutral', 'positive', 'score', 'label'],
+                                index=pd.Index([], name='id'))
+        return pd.concat(batches, ignore_index=True).set_index('id')
+
+    def add_scores(self, model, version, source, rows):
+        """
+        Adds the rows (columns id, created, negative, neutral, positive, score, label) whose id is not in the
+        store yet and updates the daily aggregates with them, leaving out rows without a prediction
+        (NO_PREDICTION_LABELS), which are scored again by the next run. Returns the number of rows added.
+        """
+        rows = rows.dropna(subset=['id', 'created']).drop_duplicates(subset='id')
+        rows = rows[~rows['label'].isin(NO_PREDICTION_LABELS)]
+        rows = rows[rows['id'].isin(self.missing_ids(model, version, rows['id']))]
+        if rows.empty:
+            return 0
+        created = pd.to_datetime(rows['created'])
+        rows = rows.assign(created=created.dt.strftime("%Y-%m-%d %H:%M:%S"), day=created.dt.strftime("%Y-%m-%d"))
+        if rows['label'].notna().any():
+            neutral = rows['label'] == 'neutral'
+        else:
+            neutral = rows['score'] == 0
+        rows = rows.assign(non_neutral_score=rows['score'].where(~neutral, 0.0), non_neutral=(~neutral).astype(int))
+        daily = rows.groupby('day').agg(rows=('score', 'size'), score_sum=('score', 'sum'),
+                                        non_neutral_rows=('non_neutral', 'sum'),
+                                        non_neutral_sum=('non_neutral_score', 'sum'))
+
+        label = rows['label'].astype(object).where(rows['label'].notna(), None)
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO scores (model, version, id, source, created, negative, neutral, positive, score, label)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                zip([model] * len(rows), [version] * len(rows), rows['id'], [source] * len(rows), rows['created'],
+                    rows['negative'].astype(float), rows['neutral'].astype(float),
+                    rows['positive'].astype(float), rows['score'].astype(float), label))
+            self.connection.executemany(
+                "INSERT INTO daily (model, version, source, day, rows, score_sum, non_neutral_rows, non_neutral_sum)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (model, version, source, day) DO UPDATE SET"
+                " rows = rows + excluded.rows, score_sum = score_sum + excluded.score_sum,"
+                " non_neutral_rows = non_neutral_rows + excluded.non_neutral_rows,"
+                " non_neutral_sum = non_neutral_sum + excluded.non_neutral_sum",
+                ((model, version, source, day, int(day_rows), float(score_sum), int(non_neutral_rows),
+                  float(non_neutral_sum))
+                 for day, day_rows, score_sum, non_neutral_rows, non_neutral_sum in daily.itertuples(name=None)))
+        return len(rows)
+
+    def versions(self, model):
+        return [row[0] for row in self.connection.execute(
+            "SELECT DISTINCT version FROM daily WHERE model = ? ORDER BY version", (model,))]
+
+    def daily(self, model, version, sources=None):
+        """
+        Daily sentiment of all sources (or the given ones): rows, daily_sentiment (mean score) and
+        daily_sentiment_non_neutral (mean score of the non-neutral rows).
+        """
+        query = ("SELECT day AS date, SUM(rows) AS rows, SUM(score_sum) AS score_sum,"
+                 " SUM(non_neutral_rows) AS non_neutral_rows, SUM(non_neutral_sum) AS non_neutral_sum"
+                 " FROM daily WHERE model = ? AND version = ?")
+        parameters = [model, version]
+        if sources:
+            query += f" AND source IN ({','.join('?' * len(sources))})"
+            parameters += list(sources)
+        daily = pd.read_sql_query(query + " GROUP BY day ORDER BY day", self.connection, params=parameters)
+        daily['daily_sentiment'] = daily['score_sum'] / daily['rows']
+        daily['daily_sentiment_non_neutral'] = daily['non_neutral_sum'] / daily['non_neutral_rows'].where(
+            daily['non_neutral_rows'] > 0)
+        return daily[['date', 'rows', 'daily_sentiment', 'non_neutral_rows', 'daily_sentiment_non_neutral']]
+
+    def scores(self, model, version, since=None):
+        query = "SELECT * FROM scores WHERE model = ? AND version = ?"
+        parameters = [model, version]
+        if since is not None:
+            query += " AND created >= ?"
+            parameters.append(str(since))
+        return pd.read_sql_query(query, self.connection, params=parameters)
+
+    def close(self):
+        self.connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the daily sentiment of a sentiment store")
+    parser.add_argument("store", help="sqlite file of the sentiment store")
+    parser.add_argument("--model", required=True, help="e.g. vader or finbert")
+    parser.add_argument("--version", help="model version (default: the only one in the store)")
+    parser.add_argument("--source", action="append", help="only these input files (default: all)")
+    parser.add_argument("--output", help="csv to write (default: print)")
+    args = parser.parse_args()
+
+    store = SentimentStore(args.store, read_only=True)
+    versions = store.versions(args.model)
+    version = args.version
+    if version is None:
+        if len(versions) != 1:
+            parser.error(f"{len(versions)} versions of {args.model} in the store, choose one of {versions}")
+        version = versions[0]
+    daily = store.daily(args.model, version, args.source)
+    if args.output:
+        daily.to_csv(args.output, index=False)
+        print(f"Saved the daily {args.model} sentiment ({len(daily)} days) to:\n{args.output}")
+    else:
+        print(daily.to_string(index=False))
@@ -0,0 +1,87 @@
+# Parity tests of vader_batch.py: VaderBatchScorer.score_texts must give exactly the scores of nltk's
+# SentimentIntensityAnalyzer.polarity_scores, for every rule of VADER the batch scorer reimplements.
+# Needs the vader_lexicon nltk resource.
+#
+# Usage (in support_files): python -m unittest test_vader_batch
+
+import random
+import unittest
+
+import pandas as pd
+from nltk.sentiment.vader import SentimentIntensityAnalyzer
+
+from text_cleaning import clean_series
+from vader_batch import SCORE_COLUMNS, VaderBatchScorer, score_series
+from vader_cases import EDGE_CASES, rule_sentences
+
+CASES = {
+    "caps": ["GOOD", "good GOOD", "GOOD bad", "I LOVE IT", "I LOVE IT!", "GREAT day, AWFUL night", "BTC IS GOOD",
+             "ALL CAPS ARE NOT EMPHASIS", "Good", "gOOd", "LOL GOOD"],
+    "punctuation": ["good!", "good!!", "good!!!", "good!!!!!!", "good?", "good??", "good????", "bad!?", "bad?!?!",
+                    "great! awful?", "good.. great...", "?!?good ,bad 'great' \"awful\" good.. !!!great -bad-",
+                    "!!!", "???", "love?!?! hate!?!?"],
+    "boosters": ["very good", "extremely good", "EXTREMELY good", "very EXTREMELY good", "barely good",
+                 "hardly bad", "kinda good", "somewhat bad", "so good", "so very good", "really really great",
+                 "extremely good, barely bad, hugely disappointing", "very"],
+    "negations": ["not good", "NOT GOOD at all", "never good", "never so good", "never this good", "isn't good",
+                  "can't stand it, don't love", "aint nobody got time", "without a problem", "no problem",
+                  "no no no", "not bad not good", "it's not the worst", "don't hate", "nothing is great",
+                  "not very good", "not the worst but not great"],
+    "but": ["good but bad", "bad but GOOD!", "but", "good but", "but good", "great, but awful", "good BUT bad",
+            "love it but hate it but love it", "good but not bad"],
+    "kind of": ["this is kind of good", "kind of", "kind of bad", "kind good", "good kind of", "sort of bad",
+                "sort of", "kind of kind of good", "at least good", "very least good", "least good",
+                "the least bad"],
+    "emoticons": [":)", ":(", ":D", ":d", "<3", ":) :( :D <3", "good :)", "bad :(", "love <3", ":-)", ";)",
+                  "great :D!!!", "hate :( :("],
+    "idioms": ["yeah right", "the shit", "cut the mustard", "hand to mouth", "the bomb", "bad ass", "kiss of death",
+               "the bomb is good", "bad ass great"],
+}
+
+
+class VaderBatchParityTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        try:
+            cls.vader = SentimentIntensityAnalyzer()
+        except LookupError:
+            raise unittest.SkipTest("the vader_lexicon nltk resource is not installed")
+        cls.scorer = VaderBatchScorer(cls.vader)
+
+    def assert_parity(self, texts):
+        scores = self.scorer.score_texts(texts)
+        self.assertEqual(scores.shape, (len(texts), len(SCORE_COLUMNS)))
+        for text, row in zip(texts, scores.tolist()):
+            expected = self.vader.polarity_scores(text)
+            with self.subTest(text=text):
+                self.assertEqual(row, [expected[column] for column in SCORE_COLUMNS])
+
+    def test_rules(self):
+        for rule, texts in CASES.items():
+            with self.subTest(rule=rule):
+                self.assert_parity(texts)
+
+    def test_edge_cases(self):
+        self.assert_parity(EDGE_CASES + ["", " ", "a", "\n", "good\nbad", "   good   "])
+
+    def test_random_rule_sentences(self):
+        self.assert_parity(rule_sentences(5000, random.Random(7), self.vader))
+
+    def test_cleaned_texts(self):
+        # what run_vader.py scores: the texts cleaned with the "vader" profile
+        texts = [text for cases in CASES.values() for text in cases] + EDGE_CASES
+        self.assert_parity(clean_series(pd.Series(texts), "vader").tolist())
+
+    def test_score_series(self):
+        # distinct texts are scored once and broadcast to their rows, missing values score as empty texts
+        texts = pd.Series(["good", None, "bad but GOOD!", "good", "", "NOT GOOD at all"], index=[5, 3, 9, 1, 2, 8])
+        scores = score_series(texts, scorer=self.scorer)
+        self.assertEqual(scores.index.tolist(), texts.index.tolist())
+        self.assertEqual(scores.columns.tolist(), SCORE_COLUMNS)
+        for index, text in texts.items():
+            expected = self.vader.polarity_scores("" if pd.isna(text) else text)
+            self.assertEqual(scores.loc[index].tolist(), [expected[column] for column in SCORE_COLUMNS])
+
+
+if __name__ == "__main__":
+    unittest.main()
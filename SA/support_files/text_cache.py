@@ -0,0 +1,198 @@
+# Persistent caches keyed by the blake2b hash of a text, so texts repeated across rows, files or runs are
+# processed once:
+#   - CleanedTextCache: cleaned texts, so rerunning the preprocessing after a filter change does not clean the
+#     same texts again. Entries are keyed by the cleaning rules version (text_cleaning.rules_version, it changes
+#     with the profile, the patterns or RULES_VERSION), so an edited text is cleaned again.
+#   - ScoreCache: sentiment scores of cleaned texts keyed by the model version, so the bot replies and
+#     copypasta of Reddit are scored once (score_series_cached scores every distinct text of a Series once and
+#     broadcasts the scores to its rows, with or without a cache).
+#
+# A cache is one sqlite file, safe to share between worker processes, and both caches can live in the same
+# file. Every lookup marks the entries as used by the current run; once the entries of a cache exceed max_mb,
+# the entries of the least recently used runs are evicted.
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from text_cleaning import clean_series, rules_version
+
+
+def text_hash(text):
+    return hashlib.blake2b(text.encode('utf-8', errors='surrogatepass'), digest_size=16).digest()
+
+
+class _SqliteCache:
+    # the connection, run stamp and least recently used eviction shared by the caches; a subclass names its
+    # table, which has the columns version, hash, size and last_used
+    table = None
+    columns = None
+
+    def __init__(self, path, max_mb=2048):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} (version TEXT, hash BLOB, {self.columns}, size INTEGER,"
+            " last_used INTEGER, PRIMARY KEY (version, hash)) WITHOUT ROWID")
+        self.connection.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_last_used ON {self.table} (last_used)")
+        self.connection.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS lookup (hash BLOB PRIMARY KEY, position INTEGER) WITHOUT ROWID")
+        self.connection.commit()
+        self.max_bytes = int(max_mb * 2**20)
+        # all lookups and inserts of this run share one timestamp, the unit of eviction
+        self.run_stamp = int(time.time())
+        self.hits, self.misses = 0, 0
+
+    def _get_many(self, column, version, hashes):
+        # the hashes go to a temporary table and are looked up with one join (CROSS JOIN keeps the lookup table as
+        # the outer loop, one primary key search per hash), in the order of the hashes so the table is read in the
+        # order of its primary key
+        self.connection.execute("DELETE FROM temp.lookup")
+        self.connection.executemany("INSERT INTO temp.lookup (hash, position) VALUES (?, ?)",
+                                    sorted(zip(hashes, range(len(hashes)))))
+        values = [None] * len(hashes)
+        stale = False
+        for position, value, stamp in self.connection.execute(
+                f"SELECT lookup.position, entries.{column}, entries.last_used FROM temp.lookup"
+                f" CROSS JOIN {self.table} AS entries ON entries.version = ? AND entries.hash = lookup.hash"
+                " ORDER BY lookup.hash", (version,)):
+            values[position] = value
+            stale = stale or stamp < self.run_stamp
+        if stale:
+            # an entry is stamped once per run, all entries of a lookup in one statement
+            self.connection.execute(
+                f"UPDATE {self.table} SET last_used = ? WHERE version = ? AND hash IN (SELECT hash FROM temp.lookup)"
+                " AND last_used < ?", (self.run_stamp, version, self.run_stamp))
+        self.connection.commit()
+        return values
+
+    def _put_many(self, column, version, items):
+        # in the order of the primary key, which keeps the inserts of a large batch local in the table
+        self.connection.executemany(
+            f"INSERT OR REPLACE INTO {self.table} (version, hash, {column}, size, last_used) VALUES (?, ?, ?, ?, ?)",
+            ((version, key, value, len(value) + len(key), self.run_stamp) for key, value in sorted(items)))
+        self.connection.commit()
+
+    def size(self):
+        return self.connection.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+
+    def evict(self):
+        """Drops the least recently used entries until the cache is back under 90% of max_mb."""
+        total = self.size()
+        if total <= self.max_bytes:
+            return 0
+        evicted = 0
+        for stamp, stamp_size in self.connection.execute(
+                f"SELECT last_used, SUM(size) FROM {self.table} GROUP BY last_used ORDER BY last_used").fetchall():
+            if total <= self.max_bytes * 0.9 or stamp >= self.run_stamp:
+                break
+            evicted += self.connection.execute(f"DELETE FROM {self.table} WHERE last_used = ?", (stamp,)).rowcount
+            total -= stamp_size
+        self.connection.commit()
+        return evicted
+
+    def close(self):
+        self.evict()
+        self.connection.close()
+
+
+class CleanedTextCache(_SqliteCache):
+    table = "cleaned"
+    columns = "cleaned TEXT"
+
+    def get_many(self, version, hashes):
+        """
+        Returns the cleaned texts of the (distinct) hashes, in their order and None where a hash is not in the cache, and
+        marks them as used by this run.
+        """
+        return self._get_many("cleaned", version, hashes)
+
+    def put_many(self, version, items):
+        self._put_many("cleaned", version, items)
+
+
+class ScoreCache(_SqliteCache):
+    # the scores of a text are stored as the json list of the values of its row (labels and floats)
+    table = "scores"
+    columns = "scores TEXT"
+
+    def get_many(self, version, hashes):
+        """
+        Returns the lists of scores of the (distinct) hashes, in their order and None where a hash is not in the cache, and
+        marks them as used by this run.
+        """
+        return [scores if scores is None else json.loads(scores)
+                for scores in self._get_many("scores", version, hashes)]
+
+    def put_many(self, version, items):
+        self._put_many("scores", version, ((key, json.dumps(scores)) for key, scores in items))
+
+
+def clean_series_cached(series, profile="finbert", cache=None, engine="python", workers=1):
+    """
+    clean_series with a CleanedTextCache: only texts that are not in the cache yet are cleaned, and they are
+    added to it. Without a cache this is clean_series.
+    """
+    if cache is None:
+        return clean_series(series, profile, engine, workers)
+    version = rules_version(profile, engine)
+    texts = pd.Series([text if isinstance(text, str) else ("" if pd.isna(text) else str(text))
+                       for text in series.tolist()], dtype=object)
+    # every distinct text is looked up and cleaned once
+    codes, uniques = pd.factorize(texts)
+    uniques = uniques.tolist()
+    hashes = [text_hash(text) for text in uniques]
+    cleaned = cache.get_many(version, hashes)
+
+    missing = [position for position, text in enumerate(cleaned) if text is None]
+    if missing:
+        new_texts = clean_series(pd.Series([uniques[position] for position in missing], dtype=object), profile,
+                                 engine, workers).tolist()
+        cache.put_many(version, zip([hashes[position] for position in missing], new_texts))
+        for position, text in zip(missing, new_texts):
+            cleaned[position] = text
+    missing_rows = int(np.bincount(codes, minlength=len(uniques))[missing].sum())
+    cache.hits += len(texts) - missing_rows
+    cache.misses += missing_rows
+    return pd.Series(np.array(cleaned, dtype=object)[codes], index=series.index, dtype=object)
+
+
+def score_series_cached(series, score_frame, version=None, cache=None, cacheable=None):
+    """
+    Scores every distinct text of a Series once and broadcasts the scores to all its rows. score_frame scores a
+    Series of distinct texts into a DataFrame (one row per text). With a ScoreCache only the texts without
+    scores of this model version are scored, and their scores are added to it, except for the rows for which
+    cacheable (a function of the scores DataFrame returning a boolean mask) is False. Missing values are
+    scored as empty texts. Returns the scores with the index of the series.
+    """
+    texts = pd.Series([text if isinstance(text, str) else ("" if pd.isna(text) else str(text))
+                       for text in series.tolist()], dtype=object)
+    codes, uniques = pd.factorize(texts)
+    uniques = uniques.tolist()
+    if cache is None:
+        scores = score_frame(pd.Series(uniques, dtype=object))
+        return scores.iloc[codes].set_axis(series.index)
+
+    hashes = [text_hash(text) for text in uniques]
+    found = cache.get_many(version, hashes)
+    missing = [position for position, row in enumerate(found) if row is None]
+    scores = score_frame(pd.Series([uniques[position] for position in missing], dtype=object)).set_axis(missing)
+    keep = cacheable(scores) if cacheable is not None else pd.Series(True, index=scores.index)
+    cache.put_many(version, ((hashes[position], row) for position, row, kept
+                             in zip(missing, scores.values.tolist(), keep.tolist()) if kept))
+    cache.hits += len(uniques) - len(missing)
+    cache.misses += len(missing)
+    if len(missing) < len(uniques):
+        cached = [position for position, row in enumerate(found) if row is not None]
+        cached = pd.DataFrame([found[position] for position in cached], index=cached, columns=scores.columns)
+        scores = pd.concat([scores, cached]).sort_index() if len(scores) else cached
+    return scores.iloc[codes].set_axis(series.index)
@@ -0,0 +1,196 @@
+# Text cleaning shared by the FinBERT, VADER and plain preprocessing scripts.
+# The cleaning variants are profiles: an ordered list of steps applied to every text.
+#   finbert  lowercase, urls, u/ and r/ mentions, emojis, punctuation, whitespace
+#   vader    lowercase, urls, punctuation, whitespace
+#
+# clean_text is the row-by-row reference, identical to the functions the scripts used to define.
+# clean_series cleans a whole column in chunks: the texts of a chunk are joined with "\n" (after replacing the
+# "\n" inside them by a space, which the whitespace step does anyway) and every step runs once over the joined
+# string, so each regex is applied by one C-level call per chunk instead of one Python call per row. None of
+# the patterns can match across a "\n", so the result is identical to clean_text. ASCII texts are joined
+# separately: they cannot contain emojis and str.translate has a fast path for them, while the other texts
+# remove punctuation with a regex, which is faster than translate on non-ASCII strings. Chunks can be spread
+# over worker processes.
+#
+# engine="pyarrow" runs the steps as pyarrow.compute kernels instead. They use RE2, whose \w and \S are
+# ASCII-only, so texts with non-ASCII words or whitespace can come out slightly different; check with
+# benchmark_text_cleaning.py before using it for results.
+
+import re
+import json
+import string
+import hashlib
+from multiprocessing import Pool
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+    pc = None
+
+url_pattern = re.compile(r'http\S+|www\.\S+')
+# Match /u/username or u/username and /r/subreddit or r/subreddit. Same matches as r'\/?u\/\w+', but the
+# alternation lets the regex engine search for the literal prefix, which is about twice as fast.
+user_mention_pattern = re.compile(r'/u/\w+|u/\w+')
+subreddit_mention_pattern = re.compile(r'/r/\w+|r/\w+')
+# Comprehensive emoji pattern
+EMOJI_RANGES = (
+    u"\U0001F600-\U0001F64F"  # emoticons
+    u"\U0001F300-\U0001F5FF"  # symbols & pictographs
+    u"\U0001F680-\U0001F6FF"  # transport & map symbols
+    u"\U0001F700-\U0001F77F"  # alchemical symbols
+    u"\U0001F780-\U0001F7FF"  # Geometric Shapes Extended
+    u"\U0001F800-\U0001F8FF"  # Supplemental Arrows-C
+    u"\U0001F900-\U0001F9FF"  # Supplemental Symbols and Pictographs
+    u"\U0001FA70-\U0001FAFF"  # Symbols and Pictographs Extended-A
+    u"\U00002702-\U000027B0"  # Dingbats
+    u"\U000024C2-\U0001F251"
+)
+emoji_pattern = re.compile("[" + EMOJI_RANGES + "]+", flags=re.UNICODE)
+whitespace_pattern = re.compile(r'\s+')
+translate_table = str.maketrans('', '', string.punctuation)
+punctuation_pattern = re.compile("[" + re.escape(string.punctuation) + "]+")
+
+PATTERNS = {
+    "urls": url_pattern,
+    "user_mentions": user_mention_pattern,
+    "subreddit_mentions": subreddit_mention_pattern,
+    "emojis": emoji_pattern,
+}
+STEPS = ("lower",) + tuple(PATTERNS) + ("punctuation", "whitespace")
+
+PROFILES = {
+    "finbert": ("lower", "urls", "user_mentions", "subreddit_mentions", "emojis", "punctuation", "whitespace"),
+    "vader": ("lower", "urls", "punctuation", "whitespace"),
+}
+
+# the same steps for pyarrow.compute (RE2 syntax)
+ARROW_PATTERNS = {
+    "urls": r'http\S+|www\.\S+',
+    "user_mentions": r'/?u/\w+',
+    "subreddit_mentions": r'/?r/\w+',
+    "emojis": "[" + EMOJI_RANGES + "]+",
+    "punctuation": "[" + re.escape(string.punctuation) + "]",
+}
+
+
+# bump when a cleaning rule changes in a way the steps and patterns below do not show (cached cleaned texts
+# of text_cache.py are only reused for the same rules)
+RULES_VERSION = 1
+
+
+def rules_version(profile="finbert", engine="python"):
+    steps = get_steps(profile)
+    description = json.dumps({
+        'version': RULES_VERSION, 'engine': engine, 'steps': steps, 'punctuation': string.punctuation,
+        'patterns': {step: PATTERNS[step].pattern for step in steps if step in PATTERNS},
+    })
+    return hashlib.blake2b(description.encode(), digest_size=8).hexdigest()
+
+
+def get_steps(profile):
+    if isinstance(profile, str):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown cleaning profile '{profile}', expected one of {', '.join(PROFILES)}")
+        return PROFILES[profile]
+    unknown = [step for step in profile if step not in STEPS]
+    if unknown:
+        raise ValueError(f"Unknown cleaning steps {unknown}, expected some of {', '.join(STEPS)}")
+    return tuple(profile)
+
+
+def apply_steps(text, steps):
+    for step in steps:
+        if step == "lower":
+            text = text.lower()
+        elif step == "punctuation":
+            text = text.translate(translate_table)
+        elif step == "whitespace":
+            text = whitespace_pattern.sub(' ', text).strip()
+        else:
+            text = PATTERNS[step].sub('', text)
+    return text
+
+
+def clean_text(text, profile="finbert"):
+    """Cleans a single text, missing values become an empty string."""
+    if pd.isna(text):
+        return ""
+    return apply_steps(str(text), get_steps(profile))
+
+
+def _clean_joined(texts, steps, ascii_only):
+    joined = "\n".join(text.replace("\n", " ") for text in texts)
+    for step in steps[:-1]:
+        if step == "lower":
+            joined = joined.lower()
+        elif step == "punctuation":
+            joined = joined.translate(translate_table) if ascii_only else punctuation_pattern.sub('', joined)
+        elif step == "emojis":
+            if not ascii_only:
+                joined = emoji_pattern.sub('', joined)
+        else:
+            joined = PATTERNS[step].sub('', joined)
+    # same result as re.sub(r'\s+', ' ', text).strip(), both use the unicode whitespace definition
+    return [' '.join(text.split()) for text in joined.split("\n")]
+
+
+def clean_texts(texts, profile="finbert"):
+    """Cleans a list of strings with one pass per step over all of them, see the note at the top."""
+    steps = get_steps(profile)
+    if steps[-1:] != ("whitespace",):
+        # newlines inside the texts would be lost, or whitespace is normalized mid-way: clean row by row
+        return [apply_steps(text, steps) for text in texts]
+    cleaned = [None] * len(texts)
+    ascii_rows = [row for row, text in enumerate(texts) if text.isascii()]
+    other_rows = [row for row, text in enumerate(texts) if not text.isascii()] if len(ascii_rows) < len(texts) else []
+    for rows, ascii_only in ((ascii_rows, True), (other_rows, False)):
+        if rows:
+            for row, text in zip(rows, _clean_joined([texts[row] for row in rows], steps, ascii_only)):
+                cleaned[row] = text
+    return cleaned
+
+
+def clean_texts_arrow(texts, profile="finbert"):
+    """pyarrow.compute version of clean_texts, approximate for non-ASCII text (see the note at the top)."""
+    if pc is None:
+        raise ImportError("pyarrow is required for engine='pyarrow', install it or use engine='python'")
+    array = pa.array(texts, pa.string())
+    for step in get_steps(profile):
+        if step == "lower":
+            array = pc.utf8_lower(array)
+        elif step == "whitespace":
+            array = pc.utf8_trim_whitespace(pc.replace_substring_regex(array, r'\s+', ' '))
+        else:
+            array = pc.replace_substring_regex(array, ARROW_PATTERNS[step], '')
+    return array.to_pylist()
+
+
+def _clean_chunk(arguments):
+    texts, profile, engine = arguments
+    if engine == "pyarrow":
+        return clean_texts_arrow(texts, profile)
+    return clean_texts(texts, profile)
+
+
+def clean_series(series, profile="finbert", engine="python", workers=1, chunk_rows=100000):
+    """
+    Cleans a pandas Series of texts and returns a Series with the same index, missing values becoming "".
+    engine is "python" (exact, same output as clean_text) or "pyarrow"; with workers > 1 the chunks of
+    chunk_rows texts are cleaned in a process pool.
+    """
+    if engine not in ("python", "pyarrow"):
+        raise ValueError(f"Unknown cleaning engine '{engine}', expected python or pyarrow")
+    get_steps(profile)
+    texts = [text if isinstance(text, str) else ("" if pd.isna(text) else str(text)) for text in series.tolist()]
+    chunks = [(texts[start:start + chunk_rows], profile, engine) for start in range(0, len(texts), chunk_rows)]
+    if workers > 1 and len(chunks) > 1:
+        with Pool(workers) as pool:
+            cleaned_chunks = pool.map(_clean_chunk, chunks)
+    else:
+        cleaned_chunks = [_clean_chunk(chunk) for chunk in chunks]
+    cleaned = [text for chunk in cleaned_chunks for text in chunk]
+    return pd.Series(cleaned, index=series.index, dtype=object)
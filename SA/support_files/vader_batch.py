@@ -0,0 +1,179 @@
+# Batch VADER scoring with the same scores as nltk's SentimentIntensityAnalyzer.polarity_scores, written
+# straight into one numpy array (neg, neu, pos, compound per row) instead of one dict per row.
+#   - texts without any lexicon word are found with two set lookups and get the neutral score directly
+#   - the other texts are tokenized without SentiText's punctuation x words dictionary, and only their
+#     lexicon words go through the analyzer's own valence rules (sentiment_valence, _but_check)
+# Batches of texts can be scored in a process pool, every worker builds its analyzer once. Repeated texts are
+# scored once (text_cache.score_series_cached), optionally with a persistent ScoreCache.
+#
+# Usage in the VADER scripts:
+#   vader_df = score_series(df['text_to_analyze']).add_prefix('vader_')
+
+import string
+import hashlib
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+from text_cache import score_series_cached
+
+try:
+    import nltk
+    from nltk.sentiment.vader import SentimentIntensityAnalyzer
+except ImportError:
+    nltk = None
+    SentimentIntensityAnalyzer = None
+
+SCORE_COLUMNS = ['neg', 'neu', 'pos', 'compound']
+NEUTRAL_SCORE = (0.0, 1.0, 0.0, 0.0)
+
+PUNCTUATION = string.punctuation
+punctuation_to_space = str.maketrans(PUNCTUATION, ' ' * len(PUNCTUATION))
+
+
+class _SentiText:
+    # the two attributes of nltk's SentiText that sentiment_valence reads
+    __slots__ = ('words_and_emoticons', 'is_cap_diff')
+
+
+class VaderBatchScorer:
+    def __init__(self, analyzer=None, lexicon_file=None):
+        if analyzer is None:
+            if SentimentIntensityAnalyzer is None:
+                raise ImportError("VADER scoring needs nltk: pip install nltk")
+            analyzer = SentimentIntensityAnalyzer(lexicon_file) if lexicon_file else SentimentIntensityAnalyzer()
+        self.analyzer = analyzer
+        self.lexicon = analyzer.lexicon
+        self.lexicon_words = analyzer.lexicon.keys()
+        self.constants = analyzer.constants
+        self.punctuation_marks = set(self.constants.PUNC_LIST)
+        self.has_punctuation = self.constants.REGEX_REMOVE_PUNCTUATION.search
+        self.neutral_rows = 0
+
+    def model_version(self):
+        # changes with the nltk release (the rules) and the lexicon
+        lexicon = "\n".join(f"{word}\t{valence!r}" for word, valence in sorted(self.lexicon.items()))
+        return f"nltk-{nltk.__version__}-{hashlib.blake2b(lexicon.encode('utf-8'), digest_size=6).hexdigest()}"
+
+    def words_and_emoticons(self, text):
+        """
+        SentiText.words_and_emoticons: the tokens longer than one character, with one leading or trailing
+        mark of PUNC_LIST removed when what remains is a word without punctuation.
+        """
+        words = []
+        for word in text.split():
+            if len(word) < 2:
+                continue
+            leading, trailing = word[0] in PUNCTUATION, word[-1] in PUNCTUATION
+            if leading != trailing:
+                stripped = word.lstrip(PUNCTUATION) if leading else word.rstrip(PUNCTUATION)
+                mark = word[:len(word) - len(stripped)] if leading else word[len(stripped):]
+                if len(stripped) > 1 and mark in self.punctuation_marks and not self.has_punctuation(stripped):
+                    word = stripped
+            words.append(word)
+        return words
+
+    def has_lexicon_word(self, text):
+        # every token VADER looks up is a whitespace token or a whitespace token without its punctuation
+        lower = text.lower()
+        return not (self.lexicon_words.isdisjoint(lower.split())
+                    and self.lexicon_words.isdisjoint(lower.translate(punctuation_to_space).split()))
+
+    def score_text(self, text):
+        """Returns (neg, neu, pos, compound), equal to the values of polarity_scores(text)."""
+        if not self.has_lexicon_word(text):
+            self.neutral_rows += 1
+            if any(len(word) > 1 for word in text.split()):
+                return NEUTRAL_SCORE
+            return 0.0, 0.0, 0.0, 0.0
+
+        analyzer, lexicon = self.analyzer, self.lexicon
+        words = self.words_and_emoticons(text)
+        sentitext = _SentiText()
+        sentitext.words_and_emoticons = words
+        allcap_words = sum(1 for word in words if word.isupper())
+        sentitext.is_cap_diff = 0 < len(words) - allcap_words < len(words)
+
+        # polarity_scores scores a repeated token at its first position
+        first_index = {}
+        for index, word in enumerate(words):
+            first_index.setdefault(word, index)
+        sentiments = []
+        for item in words:
+            item_lowercase = item.lower()
+            index = first_index[item]
+            if item_lowercase not in lexicon or item_lowercase in self.constants.BOOSTER_DICT or (
+                    item_lowercase == "kind" and index < len(words) - 1 and words[index + 1].lower() == "of"):
+                sentiments.append(0)
+                continue
+            sentiments = analyzer.sentiment_valence(0, sentitext, item, index, sentiments)
+        sentiments = analyzer._but_check(words, sentiments)
+
+        # score_valence without the dict
+        if not sentiments:
+            return 0.0, 0.0, 0.0, 0.0
+        sum_s = float(sum(sentiments))
+        punct_emph_amplifier = analyzer._punctuation_emphasis(sum_s, text)
+        if sum_s > 0:
+            sum_s += punct_emph_amplifier
+        elif sum_s < 0:
+            sum_s -= punct_emph_amplifier
+        compound = self.constants.normalize(sum_s)
+        pos_sum, neg_sum, neu_count = analyzer._sift_sentiment_scores(sentiments)
+        if pos_sum > abs(neg_sum):
+            pos_sum += punct_emph_amplifier
+        elif pos_sum < abs(neg_sum):
+            neg_sum -= punct_emph_amplifier
+        total = pos_sum + abs(neg_sum) + neu_count
+        return (round(abs(neg_sum / total), 3), round(abs(neu_count / total), 3),
+                round(abs(pos_sum / total), 3), round(compound, 4))
+
+    def score_texts(self, texts):
+        """Scores a list of texts into a float64 array with the columns of SCORE_COLUMNS."""
+        scores = np.zeros((len(texts), len(SCORE_COLUMNS)), dtype=np.float64)
+        for row, text in enumerate(texts):
+            if text:
+                scores[row] = self.score_text(text)
+        return scores
+
+
+# one scorer per worker process, built by the pool initializer
+_worker_scorer = None
+
+
+def _init_worker(lexicon_file):
+    global _worker_scorer
+    _worker_scorer = VaderBatchScorer(lexicon_file=lexicon_file)
+
+
+def _score_batch(texts):
+    return _worker_scorer.score_texts(texts)
+
+
+def _score_frame(series, workers, batch_rows, lexicon_file, scorer):
+    texts = series.tolist()
+    batches = [texts[start:start + batch_rows] for start in range(0, len(texts), batch_rows)]
+    if workers > 1 and len(batches) > 1:
+        with Pool(min(workers, len(batches)), initializer=_init_worker, initargs=(lexicon_file,)) as pool:
+            scored = pool.map(_score_batch, batches)
+    else:
+        scorer = scorer or VaderBatchScorer(lexicon_file=lexicon_file)
+        scored = [scorer.score_texts(batch) for batch in batches]
+    scores = np.concatenate(scored) if scored else np.zeros((0, len(SCORE_COLUMNS)))
+    return pd.DataFrame(scores, index=series.index, columns=SCORE_COLUMNS)
+
+
+def score_series(series, workers=1, batch_rows=100000, lexicon_file=None, scorer=None, cache=None):
+    """
+    Scores a pandas Series of texts and returns a DataFrame with the columns neg, neu, pos and compound and the
+    same index, missing values scoring 0. Every distinct text is scored once; with a text_cache.ScoreCache the
+    texts scored by an earlier run of the same VADER version are taken from it. With workers > 1 the batches
+    of batch_rows texts are scored in a process pool.
+    """
+    version = None
+    if cache is not None:
+        scorer = scorer or VaderBatchScorer(lexicon_file=lexicon_file)
+        version = scorer.model_version()
+    return score_series_cached(series, lambda texts: _score_frame(texts, workers, batch_rows, lexicon_file, scorer),
+                               version, cache)
@@ -0,0 +1,35 @@
+# VADER inputs shared by the parity test (test_vader_batch.py) and benchmark_vader_batch.py, kept out of both so
+# the test does not depend on the benchmark. Only uses the standard library; rule_sentences takes the lexicon and
+# constants of the analyzer it is given.
+
+
+# texts hitting the special rules of VADER
+EDGE_CASES = [
+    "", " ", "a", "I", "GOOD", "good", "Good!!!", "not good", "NOT GOOD at all", "never so good",
+    "this is kind of good", "kind of", "at least good", "very least good", "least good", "the least bad",
+    "good but bad", "bad but GOOD!", "but", "sort of bad", "yeah right", "the shit", "cut the mustard",
+    "hand to mouth", "the bomb", "bad ass", "kiss of death", "good good good bad", ":) :( :D <3",
+    "?!?good ,bad 'great' \"awful\" good.. !!!great -bad- love?!?! hate!?!?", "can't stand it, don't love",
+    "aint nobody got time", "isn't good?? really???", "I LOVE IT! You hate it?", "no problem", "no no no",
+    "extremely good, barely bad, hugely disappointing", "EXTREMELY good", "it's not the worst",
+]
+
+
+def rule_sentences(rows, rng, vader):
+    # random sentences of lexicon words, boosters, negations and idiom words with random caps and punctuation
+    constants = vader.constants
+    vocabulary = (rng.sample(sorted(vader.lexicon), min(500, len(vader.lexicon))) + sorted(constants.BOOSTER_DICT)
+                  + sorted(constants.NEGATE) + " ".join(constants.SPECIAL_CASE_IDIOMS).split()
+                  + ["but", "BUT", "kind", "of", "least", "at", "very", "never", "so", "this", "bitcoin", "the"])
+    marks = constants.PUNC_LIST + ["", "", "", "..", "!!!!", "#", "*"]
+    sentences = []
+    for _ in range(rows):
+        words = []
+        for word in rng.choices(vocabulary, k=rng.randint(0, 25)):
+            if rng.random() < 0.1:
+                word = word.upper()
+            if rng.random() < 0.2:
+                word = rng.choice(marks) + word if rng.random() < 0.5 else word + rng.choice(marks)
+            words.append(word)
+        sentences.append(" ".join(words))
+    return sentences
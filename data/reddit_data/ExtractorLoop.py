@@ -3,13 +3,26 @@
 # The resulting files may be quite large and might not be suitable for opening in standard CSV readers like Excel.
 # credit, adjusted script Marco Hafid
 
-import zstandard
 import os
 import json
-import csv
+import time
+import argparse
+import multiprocessing
+import queue
 from datetime import datetime
 import logging.handlers
 import glob
+import itertools
+import shutil
+
+from zst_reader import plan_frame_ranges, read_lines_zst
+from record_decoding import BACKENDS, get_decoder, make_created_prefilter
+from zst_index import load_index, select_ranges
+from extraction_sinks import FILE_EXTENSIONS, OUTPUT_FORMATS, open_sink
+from extraction_checkpoint import (CHECKPOINT_SUFFIX, is_complete, load_checkpoint, load_unit_checkpoint, remove_checkpoint, save_checkpoint,
+                                   task_key, unit_outputs)
+from extraction_targets import decoder_fields, default_target, load_targets, make_target_filter, targets_for_kind
+from extraction_metrics import ExtractionMetrics, MetricsWriter, combine_snapshots, format_summary, summarize
 
 # Input and output paths
 input_folder = r"C:\Users\Leo Hubmann\Downloads\reddit\subreddits24"
@@ -19,120 +32,508 @@ log = logging.getLogger("bot")
 log.setLevel(logging.DEBUG)
 log.addHandler(logging.StreamHandler())
 
-def read_and_decode(reader, chunk_size, max_window_size, previous_chunk=None, bytes_read=0):
-    chunk = reader.read(chunk_size)
-    bytes_read += chunk_size
-    if previous_chunk is not None:
-        chunk = previous_chunk + chunk
+# Specify date range
+start_date = datetime(2021, 1, 1)
+end_date = datetime(2024, 12, 31, 23, 59, 59)
+
+# Parallel extraction: number of worker processes and compressed size of the frame ranges handed to them
+workers = 1
+split_size = 256 * 2**20
+
+# JSON decoding backend, "auto" picks simdjson or orjson when installed and falls back to the json module
+decoder_backend = "auto"
+
+# Reject lines outside the date range from the raw created_utc before decoding them
+use_prefilter = True
+
+# Use the frame index written by zst_index.py, when there is one, to only read frames overlapping the date range
+use_index = True
+
+# Output format, "csv" or "parquet" (typed columns, needs pyarrow)
+output_format = "csv"
+
+# Decompressed bytes read at a time; memory per worker stays around twice this plus the longest line
+read_chunk_size = 8 * 2**20
+
+# Seconds between checkpoints of a running unit, used by --resume after an interrupted run
+checkpoint_interval = 60
+
+DEFAULT_FIELDS = {
+    "submission": ["author", "title", "score", "created", "link", "text", "url"],
+    "comment": ["author", "score", "created", "link", "body"],
+}
+
+def get_kind(base_name):
+    # Determine if the file contains submissions or comments based on the filename
+    if 'submission' in base_name.lower():
+        return "submission"
+    elif 'comment' in base_name.lower():
+        return "comment"
+    return None
+
+def format_record(obj, fields):
+    # Values are returned typed (created as datetime), the sink decides how to write them
+    output_obj = []
+    for field in fields:
+        if field == "created":
+            value = datetime.fromtimestamp(int(obj['created_utc']))
+        elif field == "link":
+            if 'permalink' in obj:
+                value = f"https://www.reddit.com{obj['permalink']}"
+            else:
+                # For comments, construct the permalink
+                value = f"https://www.reddit.com/r/{obj.get('subreddit', '')}/comments/{obj.get('link_id', 't3_')[3:]}/_/{obj.get('id', '')}/"
+        elif field == "author":
+            value = f"u/{obj.get('author', '[deleted]')}"
+        elif field == "text":
+            value = obj.get('selftext', '')
+        else:
+            value = obj.get(field, '')
+
+        output_obj.append(value)
+    return output_obj
+
+progress_queue = None
+
+def init_worker(shared_queue):
+    global progress_queue
+    progress_queue = shared_queue
+
+def extract_range(task):
+    """
+    Extracts the lines of one input file, or of one frame range of it, into the output of every target.
+    Each line is decoded once and written to all targets whose filter it passes.
+    With a progress queue (pool workers, or the ProgressReporter of a serial run) progress is reported to it,
+    otherwise it is logged.
+    Returns the unit id and a snapshot of the unit's ExtractionMetrics.
+    """
+    input_file_path = task['input_file_path']
+    targets = task['targets']
+    range_start, range_end, first, last = task['range']
+    range_size = range_end - range_start
+    file_lines, bad_lines = 0, 0
+    line, created = None, None
+
+    # the union of the target date ranges is checked before the per-target filters
+    window_start = min(target['start_date'] for target in targets)
+    window_end = max(target['end_date'] for target in targets)
+    target_filters = [make_target_filter(target) for target in targets]
+
+    _, decode = get_decoder(task['decoder'], task['decoder_fields'])
+    prefilter = make_created_prefilter(window_start, window_end) if task['prefilter'] else None
+    skipped_lines = 0
+    metrics = ExtractionMetrics()
+    stage_seconds = metrics.stage_seconds
+    clock = time.perf_counter
+    out_of_range_lines, records_written, decompressed_bytes = 0, 0, 0
+
+    lines = read_lines_zst(input_file_path, range_start, range_end, first, last, task['read_chunk_size'],
+                           stage_seconds=stage_seconds)
+
+    key = task_key(task)
+    resume = task.get('resume')
+    if resume is not None:
+        # skip the lines before the checkpoint without decoding them
+        file_lines, bad_lines, skipped_lines = resume['lines'], resume['bad_lines'], resume['skipped_lines']
+        lines = itertools.islice(lines, file_lines, None)
+        log.info(f"Resuming {unit_outputs(task)[0]} after {file_lines:,} lines")
+    sinks = [open_sink(target['output_file_path'], target['fields'], task['output_format'],
+                       resume['output_sizes'][target_index] if resume else None)
+             for target_index, target in enumerate(targets)]
+    resumable = all(sink.resumable for sink in sinks)
+    last_checkpoint = time.time()
+    file_bytes_processed = 0
+    completed = False
+
+    def checkpoint_state(output_sizes=None):
+        return {'lines': file_lines, 'bad_lines': bad_lines, 'skipped_lines': skipped_lines,
+                'compressed_offset': range_start + min(file_bytes_processed, range_size),
+                'output_sizes': output_sizes or [sink.checkpoint() for sink in sinks]}
+
+    def metrics_snapshot():
+        metrics.counters.update(lines=file_lines, bad_lines=bad_lines, prefiltered_lines=skipped_lines,
+                                out_of_range_lines=out_of_range_lines, records_written=records_written,
+                                compressed_bytes=min(file_bytes_processed, range_size),
+                                decompressed_bytes=decompressed_bytes)
+        return metrics.snapshot()
+
     try:
-        return chunk.decode()
-    except UnicodeDecodeError:
-        if bytes_read > max_window_size:
-            raise UnicodeError(f"Unable to decode frame after reading {bytes_read:,} bytes")
-        return read_and_decode(reader, chunk_size, max_window_size, chunk, bytes_read)
-
-def read_lines_zst(file_name):
-    with open(file_name, 'rb') as file_handle:
-        buffer = ''
-        reader = zstandard.ZstdDecompressor(max_window_size=2**31).stream_reader(file_handle)
-        while True:
-            chunk = read_and_decode(reader, 2**27, (2**29) * 2)
-            if not chunk:
-                break
-            lines = (buffer + chunk).split("\n")
+        for line, file_bytes_processed in lines:
+            # progress and checkpoints are handled before the next line, when all earlier lines are written
+            if file_lines % 100000 == 0 and file_lines:
+                if progress_queue is not None:
+                    progress_queue.put((task['unit_id'], metrics_snapshot()))
+                else:
+                    created_str = created.strftime('%Y-%m-%d %H:%M:%S') if created else ''
+                    progress = (file_bytes_processed / range_size) * 100
+                    log.info(f"{created_str} : {file_lines:,} lines processed : {bad_lines:,} bad lines : {progress:.0f}% done")
+                if resumable and time.time() - last_checkpoint >= task['checkpoint_seconds']:
+                    save_checkpoint(unit_outputs(task)[0], key, checkpoint_state())
+                    last_checkpoint = time.time()
 
-            for line in lines[:-1]:
-                yield line, file_handle.tell()
+            file_lines += 1
+            decompressed_bytes += len(line) + 1
+            try:
+                started = clock()
+                if prefilter is not None and prefilter(line) is False:
+                    skipped_lines += 1
+                    stage_seconds['filter'] += clock() - started
+                    continue  # created_utc is outside the date range, no need to decode
+                decoding = clock()
+                stage_seconds['filter'] += decoding - started
 
-            buffer = lines[-1]
-        reader.close()
+                obj = decode(line)
+                created = datetime.utcfromtimestamp(int(obj['created_utc']))
+                decoded = clock()
+                stage_seconds['parse'] += decoded - decoding
 
-if __name__ == "__main__":
-    # Get list of .zst files in the input folder
-    file_list = glob.glob(os.path.join(input_folder, '*.zst'))
+                # Check if the date is within the specified range
+                if not (window_start <= created <= window_end):
+                    out_of_range_lines += 1
+                    stage_seconds['filter'] += clock() - decoded
+                    continue  # Skip lines outside the date range
 
-    # Specify date range
-    start_date = datetime(2021, 1, 1)
-    end_date = datetime(2024, 12, 31, 23, 59, 59)
+                records = {}
+                for target, matches, sink in zip(targets, target_filters, sinks):
+                    started = clock()
+                    matched = matches(obj, created)
+                    filtered = clock()
+                    stage_seconds['filter'] += filtered - started
+                    if matched:
+                        fields = tuple(target['fields'])
+                        if fields not in records:
+                            records[fields] = format_record(obj, fields)
+                        formatted = clock()
+                        stage_seconds['format'] += formatted - filtered
+                        sink.write(records[fields])
+                        stage_seconds['write'] += clock() - formatted
+                        records_written += 1
+            except KeyError as err:
+                bad_lines += 1
+                metrics.bad_line(err)
+                log.debug(f"KeyError for line {file_lines}: Missing key {err}")
+            except json.JSONDecodeError as err:
+                bad_lines += 1
+                metrics.bad_line(err)
+                log.debug(f"JSONDecodeError for line {file_lines}")
+            except Exception as err:
+                bad_lines += 1
+                metrics.bad_line(err)
+                log.debug(f"Error processing line {file_lines}: {err}")
+        completed = True
+    except Exception as err:
+        log.error(f"Error processing file {input_file_path} (bytes {range_start:,}-{range_end:,}): {err}")
+    finally:
+        started = clock()
+        for sink in sinks:
+            sink.close()
+        stage_seconds['write'] += clock() - started
+        if completed:
+            # the final sizes of the closed outputs, --resume only trusts a finished unit whose outputs match them
+            output_sizes = [os.path.getsize(output_path) for output_path in unit_outputs(task)]
+            save_checkpoint(unit_outputs(task)[0], key, {**checkpoint_state(output_sizes), 'complete': True})
+        file_bytes_processed = range_size
+        snapshot = metrics_snapshot()
+        if progress_queue is not None:
+            progress_queue.put((task['unit_id'], snapshot))
+        else:
+            log.info(f"Completed: {file_lines:,} lines processed with {bad_lines:,} bad lines for file {input_file_path}")
+            if prefilter is not None:
+                log.info(f"{skipped_lines:,} lines outside the date range were skipped before decoding")
+    return task['unit_id'], snapshot
 
-    # Ensure output directory exists
-    os.makedirs(output_folder, exist_ok=True)
+def merge_shards(shard_paths, output_file_path, keep_shards=False):
+    # Csv shards are concatenated in file order, keeping only the header of the first one.
+    # Parquet shards are written as the part files of a dataset folder and need no merging.
+    with open(output_file_path, "wb") as output_file:
+        for shard_index, shard_path in enumerate(shard_paths):
+            with open(shard_path, "rb") as shard_file:
+                header = shard_file.readline()
+                if shard_index == 0:
+                    output_file.write(header)
+                while True:
+                    block = shard_file.read(2**24)
+                    if not block:
+                        break
+                    output_file.write(block)
+            if not keep_shards:
+                os.remove(shard_path)
 
-    for input_file_path in file_list:
-        # For each file, process it
-        log.info(f"Processing file: {input_file_path}")
+def remove_stale_parts(output_file_path, shard_paths):
+    # Parquet output of an earlier run with another split that this run does not overwrite: part files (and
+    # their checkpoints) the folder would keep next to the new ones, so readers of the folder would see their
+    # rows twice, the single file where the part folder goes, or the part folder where a single file goes.
+    if os.path.isdir(output_file_path):
+        if shard_paths == [output_file_path]:
+            shutil.rmtree(output_file_path)
+            return
+        kept = {os.path.basename(shard_path) for shard_path in shard_paths}
+        for name in os.listdir(output_file_path):
+            part_name = name[1:-len(CHECKPOINT_SUFFIX)] if name.endswith(CHECKPOINT_SUFFIX) else name
+            if part_name.startswith("part") and part_name.endswith(".parquet") and part_name not in kept:
+                os.remove(os.path.join(output_file_path, name))
+    elif os.path.exists(output_file_path) and shard_paths != [output_file_path]:
+        os.remove(output_file_path)
+        remove_checkpoint(output_file_path)
 
-        # Get base filename and set output file path
+def plan_tasks(file_list, targets, settings):
+    """
+    Splits the input files into extraction units, each writing one shard per target. Returns the units and,
+    per input file, its units and the (path, shard paths, merge key) of every target output. With
+    settings['resume'], finished units are marked done and interrupted csv units carry their checkpoint.
+    """
+    tasks, outputs = [], []
+    output_format = settings['output_format']
+    for input_file_path in file_list:
         base_name = os.path.basename(input_file_path)
-        output_file_name = os.path.splitext(base_name)[0] + '.csv'
-        output_file_path = os.path.join(output_folder, output_file_name)
-
-        log.info(f"Output will be saved to: {output_file_path}")
-
-        # Determine if the file contains submissions or comments based on the filename
-        if 'submission' in base_name.lower():
-            is_submission = True
-            fields = ["author", "title", "score", "created", "link", "text", "url"]
-        elif 'comment' in base_name.lower():
-            is_submission = False
-            fields = ["author", "score", "created", "link", "body"]
-        else:
+        kind = get_kind(base_name)
+        if kind is None:
             # If the file name doesn't specify, you might want to skip or handle it differently
             log.warning(f"Unable to determine data type for file {base_name}, skipping.")
             continue  # Skip this file
+        file_targets = targets_for_kind(targets, kind)
+        if not file_targets:
+            log.info(f"{base_name}: no target applies to {kind} dumps, skipping")
+            continue
 
+        output_paths = []
+        for target in file_targets:
+            name = os.path.splitext(base_name)[0] + (f"_{target['name']}" if target['name'] else '')
+            output_paths.append(os.path.join(settings['output_folder'], name + FILE_EXTENSIONS[output_format]))
+        target_fields = [target['fields'] or DEFAULT_FIELDS[kind] for target in file_targets]
         file_size = os.stat(input_file_path).st_size
-        file_lines, bad_lines = 0, 0
-        line, created = None, None
+        target_split_size = settings['split_size']
+        window_start = min(target['start_date'] for target in file_targets)
+        window_end = max(target['end_date'] for target in file_targets)
+
+        index = load_index(input_file_path) if settings['use_index'] else None
+        if index is not None:
+            ranges = select_ranges(index, window_start, window_end, target_split_size if settings['workers'] > 1 else None)
+            selected_size = sum(end - start for start, end, _, _ in ranges)
+            log.info(f"{base_name}: frame index selects {selected_size / 2**20:,.0f} of {file_size / 2**20:,.0f} MB")
+        elif settings['workers'] > 1 and file_size > target_split_size:
+            frame_ranges = plan_frame_ranges(input_file_path, target_split_size)
+            ranges = [(start, end, index == 0, index == len(frame_ranges) - 1) for index, (start, end) in enumerate(frame_ranges)]
+        else:
+            ranges = [(0, file_size, True, True)]
+
+        if not ranges:
+            log.info(f"{base_name}: no frames overlap the date range, writing empty files")
+            for output_file_path, fields in zip(output_paths, target_fields):
+                if output_format == "parquet":
+                    remove_stale_parts(output_file_path, [output_file_path])
+                open_sink(output_file_path, fields, output_format).close()
+            continue
+        if len(ranges) == 1:
+            log.info(f"{base_name}: processed as a single unit")
+        else:
+            log.info(f"{base_name}: split into {len(ranges)} frame ranges")
+
+        file_tasks = []
+        for range_index, byte_range in enumerate(ranges):
+            unit_targets = []
+            for target, output_file_path, fields in zip(file_targets, output_paths, target_fields):
+                if len(ranges) == 1:
+                    shard_path = output_file_path
+                elif output_format == "parquet":
+                    # a folder of part files, read back with pd.read_parquet(folder)
+                    shard_path = os.path.join(output_file_path, f"part{range_index:04d}.parquet")
+                else:
+                    shard_path = f"{os.path.splitext(output_file_path)[0]}.part{range_index:04d}.csv"
+                unit_targets.append({**target, 'fields': fields, 'output_file_path': shard_path})
+            file_tasks.append({
+                'unit_id': len(tasks) + range_index,
+                'input_file_path': input_file_path,
+                'targets': unit_targets,
+                'range': byte_range,
+                'decoder': settings['decoder'],
+                'decoder_fields': decoder_fields(target_fields),
+                'prefilter': settings['prefilter'],
+                'output_format': output_format,
+                'read_chunk_size': settings['read_chunk_size'],
+                'checkpoint_seconds': settings['checkpoint_seconds'],
+            })
+        unit_keys = [task_key(task) for task in file_tasks]
+        target_outputs = []
+        for target_index, output_file_path in enumerate(output_paths):
+            shard_paths = [task['targets'][target_index]['output_file_path'] for task in file_tasks]
+            target_outputs.append((output_file_path, shard_paths, {'units': unit_keys, 'target': target_index}))
+            if output_format == "parquet":
+                remove_stale_parts(output_file_path, shard_paths)
+                if len(file_tasks) > 1:
+                    os.makedirs(output_file_path, exist_ok=True)
+
+        if settings['resume']:
+            if len(file_tasks) > 1 and all(is_complete(load_checkpoint(path, merged_key)) for path, _, merged_key in target_outputs):
+                log.info(f"{base_name}: already extracted, skipping")
+                continue
+            for task in file_tasks:
+                checkpoint = load_unit_checkpoint(task)
+                if is_complete(checkpoint):
+                    task['done'] = True
+                elif checkpoint is not None and output_format == "csv":
+                    task['resume'] = checkpoint
+        else:
+            # the outputs are written from scratch, checkpoints of an earlier run no longer describe them
+            for task in file_tasks:
+                remove_checkpoint(unit_outputs(task)[0])
+            for output_file_path, _, _ in target_outputs:
+                remove_checkpoint(output_file_path)
+
+        tasks.extend(file_tasks)
+        outputs.append((file_tasks, target_outputs))
+    return tasks, outputs
+
+class ProgressReporter:
+    # Keeps the latest snapshot of every unit; every 10 seconds the totals are logged and written as a progress
+    # event. put() takes the (unit_id, snapshot) of the workers' progress queue, so a serial run reports to it
+    # directly.
+    def __init__(self, tasks, metrics_writer):
+        self.total_bytes = sum(task['range'][1] - task['range'][0] for task in tasks) or 1
+        self.metrics_writer = metrics_writer
+        self.state = {}
+        self.started = time.time()
+        self.last_report = 0
+
+    def put(self, item):
+        unit_id, snapshot = item
+        self.state[unit_id] = snapshot
+        self.report()
+
+    def report(self):
+        if time.time() - self.last_report < 10:
+            return
+        self.last_report = time.time()
+        progress = summarize(combine_snapshots(self.state.values()), time.time() - self.started)
+        self.metrics_writer.write("progress", **progress)
+        bytes_done = progress['counters']['compressed_bytes']
+        log.info(f"{progress['counters']['lines']:,} lines processed : {progress['counters']['bad_lines']:,} bad lines : "
+                 f"{bytes_done / self.total_bytes * 100:.0f}% done : {progress['compressed_mb_per_second']:.1f} MB/s compressed")
+
+def run_serial(tasks, metrics_writer):
+    # The units run one after the other in this process and report their progress like pool workers
+    global progress_queue
+    progress_queue = ProgressReporter(tasks, metrics_writer)
+    results = []
+    try:
+        for task in tasks:
+            log.info(f"Processing file: {task['input_file_path']}")
+            log.info(f"Output will be saved to: {', '.join(unit_outputs(task))}")
+            unit_id, snapshot = extract_range(task)
+            results.append((unit_id, snapshot))
+            log.info(f"Completed: {snapshot['counters']['lines']:,} lines processed with "
+                     f"{snapshot['counters']['bad_lines']:,} bad lines for file {task['input_file_path']}")
+    finally:
+        progress_queue = None
+    return results
 
-        with open(output_file_path, "w", encoding='utf-8', newline="") as output_file:
-            writer = csv.writer(output_file)
-            writer.writerow(fields)
+def run_parallel(tasks, num_workers, metrics_writer):
+    # Workers report (unit_id, metrics snapshot) to one queue, the main process shows and records the totals
+    reporter = ProgressReporter(tasks, metrics_writer)
+    shared_queue = multiprocessing.Queue()
+    started = time.time()
 
+    with multiprocessing.Pool(num_workers, initializer=init_worker, initargs=(shared_queue,)) as pool:
+        result = pool.map_async(extract_range, tasks, chunksize=1)
+        while True:
             try:
-                for line, file_bytes_processed in read_lines_zst(input_file_path):
-                    file_lines += 1
-                    try:
-                        obj = json.loads(line)
-                        created = datetime.utcfromtimestamp(int(obj['created_utc']))
-
-                        # Check if the date is within the specified range
-                        if not (start_date <= created <= end_date):
-                            continue  # Skip lines outside the date range
-
-                        output_obj = []
-                        for field in fields:
-                            if field == "created":
-                                value = datetime.fromtimestamp(int(obj['created_utc'])).strftime("%Y-%m-%d %H:%M")
-                            elif field == "link":
-                                if 'permalink' in obj:
-                                    value = f"https://www.reddit.com{obj['permalink']}"
-                                else:
-                                    # For comments, construct the permalink
-                                    value = f"https://www.reddit.com/r/{obj.get('subreddit', '')}/comments/{obj.get('link_id', 't3_')[3:]}/_/{obj.get('id', '')}/"
-                            elif field == "author":
-                                value = f"u/{obj.get('author', '[deleted]')}"
-                            elif field == "text":
-                                value = obj.get('selftext', '')
-                            else:
-                                value = obj.get(field, '')
-
-                            output_obj.append(str(value).encode("utf-8", errors='replace').decode())
-                        writer.writerow(output_obj)
-                    except KeyError as err:
-                        bad_lines += 1
-                        log.debug(f"KeyError for line {file_lines}: Missing key {err}")
-                    except json.JSONDecodeError:
-                        bad_lines += 1
-                        log.debug(f"JSONDecodeError for line {file_lines}")
-                    except Exception as err:
-                        bad_lines += 1
-                        log.debug(f"Error processing line {file_lines}: {err}")
-                    if file_lines % 100000 == 0:
-                        created_str = created.strftime('%Y-%m-%d %H:%M:%S') if created else ''
-                        progress = (file_bytes_processed / file_size) * 100
-                        log.info(f"{created_str} : {file_lines:,} lines processed : {bad_lines:,} bad lines : {progress:.0f}% done")
-            except Exception as err:
-                log.error(f"Error processing file {input_file_path}: {err}")
-            finally:
-                log.info(f"Completed: {file_lines:,} lines processed with {bad_lines:,} bad lines for file {input_file_path}")
+                reporter.put(shared_queue.get(timeout=1))
+            except queue.Empty:
+                reporter.report()
+            if result.ready() and shared_queue.empty():
+                break
+        results = result.get()
+
+    total = combine_snapshots(snapshot for _, snapshot in results)
+    log.info(f"Completed: {total['counters']['lines']:,} lines processed with {total['counters']['bad_lines']:,} bad lines "
+             f"in {time.time() - started:.0f}s using {num_workers} workers")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert Reddit .zst dumps to .csv files")
+    parser.add_argument("--input-folder", default=input_folder)
+    parser.add_argument("--output-folder", default=output_folder)
+    parser.add_argument("--workers", type=int, default=workers,
+                        help="worker processes; several files and the frames of one large file are extracted in parallel")
+    parser.add_argument("--split-size-mb", type=int, default=split_size // 2**20,
+                        help="compressed size of the frame ranges a large file is split into")
+    parser.add_argument("--decoder", choices=("auto",) + BACKENDS, default=decoder_backend,
+                        help="JSON decoding backend, simdjson only extracts the fields written to the csv")
+    parser.add_argument("--no-prefilter", action="store_true",
+                        help="decode every line instead of rejecting out-of-range lines from the raw created_utc")
+    parser.add_argument("--no-index", action="store_true", help="ignore frame indexes written by zst_index.py")
+    parser.add_argument("--targets", help="json file declaring several filtered outputs, see extraction_targets.py")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default=output_format,
+                        help="csv, or parquet with typed, dictionary-encoded columns written in row groups "
+                             "(an interrupted parquet unit cannot be resumed, --resume extracts it again)")
+    parser.add_argument("--read-chunk-mb", type=int, default=read_chunk_size // 2**20,
+                        help="decompressed MB read at a time, bounds the memory of each worker")
+    parser.add_argument("--checkpoint-seconds", type=int, default=checkpoint_interval,
+                        help="seconds between checkpoints of a running unit")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip finished units and continue interrupted csv units from their last checkpoint "
+                             "(interrupted parquet units start over)")
+    parser.add_argument("--keep-shards", action="store_true", help="keep the per-range csv shards after merging")
+    parser.add_argument("--metrics", help="append per-unit, progress and summary metrics as json lines to this file")
+    args = parser.parse_args()
+
+    # Get list of .zst files in the input folder
+    file_list = glob.glob(os.path.join(args.input_folder, '*.zst'))
+
+    # Ensure output directory exists
+    os.makedirs(args.output_folder, exist_ok=True)
+
+    decoder_name, _ = get_decoder(args.decoder)
+    log.info(f"Using {decoder_name} decoder")
+    settings = {
+        'output_folder': args.output_folder,
+        'workers': args.workers,
+        'split_size': args.split_size_mb * 2**20,
+        'decoder': decoder_name,
+        'prefilter': not args.no_prefilter and use_prefilter,
+        'use_index': not args.no_index and use_index,
+        'output_format': args.format,
+        'read_chunk_size': args.read_chunk_mb * 2**20,
+        'checkpoint_seconds': args.checkpoint_seconds,
+        'resume': args.resume,
+    }
+    if args.targets:
+        targets = load_targets(args.targets, start_date, end_date)
+        log.info(f"Extracting {len(targets)} targets in one pass: {', '.join(target['name'] for target in targets)}")
+    else:
+        targets = [default_target(start_date, end_date)]
+    tasks, outputs = plan_tasks(file_list, targets, settings)
+    pending = [task for task in tasks if not task.get('done')]
+    if len(pending) < len(tasks):
+        log.info(f"Resuming: {len(tasks) - len(pending)} of {len(tasks)} units already finished")
+
+    metrics_writer = MetricsWriter(args.metrics)
+    run_started = time.time()
+    if args.workers <= 1:
+        results = run_serial(pending, metrics_writer)
+    else:
+        results = run_parallel(pending, args.workers, metrics_writer)
+
+    task_by_id = {task['unit_id']: task for task in pending}
+    for unit_id, snapshot in results:
+        metrics_writer.write("unit", unit_id=unit_id, input_file_path=task_by_id[unit_id]['input_file_path'],
+                             range=list(task_by_id[unit_id]['range']), **snapshot)
+    summary = summarize(combine_snapshots(snapshot for _, snapshot in results), time.time() - run_started)
+    metrics_writer.write("summary", workers=args.workers, decoder=decoder_name, **summary)
+    metrics_writer.close()
+    for summary_line in format_summary(summary):
+        log.info(summary_line)
+
+    for file_tasks, target_outputs in outputs:
+        if len(file_tasks) == 1 or args.format != "csv":
+            continue
+        if not all(is_complete(load_unit_checkpoint(task)) for task in file_tasks):
+            log.warning(f"Not merging {file_tasks[0]['input_file_path']}, some shards did not finish; rerun with --resume")
+            continue
+        for output_file_path, shard_paths, merged_key in target_outputs:
+            merge_shards(shard_paths, output_file_path, args.keep_shards)
+            save_checkpoint(output_file_path, merged_key,
+                            {'complete': True, 'output_sizes': [os.path.getsize(output_file_path)]})
+            log.info(f"Merged {len(shard_paths)} shards into {output_file_path}")
+        for task in file_tasks:
+            remove_checkpoint(unit_outputs(task)[0])
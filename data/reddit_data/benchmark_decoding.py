@@ -0,0 +1,61 @@
+# Benchmark of the per-line decoding step of ExtractorLoop.py on a synthetic Reddit dump.
+# Compares the original path (json.loads of the full line) with every installed decoding backend (only simdjson
+# skips the unused fields), each followed by the same csv field formatting, and prints lines/sec.
+
+import argparse
+import json
+import random
+import time
+
+from ExtractorLoop import format_record
+from record_decoding import available_backends, get_decoder
+
+COMMENT_FIELDS = ["author", "score", "created", "link", "body"]
+
+
+def synthetic_comment(index, rng):
+    # Roughly the shape of a pushshift comment line: a few used fields and many unused ones
+    obj = {
+        "all_awardings": [], "archived": False, "associated_award": None, "author": f"user{index % 5000}",
+        "author_flair_background_color": None, "author_flair_css_class": None, "author_flair_richtext": [],
+        "author_flair_template_id": None, "author_flair_text": None, "author_flair_text_color": None,
+        "author_flair_type": "text", "author_fullname": f"t2_{index:x}", "author_patreon_flair": False,
+        "author_premium": False, "awarders": [], "body": " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 60))),
+        "can_gild": True, "can_mod_post": False, "collapsed": False, "collapsed_because_crowd_control": None,
+        "collapsed_reason": None, "controversiality": 0, "created_utc": 1609459200 + index * 7,
+        "distinguished": None, "edited": False, "gilded": 0, "gildings": {}, "id": f"g{index:x}",
+        "is_submitter": False, "link_id": f"t3_k{index // 50:x}", "locked": False, "no_follow": True,
+        "parent_id": f"t1_g{max(index - 1, 0):x}", "permalink": f"/r/Bitcoin/comments/k{index // 50:x}/_/g{index:x}/",
+        "retrieved_on": 1609459300 + index * 7, "score": rng.randint(-10, 500), "send_replies": True,
+        "stickied": False, "subreddit": "Bitcoin", "subreddit_id": "t5_2s3qj", "subreddit_name_prefixed": "r/Bitcoin",
+        "subreddit_type": "public", "top_awarded_type": None, "total_awards_received": 0, "treatment_tags": [],
+    }
+    return json.dumps(obj)
+
+
+WORDS = ["bitcoin", "btc", "moon", "hodl", "price", "dump", "buy", "sell", "the", "is", "to", "and", "ü", "€"]
+
+
+def run(label, decode, lines):
+    started = time.perf_counter()
+    for line in lines:
+        format_record(decode(line), COMMENT_FIELDS)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<24} {len(lines) / elapsed:>12,.0f} lines/sec")
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark line decoding backends")
+    parser.add_argument("--lines", type=int, default=200000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    lines = [synthetic_comment(index, rng).encode() for index in range(args.lines)]
+    print(f"{args.lines:,} synthetic comment lines, {sum(map(len, lines)) / 2**20:.0f} MB")
+
+    baseline = run("json.loads (current)", json.loads, lines)
+    for backend in available_backends():
+        _, decode = get_decoder(backend)
+        elapsed = run(f"{backend} decoder", decode, lines)
+        print(f"{'':<24} {baseline / elapsed:>12.2f}x")
@@ -0,0 +1,93 @@
+# Memory and throughput benchmark of the .zst line readers on a synthetic dump.
+# Compares the original read_and_decode/read_lines_zst (kept below for reference) with zst_reader.read_lines_zst
+# at several chunk sizes. Peak memory is the peak of Python allocations measured with tracemalloc; the zstd
+# decompression window (up to 2 GiB for --long=31 dumps) comes on top of it for every reader alike.
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import zstandard
+
+from zst_reader import read_lines_zst
+
+
+def legacy_read_and_decode(reader, chunk_size, max_window_size, previous_chunk=None, bytes_read=0):
+    chunk = reader.read(chunk_size)
+    bytes_read += chunk_size
+    if previous_chunk is not None:
+        chunk = previous_chunk + chunk
+    try:
+        return chunk.decode()
+    except UnicodeDecodeError:
+        if bytes_read > max_window_size:
+            raise UnicodeError(f"Unable to decode frame after reading {bytes_read:,} bytes")
+        return legacy_read_and_decode(reader, chunk_size, max_window_size, chunk, bytes_read)
+
+
+def legacy_read_lines_zst(file_name):
+    with open(file_name, 'rb') as file_handle:
+        buffer = ''
+        reader = zstandard.ZstdDecompressor(max_window_size=2**31).stream_reader(file_handle)
+        while True:
+            chunk = legacy_read_and_decode(reader, 2**27, (2**29) * 2)
+            if not chunk:
+                break
+            lines = (buffer + chunk).split("\n")
+
+            for line in lines[:-1]:
+                yield line, file_handle.tell()
+
+            buffer = lines[-1]
+        reader.close()
+
+
+def write_synthetic_dump(file_name, size):
+    rng = random.Random(7)
+    words = ["bitcoin", "btc", "moon", "hodl", "price", "ü", "€", "the", "is"]
+    compressor = zstandard.ZstdCompressor(level=3)
+    written = 0
+    with open(file_name, "wb") as output_file, compressor.stream_writer(output_file) as writer:
+        index = 0
+        while written < size:
+            line = json.dumps({
+                "author": f"user{index}", "created_utc": 1609459200 + index, "score": rng.randint(0, 99),
+                "body": " ".join(rng.choice(words) for _ in range(rng.randint(5, 200))),
+                "permalink": f"/r/Bitcoin/comments/x/_/c{index}/",
+            }, ensure_ascii=False).encode() + b"\n"
+            writer.write(line)
+            written += len(line)
+            index += 1
+    return written
+
+
+def run(label, lines):
+    tracemalloc.start()
+    started = time.perf_counter()
+    count, size = 0, 0
+    for line, _ in lines:
+        count += 1
+        size += len(line) + 1
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {count:>10,} lines {size / elapsed / 2**20:>8.0f} MB/s {peak / 2**20:>8.0f} MB peak")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark .zst line readers")
+    parser.add_argument("--size-mb", type=int, default=512, help="decompressed size of the synthetic dump")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        file_name = os.path.join(folder, "synthetic_comments.zst")
+        decompressed = write_synthetic_dump(file_name, args.size_mb * 2**20)
+        print(f"synthetic dump: {decompressed / 2**20:.0f} MB decompressed, {os.stat(file_name).st_size / 2**20:.0f} MB compressed")
+
+        run("legacy (128 MiB str chunks)", legacy_read_lines_zst(file_name))
+        for chunk_mb in (1, 8, 32):
+            run(f"read_lines_zst ({chunk_mb} MiB)", read_lines_zst(file_name, chunk_size=chunk_mb * 2**20))
@@ -0,0 +1,97 @@
+# Checkpoints of ExtractorLoop.py units (a whole dump or one frame range of it), stored next to the unit's
+# output as a hidden .<output name>.ckpt.json so parquet dataset readers ignore it. A checkpoint holds the
+# number of lines consumed, the bad/skipped line counts, the compressed byte offset reached and the size of
+# the output at that point, so a killed run can truncate the output back to the checkpoint and continue
+# with --resume.
+#
+# Decompression cannot restart in the middle of a zstd frame, so a resumed unit decompresses and splits its
+# range again from the start but skips the lines before the checkpoint without decoding, filtering or
+# writing them. That part runs at decompression speed, a small fraction of the original cost.
+
+import json
+import logging
+import os
+
+log = logging.getLogger("bot")
+
+CHECKPOINT_SUFFIX = ".ckpt.json"
+
+
+def checkpoint_path(output_file_path):
+    folder, name = os.path.split(output_file_path)
+    return os.path.join(folder, "." + name + CHECKPOINT_SUFFIX)
+
+
+def unit_outputs(task):
+    # a unit writes one output per target, its checkpoint is stored next to the first one
+    return [target['output_file_path'] for target in task['targets']]
+
+
+def task_key(task):
+    # what must not change between the interrupted run and the resumed one
+    return {
+        'input_file_path': os.path.abspath(task['input_file_path']),
+        'range': list(task['range']),
+        'targets': [{
+            'name': target['name'],
+            'fields': list(target['fields']),
+            'start_date': target['start_date'].isoformat(),
+            'end_date': target['end_date'].isoformat(),
+            'subreddits': target['subreddits'],
+            'keywords': target['keywords'],
+            'min_score': target['min_score'],
+            'output_file_path': os.path.abspath(target['output_file_path']),
+        } for target in task['targets']],
+        'output_format': task['output_format'],
+    }
+
+
+def save_checkpoint(output_file_path, key, state):
+    path = checkpoint_path(output_file_path)
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "w", encoding='utf-8') as checkpoint_file:
+        json.dump({'task': key, **state}, checkpoint_file)
+    os.replace(temporary_path, path)
+
+
+def load_checkpoint(output_file_path, key, output_paths=None):
+    """
+    Returns the checkpoint stored next to an output if it belongs to the same task and all outputs it covers
+    (default: just that output) are still there and at least as long as when the checkpoint was written, or
+    exactly as long for a complete checkpoint.
+    """
+    path = checkpoint_path(output_file_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as checkpoint_file:
+        checkpoint = json.load(checkpoint_file)
+    if checkpoint.get('task') != key:
+        log.warning(f"Checkpoint {path} was written for different settings, starting over")
+        return None
+    output_paths = output_paths or [output_file_path]
+    if not all(os.path.exists(output_path) for output_path in output_paths):
+        return None
+    complete = bool(checkpoint.get('complete'))
+    for output_path, output_size in zip(output_paths, checkpoint.get('output_sizes') or []):
+        if output_size is None:
+            continue
+        size = os.path.getsize(output_path)
+        # a finished output must be exactly as written, e.g. not truncated by a later run without --resume
+        if size != output_size if complete else size < output_size:
+            log.warning(f"Output {output_path} does not match its checkpoint, starting over")
+            return None
+    return checkpoint
+
+
+def load_unit_checkpoint(task):
+    return load_checkpoint(unit_outputs(task)[0], task_key(task), unit_outputs(task))
+
+
+def is_complete(checkpoint):
+    return checkpoint is not None and bool(checkpoint.get('complete'))
+
+
+def remove_checkpoint(output_file_path):
+    path = checkpoint_path(output_file_path)
+    if os.path.exists(path):
+        os.remove(path)
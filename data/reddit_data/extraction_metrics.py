@@ -0,0 +1,102 @@
+# Counters and per-stage timers of ExtractorLoop.py.
+# Every unit keeps an ExtractionMetrics and reports cumulative snapshots of it; the main process sums the
+# latest snapshot of every unit, writes them as json lines to the --metrics file and logs a final summary.
+# Stages: decompress (zstd), split (cutting the stream into lines), parse (json), filter (prefilter, date
+# range and target filters), format (building the output records) and write (csv/parquet sinks).
+
+import json
+import time
+from collections import Counter
+from datetime import datetime
+
+STAGES = ("decompress", "split", "parse", "filter", "format", "write")
+COUNTERS = ("lines", "bad_lines", "prefiltered_lines", "out_of_range_lines", "records_written",
+            "compressed_bytes", "decompressed_bytes")
+
+
+class ExtractionMetrics:
+    def __init__(self):
+        self.started = time.time()
+        self.stage_seconds = dict.fromkeys(STAGES, 0.0)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.bad_line_types = Counter()
+
+    def bad_line(self, err):
+        # the bad line count itself is kept by the caller, this breaks it down by error
+        if isinstance(err, KeyError):
+            self.bad_line_types[f"KeyError {err}"] += 1
+        else:
+            self.bad_line_types[type(err).__name__] += 1
+
+    def snapshot(self):
+        return {
+            'elapsed': time.time() - self.started,
+            'counters': dict(self.counters),
+            'stage_seconds': dict(self.stage_seconds),
+            'bad_line_types': dict(self.bad_line_types),
+        }
+
+
+def combine_snapshots(snapshots):
+    """Sums unit snapshots; elapsed is the longest unit's, the wall time is the caller's business."""
+    total = {'elapsed': 0.0, 'counters': dict.fromkeys(COUNTERS, 0),
+             'stage_seconds': dict.fromkeys(STAGES, 0.0), 'bad_line_types': Counter()}
+    for snapshot in snapshots:
+        total['elapsed'] = max(total['elapsed'], snapshot['elapsed'])
+        for name, value in snapshot['counters'].items():
+            total['counters'][name] += value
+        for name, value in snapshot['stage_seconds'].items():
+            total['stage_seconds'][name] += value
+        total['bad_line_types'].update(snapshot['bad_line_types'])
+    total['bad_line_types'] = dict(total['bad_line_types'])
+    return total
+
+
+def format_summary(summary):
+    stage_share = ", ".join(f"{name} {share * 100:.0f}%" for name, share in summary['stage_share'].items())
+    lines = [
+        f"{summary['counters']['lines']:,} lines in {summary['wall_seconds']:.0f}s : "
+        f"{summary['lines_per_second']:,.0f} lines/s : {summary['compressed_mb_per_second']:.1f} MB/s compressed : "
+        f"{summary['decompressed_mb_per_second']:.1f} MB/s decompressed",
+        f"{summary['counters']['records_written']:,} records written : "
+        f"{summary['counters']['prefiltered_lines']:,} lines prefiltered : "
+        f"{summary['counters']['out_of_range_lines']:,} lines outside the date range",
+        f"Time per stage: {stage_share}",
+    ]
+    if summary['bad_line_types']:
+        bad_lines = ", ".join(f"{name}: {count:,}" for name, count in
+                              sorted(summary['bad_line_types'].items(), key=lambda item: -item[1]))
+        lines.append(f"{summary['counters']['bad_lines']:,} bad lines ({bad_lines})")
+    return lines
+
+
+def summarize(total, wall_seconds):
+    counters = total['counters']
+    wall_seconds = max(wall_seconds, 1e-9)
+    busy_seconds = sum(total['stage_seconds'].values()) or 1e-9
+    return {
+        'wall_seconds': wall_seconds,
+        'lines_per_second': counters['lines'] / wall_seconds,
+        'compressed_mb_per_second': counters['compressed_bytes'] / wall_seconds / 2**20,
+        'decompressed_mb_per_second': counters['decompressed_bytes'] / wall_seconds / 2**20,
+        'stage_share': {name: seconds / busy_seconds for name, seconds in total['stage_seconds'].items()},
+        **total,
+    }
+
+
+class MetricsWriter:
+    """Appends metrics as json lines to a file, or does nothing without a path."""
+
+    def __init__(self, path=None):
+        self.metrics_file = open(path, "a", encoding='utf-8') if path else None
+
+    def write(self, event, **values):
+        if self.metrics_file is None:
+            return
+        record = {'event': event, 'time': datetime.now().isoformat(timespec='seconds'), **values}
+        self.metrics_file.write(json.dumps(record) + "\n")
+        self.metrics_file.flush()
+
+    def close(self):
+        if self.metrics_file is not None:
+            self.metrics_file.close()
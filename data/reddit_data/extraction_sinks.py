@@ -0,0 +1,131 @@
+# Output sinks for ExtractorLoop.py. A record is the list of values of the output fields as returned by
+# format_record: created is a datetime, score is the raw json value and everything else is text.
+# CsvSink writes them exactly like the original csv output. ParquetSink writes typed columns in row-group
+# batches: int score, timestamp created and the written DICTIONARY_FIELDS dictionary-encoded.
+
+import csv
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+OUTPUT_FORMATS = ("csv", "parquet")
+FILE_EXTENSIONS = {"csv": ".csv", "parquet": ".parquet"}
+
+# text fields with few distinct values; the default fields only have author, a target's fields (e.g. in
+# extraction_targets.example.json) can add subreddit
+DICTIONARY_FIELDS = ("author", "subreddit")
+
+
+class CsvSink:
+    resumable = True
+
+    def __init__(self, path, fields, resume_size=None):
+        self.fields = fields
+        if resume_size is None:
+            self.output_file = open(path, "w", encoding='utf-8', newline="")
+            self.writer = csv.writer(self.output_file)
+            self.writer.writerow(fields)
+        else:
+            # drop whatever was written after the checkpoint and continue from there
+            os.truncate(path, resume_size)
+            self.output_file = open(path, "a", encoding='utf-8', newline="")
+            self.writer = csv.writer(self.output_file)
+
+    def write(self, record):
+        output_obj = []
+        for field, value in zip(self.fields, record):
+            if field == "created":
+                value = value.strftime("%Y-%m-%d %H:%M")
+            output_obj.append(str(value).encode("utf-8", errors='replace').decode())
+        self.writer.writerow(output_obj)
+
+    def checkpoint(self):
+        # size of the output once everything written so far is on disk
+        self.output_file.flush()
+        os.fsync(self.output_file.fileno())
+        return os.fstat(self.output_file.fileno()).st_size
+
+    def close(self):
+        self.output_file.close()
+
+
+def to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def to_text(value):
+    if value is None:
+        return None
+    return str(value).encode("utf-8", errors='replace').decode()
+
+
+class ParquetSink:
+    # a parquet file is only readable once its footer is written, so a partial file cannot be resumed
+    resumable = False
+
+    def __init__(self, path, fields, batch_rows=500000):
+        if pa is None:
+            raise ImportError("pyarrow is required for parquet output, install it or use --format csv")
+        self.fields = fields
+        self.batch_rows = batch_rows
+        self.schema = pa.schema([pa.field(field, self.field_type(field)) for field in fields])
+        self.writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+        self.columns = [[] for _ in fields]
+
+    @staticmethod
+    def field_type(field):
+        if field == "score":
+            return pa.int64()
+        if field == "created":
+            return pa.timestamp('s')
+        if field in DICTIONARY_FIELDS:
+            return pa.dictionary(pa.int32(), pa.string())
+        return pa.string()
+
+    def write(self, record):
+        for column, field, value in zip(self.columns, self.fields, record):
+            if field == "score":
+                value = to_int(value)
+            elif field != "created":
+                value = to_text(value)
+            column.append(value)
+        if len(self.columns[0]) >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        if not self.columns[0]:
+            return
+        arrays = []
+        for column, schema_field in zip(self.columns, self.schema):
+            if pa.types.is_dictionary(schema_field.type):
+                arrays.append(pa.array(column, pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array(column, schema_field.type))
+        # one row group per batch
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+        self.columns = [[] for _ in self.fields]
+
+    def checkpoint(self):
+        return None
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+def open_sink(path, fields, output_format="csv", resume_size=None):
+    if output_format == "csv":
+        return CsvSink(path, fields, resume_size)
+    if output_format == "parquet":
+        if resume_size is not None:
+            raise ValueError("Parquet output cannot be resumed from a checkpoint")
+        return ParquetSink(path, fields)
+    raise ValueError(f"Unknown output format '{output_format}', expected one of {', '.join(OUTPUT_FORMATS)}")
@@ -0,0 +1,103 @@
+# Output targets of ExtractorLoop.py. A dump is decompressed and decoded once and every record is routed to
+# each target whose filter it passes, so several date windows, subreddits or field lists cost a single pass.
+#
+# Targets are declared in a json file passed with --targets, see extraction_targets.example.json:
+#   name        appended to the output file name: <dump name>_<name>.csv
+#   kind        "submission" or "comment", the target is only applied to dumps of that kind (default: both)
+#   start_date  first created_utc included, ISO format, UTC (default: the extractor's start_date); a date with an
+#               offset (+01:00, Z) is converted to UTC
+#   end_date    last created_utc included (default: the extractor's end_date)
+#   subreddits  only records from these subreddits (case-insensitive)
+#   keywords    only records whose title, text or body contains one of these words (case-insensitive)
+#   min_score   only records with at least this score
+#   fields      output fields (default: the extractor's fields for the kind of dump)
+# Without --targets the extractor runs a single unnamed target with its default date range and fields.
+
+import json
+import re
+from datetime import datetime, timezone
+
+from record_decoding import PROJECTED_FIELDS
+
+KINDS = ("submission", "comment")
+TARGET_KEYS = ("name", "kind", "start_date", "end_date", "subreddits", "keywords", "min_score", "fields")
+
+# output fields that are computed from other json keys by format_record
+DERIVED_FIELDS = {"created": ("created_utc",), "link": ("permalink", "subreddit", "link_id", "id"), "text": ("selftext",)}
+TEXT_FIELDS = ("title", "selftext", "body")
+
+
+def default_target(start_date, end_date):
+    return {'name': None, 'kind': None, 'start_date': start_date, 'end_date': end_date,
+            'subreddits': None, 'keywords': None, 'min_score': None, 'fields': None}
+
+
+def load_targets(config_path, start_date, end_date):
+    with open(config_path, encoding='utf-8') as config_file:
+        config = json.load(config_file)
+
+    targets, names = [], set()
+    for entry in config['targets']:
+        unknown = set(entry) - set(TARGET_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown target settings {sorted(unknown)} in {config_path}")
+        if not entry.get('name'):
+            raise ValueError(f"Every target in {config_path} needs a name")
+        if entry['name'] in names:
+            raise ValueError(f"Duplicate target name '{entry['name']}' in {config_path}")
+        names.add(entry['name'])
+        if entry.get('kind') not in (None,) + KINDS:
+            raise ValueError(f"Target '{entry['name']}': kind must be one of {', '.join(KINDS)}")
+
+        target = default_target(start_date, end_date)
+        target.update(entry)
+        for key in ("start_date", "end_date"):
+            if isinstance(target[key], str):
+                target[key] = datetime.fromisoformat(target[key])
+            if target[key].tzinfo is not None:
+                # records are compared as naive UTC datetimes
+                target[key] = target[key].astimezone(timezone.utc).replace(tzinfo=None)
+        targets.append(target)
+    return targets
+
+
+def targets_for_kind(targets, kind):
+    return [target for target in targets if target['kind'] in (None, kind)]
+
+
+def decoder_fields(fields_lists):
+    # json keys the decoder has to extract for all output fields of all targets
+    keys = set(PROJECTED_FIELDS)
+    for fields in fields_lists:
+        for field in fields:
+            keys.update(DERIVED_FIELDS.get(field, (field,)))
+    return tuple(sorted(keys))
+
+
+def make_target_filter(target):
+    """Returns matches(obj, created) for one target, created being the record's naive UTC datetime."""
+    start_date, end_date = target['start_date'], target['end_date']
+    checks = []
+
+    if target['subreddits']:
+        subreddits = {subreddit.lower() for subreddit in target['subreddits']}
+        checks.append(lambda obj: str(obj.get('subreddit', '')).lower() in subreddits)
+
+    if target['min_score'] is not None:
+        min_score = target['min_score']
+
+        def score_check(obj):
+            try:
+                return int(obj.get('score', 0)) >= min_score
+            except (TypeError, ValueError):
+                return False
+        checks.append(score_check)
+
+    if target['keywords']:
+        keyword_pattern = re.compile(r"\b(?:" + "|".join(map(re.escape, target['keywords'])) + r")\b", re.IGNORECASE)
+        checks.append(lambda obj: any(keyword_pattern.search(str(obj.get(field) or '')) for field in TEXT_FIELDS))
+
+    def matches(obj, created):
+        return start_date <= created <= end_date and all(check(obj) for check in checks)
+
+    return matches
@@ -0,0 +1,109 @@
+# Decoding backends for Reddit dump lines. simdjson parses lazily and only materializes the fields the
+# extractor writes (a projection); orjson (in C) and the stdlib json module, the fallback when neither is
+# installed, always parse the whole line and return all of its fields, copying the wanted ones into a new dict
+# would only add work. All backends return a plain dict and raise json.JSONDecodeError for malformed lines,
+# so the extractor's error handling stays the same.
+# make_created_prefilter rejects lines outside the date window from the raw text, before any decoding.
+
+import calendar
+import json
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+PROJECTED_FIELDS = ("author", "title", "score", "created_utc", "permalink", "selftext", "body",
+                    "url", "subreddit", "link_id", "id")
+
+BACKENDS = ("simdjson", "orjson", "json")
+
+
+def available_backends():
+    available = []
+    if simdjson is not None:
+        available.append("simdjson")
+    if orjson is not None:
+        available.append("orjson")
+    available.append("json")
+    return available
+
+
+def get_decoder(backend="auto", fields=PROJECTED_FIELDS):
+    """
+    Returns (backend_name, decode) where decode(line) takes a str or bytes line and returns a dict holding
+    the requested fields that are present in the line: only those with simdjson, all fields of the line with
+    orjson and json.
+    """
+    if backend == "auto":
+        backend = available_backends()[0]
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown decoder backend '{backend}', expected one of {', '.join(BACKENDS)} or auto")
+    if backend not in available_backends():
+        raise ImportError(f"Decoder backend '{backend}' is not installed")
+    fields = tuple(fields)
+
+    if backend == "simdjson":
+        parser = simdjson.Parser()
+
+        def decode(line):
+            try:
+                doc = parser.parse(line)
+                # copy the values out, the document is only valid until the next parse
+                return {field: doc[field] for field in fields if field in doc}
+            except ValueError as err:
+                raise json.JSONDecodeError(str(err), "", 0) from err
+
+    elif backend == "orjson":
+        decode = orjson.loads
+
+    else:
+        decode = json.loads
+
+    return backend, decode
+
+
+# "created_utc": 1609459200, "created_utc": 1609459200.0 or "created_utc": "1609459200", followed by , or }
+CREATED_PATTERN = r'"created_utc"\s*:\s*(?:(\d+)(?:\.\d+)?|"(\d+)")\s*[,}]'
+CREATED_PATTERN_STR = re.compile(CREATED_PATTERN)
+CREATED_PATTERN_BYTES = re.compile(CREATED_PATTERN.encode())
+
+
+def make_created_prefilter(start_date, end_date):
+    """
+    Returns prefilter(line) for a str or bytes line: False if created_utc is certainly outside
+    [start_date, end_date] (naive UTC datetimes, as in the extractor), True if it is inside, and None
+    when the raw line is ambiguous (missing key, unusual number format, or more than one created_utc,
+    e.g. in crosspost_parent_list). Lines that are not rejected must still be decoded and checked strictly.
+    """
+    start_ts = calendar.timegm(start_date.timetuple())
+    end_ts = calendar.timegm(end_date.timetuple())
+
+    def prefilter(line):
+        created = find_created_utc(line)
+        if created is None:
+            return None
+        return start_ts <= created <= end_ts
+
+    return prefilter
+
+
+def find_created_utc(line):
+    """Returns the created_utc of a raw str or bytes line as int, or None if the raw line is ambiguous."""
+    if isinstance(line, bytes):
+        if line.count(b'"created_utc"') != 1:
+            return None
+        match = CREATED_PATTERN_BYTES.search(line)
+    else:
+        if line.count('"created_utc"') != 1:
+            return None
+        match = CREATED_PATTERN_STR.search(line)
+    if match is None:
+        return None
+    return int(match.group(1) or match.group(2))
@@ -0,0 +1,192 @@
+# One-time indexing of Reddit .zst dumps for random access by date.
+# The index is a sidecar json file next to the dump (<name>.zst.idx.json) with one entry per zstd frame:
+# compressed offset and length, number of lines and the min/max created_utc of the lines starting in that frame.
+# ExtractorLoop.py picks the index up automatically and only decompresses the frames overlapping its date range.
+#
+# Dumps written by the zstd CLI are usually a single frame, which an index cannot split. For those, use
+# --reframe-dir to write a line-aligned copy made of independent frames of --frame-size-mb decompressed bytes,
+# indexed while it is written, and point the extractor at that folder.
+
+import argparse
+import calendar
+import glob
+import json
+import logging
+import os
+
+import zstandard
+
+from record_decoding import find_created_utc
+from zst_reader import iter_zst_frames, read_lines_zst
+
+log = logging.getLogger("bot")
+
+INDEX_SUFFIX = ".idx.json"
+INDEX_VERSION = 1
+
+
+def index_path(file_name):
+    return file_name + INDEX_SUFFIX
+
+
+def line_created_utc(line):
+    created = find_created_utc(line)
+    if created is not None:
+        return created
+    try:
+        return int(json.loads(line)['created_utc'])
+    except Exception:
+        return None  # a bad line, the extractor will count it whatever the date range
+
+
+class FrameStats:
+    def __init__(self, offset):
+        self.offset = offset
+        self.length = 0
+        self.lines = 0
+        self.min_created = None
+        self.max_created = None
+
+    def add(self, line):
+        self.lines += 1
+        created = line_created_utc(line)
+        if created is None:
+            return
+        if self.min_created is None or created < self.min_created:
+            self.min_created = created
+        if self.max_created is None or created > self.max_created:
+            self.max_created = created
+
+    def as_row(self):
+        return [self.offset, self.length, self.lines, self.min_created, self.max_created]
+
+
+def write_index(file_name, frames):
+    index = {
+        'version': INDEX_VERSION,
+        'file_size': os.stat(file_name).st_size,
+        'frames': [frame.as_row() for frame in frames],
+    }
+    with open(index_path(file_name), "w", encoding='utf-8') as index_file:
+        json.dump(index, index_file)
+    return index
+
+
+def load_index(file_name):
+    """Returns the sidecar index of a dump, or None if there is none or it does not match the file."""
+    path = index_path(file_name)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as index_file:
+        index = json.load(index_file)
+    if index.get('version') != INDEX_VERSION or index.get('file_size') != os.stat(file_name).st_size:
+        log.warning(f"Ignoring stale index {path}")
+        return None
+    return index
+
+
+def build_index(file_name):
+    """Indexes the existing frames of a dump. Each frame is decompressed once."""
+    frame_list = list(iter_zst_frames(file_name))
+    frames = []
+    for frame_number, (offset, length) in enumerate(frame_list):
+        stats = FrameStats(offset)
+        stats.length = length
+        first = frame_number == 0
+        last = frame_number == len(frame_list) - 1
+        for line, _ in read_lines_zst(file_name, offset, offset + length, first, last):
+            stats.add(line)
+        frames.append(stats)
+    if len(frames) == 1:
+        log.warning(f"{file_name} is a single zstd frame, consider --reframe-dir to make it seekable")
+    return write_index(file_name, frames)
+
+
+def reframe(file_name, output_file_name, frame_size, level):
+    """
+    Recompresses a dump into independent frames of about frame_size decompressed bytes that end on a line
+    break, and indexes the frames while writing them.
+    """
+    compressor = zstandard.ZstdCompressor(level=level, write_checksum=True)
+    frames = []
+    offset = 0
+    with open(output_file_name, "wb") as output_file:
+        block, block_size = [], 0
+        stats = FrameStats(offset)
+
+        def flush():
+            nonlocal offset, block, block_size, stats
+            data = compressor.compress(b"\n".join(block) + b"\n")
+            output_file.write(data)
+            stats.length = len(data)
+            frames.append(stats)
+            offset += len(data)
+            block, block_size = [], 0
+            stats = FrameStats(offset)
+
+        for line, _ in read_lines_zst(file_name):
+            block.append(line)
+            block_size += len(line) + 1
+            stats.add(line)
+            if block_size >= frame_size:
+                flush()
+        if block:
+            flush()
+    return write_index(output_file_name, frames)
+
+
+def select_ranges(index, start_date, end_date, target_size=None):
+    """
+    Returns the (start, end, first, last) frame ranges of the index that can contain lines between start_date
+    and end_date (naive UTC datetimes). Adjacent selected frames are merged into ranges of up to target_size
+    compressed bytes. first/last tell the range reader whether the range starts or ends the file.
+    """
+    start_ts = calendar.timegm(start_date.timetuple())
+    end_ts = calendar.timegm(end_date.timetuple())
+    frames = index['frames']
+    if not frames:
+        return []
+    file_start = frames[0][0]
+    file_end = frames[-1][0] + frames[-1][1]
+
+    ranges = []
+    for offset, length, lines, min_created, max_created in frames:
+        if lines and min_created is not None and (max_created < start_ts or min_created > end_ts):
+            continue
+        if lines == 0:
+            # no line starts in this frame, it only continues a line owned by the previous frame
+            continue
+        if ranges and ranges[-1][1] == offset and (target_size is None or ranges[-1][1] - ranges[-1][0] < target_size):
+            ranges[-1][1] = offset + length
+        else:
+            ranges.append([offset, offset + length])
+    return [(start, end, start == file_start, end == file_end) for start, end in ranges]
+
+
+if __name__ == "__main__":
+    log.setLevel(logging.INFO)
+    log.addHandler(logging.StreamHandler())
+
+    parser = argparse.ArgumentParser(description="Build frame indexes for Reddit .zst dumps")
+    parser.add_argument("input", help=".zst file or folder of .zst files")
+    parser.add_argument("--reframe-dir", help="write seekable, line-aligned copies of the dumps to this folder")
+    parser.add_argument("--frame-size-mb", type=int, default=16, help="decompressed size of the frames of a reframed dump")
+    parser.add_argument("--level", type=int, default=10, help="zstd compression level of a reframed dump")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.input):
+        file_list = glob.glob(os.path.join(args.input, '*.zst'))
+    else:
+        file_list = [args.input]
+    if args.reframe_dir:
+        os.makedirs(args.reframe_dir, exist_ok=True)
+
+    for input_file_path in file_list:
+        if args.reframe_dir:
+            output_file_path = os.path.join(args.reframe_dir, os.path.basename(input_file_path))
+            log.info(f"Reframing {input_file_path} into {output_file_path}")
+            index = reframe(input_file_path, output_file_path, args.frame_size_mb * 2**20, args.level)
+        else:
+            log.info(f"Indexing {input_file_path}")
+            index = build_index(input_file_path)
+        log.info(f"{len(index['frames']):,} frames, {sum(frame[2] for frame in index['frames']):,} lines indexed")
@@ -0,0 +1,205 @@
+# Helpers for reading Reddit .zst dumps frame by frame, so one dump can be split across several workers.
+# A zstd file is a sequence of independent frames. Frame boundaries can be found by walking the frame and
+# block headers without decompressing anything, and decompression can start at any frame boundary.
+# Dumps written in one go by the zstd CLI usually contain a single frame and can then only be read as a whole.
+
+import os
+import struct
+import time
+
+import zstandard
+
+ZSTD_MAGIC = 0xFD2FB528
+SKIPPABLE_MAGIC_MASK = 0xFFFFFFF0
+SKIPPABLE_MAGIC = 0x184D2A50
+
+
+def iter_zst_frames(file_name):
+    """
+    Yields (offset, length) of every zstd frame in the file, in file order.
+    Skippable frames are not yielded but are stepped over.
+    """
+    with open(file_name, 'rb') as file_handle:
+        offset = 0
+        while True:
+            file_handle.seek(offset)
+            magic_bytes = file_handle.read(4)
+            if not magic_bytes:
+                return
+            if len(magic_bytes) < 4:
+                raise ValueError(f"Truncated frame header at byte {offset:,} in {file_name}")
+            magic = struct.unpack('<I', magic_bytes)[0]
+
+            if magic & SKIPPABLE_MAGIC_MASK == SKIPPABLE_MAGIC:
+                skip_size = struct.unpack('<I', file_handle.read(4))[0]
+                offset += 8 + skip_size
+                continue
+            if magic != ZSTD_MAGIC:
+                raise ValueError(f"Unknown frame magic {magic:#x} at byte {offset:,} in {file_name}")
+
+            descriptor = file_handle.read(1)[0]
+            fcs_flag = descriptor >> 6
+            single_segment = (descriptor >> 5) & 1
+            has_checksum = (descriptor >> 2) & 1
+            dict_id_flag = descriptor & 3
+
+            header_size = 1  # frame header descriptor
+            header_size += 0 if single_segment else 1  # window descriptor
+            header_size += (0, 1, 2, 4)[dict_id_flag]
+            header_size += (1 if single_segment else 0, 2, 4, 8)[fcs_flag]
+
+            position = offset + 4 + header_size
+            while True:
+                file_handle.seek(position)
+                block_header = file_handle.read(3)
+                if len(block_header) < 3:
+                    raise ValueError(f"Truncated block header at byte {position:,} in {file_name}")
+                value = block_header[0] | (block_header[1] << 8) | (block_header[2] << 16)
+                last_block = value & 1
+                block_type = (value >> 1) & 3
+                block_size = value >> 3
+                if block_type == 3:
+                    raise ValueError(f"Reserved block type at byte {position:,} in {file_name}")
+                position += 3 + (1 if block_type == 1 else block_size)
+                if last_block:
+                    break
+
+            if has_checksum:
+                position += 4
+            yield offset, position - offset
+            offset = position
+
+
+def plan_frame_ranges(file_name, target_size):
+    """
+    Groups consecutive frames into byte ranges of roughly target_size compressed bytes.
+    Returns a list of (start, end) tuples covering the whole file.
+    """
+    ranges = []
+    range_start, range_end = None, None
+    for offset, length in iter_zst_frames(file_name):
+        if range_start is None:
+            range_start = offset
+        range_end = offset + length
+        if range_end - range_start >= target_size:
+            ranges.append((range_start, range_end))
+            range_start = None
+    if range_start is not None:
+        ranges.append((range_start, range_end))
+    return ranges
+
+
+class RangeReader:
+    """File-like wrapper that only exposes the bytes between start and end of the underlying file."""
+
+    def __init__(self, file_handle, start, end=None):
+        self.file_handle = file_handle
+        self.end = end
+        file_handle.seek(start)
+
+    def read(self, size=-1):
+        if self.end is None:
+            return self.file_handle.read(size)
+        remaining = self.end - self.file_handle.tell()
+        if remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        return self.file_handle.read(size)
+
+    def tell(self):
+        return self.file_handle.tell()
+
+
+class LineSplitter:
+    """
+    Splits a binary stream into lines without decoding it. Iterating yields one list of complete lines
+    (bytes, without the line break) per chunk read; the unterminated rest of the stream is left in remainder.
+    Memory stays around two chunks plus the longest line, whatever the size of the stream.
+    With a stage_seconds dict, the time spent reading (decompressing) and splitting is added to it.
+    """
+
+    def __init__(self, reader, chunk_size=2**23, max_line_size=2**30, stage_seconds=None):
+        self.reader = reader
+        self.chunk_size = chunk_size
+        self.max_line_size = max_line_size
+        self.stage_seconds = stage_seconds if stage_seconds is not None else {'decompress': 0.0, 'split': 0.0}
+        self.remainder = b''
+
+    def __iter__(self):
+        parts, partial_size = [], 0
+        clock = time.perf_counter
+        while True:
+            started = clock()
+            chunk = self.reader.read(self.chunk_size)
+            read = clock()
+            self.stage_seconds['decompress'] += read - started
+            if not chunk:
+                break
+            lines = chunk.split(b"\n")
+            if len(lines) == 1:
+                # no line break in this chunk, keep the pieces instead of re-concatenating them
+                parts.append(chunk)
+                partial_size += len(chunk)
+                if partial_size > self.max_line_size:
+                    raise ValueError(f"Line longer than {self.max_line_size:,} bytes")
+                self.stage_seconds['split'] += clock() - read
+                continue
+            if parts:
+                parts.append(lines[0])
+                lines[0] = b''.join(parts)
+            tail = lines.pop()
+            parts, partial_size = ([tail], len(tail)) if tail else ([], 0)
+            self.stage_seconds['split'] += clock() - read
+            yield lines
+        self.remainder = b''.join(parts)
+
+
+def read_lines_zst(file_name, start=0, end=None, first=True, last=True, chunk_size=2**23, max_line_size=2**30,
+                   stage_seconds=None):
+    """
+    Yields (line, compressed_bytes_read) for the lines of a .zst file, or of the frame range [start, end).
+    Lines are bytes; both json decoders and the created_utc prefilter take them as they are.
+
+    Ranges must start and end on frame boundaries. Frames are not guaranteed to end on a line break, so a
+    range owns every line that starts inside it: a range that is not the first one skips everything up to
+    its first line break (that line belongs to the previous range), and a range that is not the last one
+    keeps decompressing the following frames until the line it started is complete.
+    stage_seconds, if given, collects the decompress and split times (see LineSplitter).
+    """
+    with open(file_name, 'rb') as file_handle:
+        if end is None:
+            end = os.fstat(file_handle.fileno()).st_size
+        decompressor = zstandard.ZstdDecompressor(max_window_size=2**31)
+        reader = decompressor.stream_reader(RangeReader(file_handle, start, end), read_across_frames=True)
+        splitter = LineSplitter(reader, chunk_size, max_line_size, stage_seconds)
+        skipping = not first
+        for lines in splitter:
+            if skipping:
+                lines = lines[1:]
+                skipping = False
+            bytes_read = file_handle.tell() - start
+            for line in lines:
+                yield line, bytes_read
+        reader.close()
+
+        if skipping:
+            return  # the whole range is part of one line owned by an earlier range
+        if last:
+            if splitter.remainder:
+                yield splitter.remainder, end - start
+            return
+
+        tail_reader = decompressor.stream_reader(RangeReader(file_handle, end), read_across_frames=True)
+        parts, complete = [splitter.remainder], False
+        while not complete:
+            chunk = tail_reader.read(2**20)
+            if not chunk:
+                break
+            newline = chunk.find(b"\n")
+            complete = newline != -1
+            parts.append(chunk[:newline] if complete else chunk)
+        tail_reader.close()
+        line = b''.join(parts)
+        if line or complete:
+            yield line, end - start